@@ -0,0 +1,72 @@
+import os
+import fitz  # PyMuPDF
+import numpy as np
+from typing import Optional, Tuple
+
+# --- Zero-Copy Autocrop ---
+# Hinahanap ang bounding box ng content direkta sa `pix.samples` gamit ang isang
+# NumPy view (walang PNG encode/decode), kino-crop sa pixmap domain, at isang
+# beses lang ine-encode ang final image.
+
+# Ang pixel ay itinuturing na "puti" (background) kapag ang luminance nito ay >= threshold.
+# Ang 255 ay katumbas ng dating Pillow approach (convert('L') -> invert -> getbbox).
+DEFAULT_WHITE_THRESHOLD = int(os.getenv("AUTOCROP_WHITE_THRESHOLD", "255"))
+
+# Ilang rows ang sabay na pinoproseso, para hindi lumaki ang temporary arrays
+BAND_ROWS = 256
+
+def find_content_bbox(pix: fitz.Pixmap, threshold: int = DEFAULT_WHITE_THRESHOLD) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Returns the pixel bbox (x0, y0, x1, y1) of all non-white pixels, or None if
+    the pixmap is blank. Luminance uses the same integer weights as Pillow's
+    'L' conversion, so the default threshold reproduces the old crop boxes.
+    """
+    height, width, n = pix.height, pix.width, pix.n
+    if not height or not width:
+        return None
+    # View lang ito sa samples ng pixmap; walang kinokopya
+    pixels = np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(height, pix.stride)[:, :width * n].reshape(height, width, n)
+    color_channels = n - pix.alpha
+
+    content_rows = np.zeros(height, dtype=bool)
+    content_cols = np.zeros(width, dtype=bool)
+    for y in range(0, height, BAND_ROWS):
+        band = pixels[y:y + BAND_ROWS]
+        if color_channels >= 3:
+            luminance = (band[..., 0].astype(np.uint32) * 19595
+                         + band[..., 1].astype(np.uint32) * 38470
+                         + band[..., 2].astype(np.uint32) * 7471
+                         + 0x8000) >> 16
+        else:
+            luminance = band[..., 0]
+        content = luminance < threshold
+        content_rows[y:y + band.shape[0]] = content.any(axis=1)
+        content_cols |= content.any(axis=0)
+
+    if not content_rows.any():
+        return None
+    y0 = int(np.argmax(content_rows))
+    y1 = height - int(np.argmax(content_rows[::-1]))
+    x0 = int(np.argmax(content_cols))
+    x1 = width - int(np.argmax(content_cols[::-1]))
+    return (x0, y0, x1, y1)
+
+def crop_pixmap(pix: fitz.Pixmap, bbox: Tuple[int, int, int, int]) -> fitz.Pixmap:
+    """Copies the pixel bbox of `pix` into a new pixmap of exactly that size."""
+    x0, y0, x1, y1 = bbox
+    irect = fitz.IRect(pix.x + x0, pix.y + y0, pix.x + x1, pix.y + y1)
+    cropped = fitz.Pixmap(pix.colorspace, irect, pix.alpha)
+    cropped.copy(pix, irect)
+    return cropped
+
+def autocrop_pixmap(pix: fitz.Pixmap, threshold: int = DEFAULT_WHITE_THRESHOLD) -> Tuple[fitz.Pixmap, Optional[Tuple[int, int, int, int]]]:
+    """
+    Tinatanggal ang puting borders ng pixmap.
+    Returns the cropped pixmap (or `pix` itself if it is blank) and the pixel bbox used.
+    """
+    bbox = find_content_bbox(pix, threshold)
+    if bbox is None:
+        return pix, None
+    if bbox == (0, 0, pix.width, pix.height):
+        return pix, bbox
+    return crop_pixmap(pix, bbox), bbox
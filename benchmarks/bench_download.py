@@ -0,0 +1,98 @@
+"""
+Benchmark ng Drive download (`drive.download_to_cache`) sa local Drive stand-in
+(tingnan ang local_backends.py), na may latency at limitadong bilis bawat request,
+gaya ng isang HTTP connection papunta sa Drive. Pinapatakbo ang parehong file sa
+iba't ibang bilang ng sabay na Range requests (DRIVE_DOWNLOAD_WORKERS) at
+nire-report ang oras at speedup kumpara sa isang request sa isang pagkakataon.
+
+Nag-e-exit ng 1 kapag ang pinakamaraming workers ay hindi umabot sa `--min-speedup`.
+
+Usage (mula sa repo root):
+    python benchmarks/bench_download.py
+    python benchmarks/bench_download.py --size-mb 400 --workers 1,2,4,8 --mbps 200
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from datetime import datetime, timezone
+
+from bench_processors import BENCH_DIR, git_info
+import local_backends
+
+RESULTS_VERSION = 1
+FILE_ID = "big-magazine"
+
+def make_file(path: str, size_mb: int) -> str:
+    """Random bytes (hindi compressible, gaya ng PDF na puno ng JPEGs)."""
+    block = 1024 * 1024
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(os.urandom(block))
+    return path
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark parallel ranged Drive downloads.")
+    parser.add_argument("--size-mb", type=int, default=200)
+    parser.add_argument("--workers", default="1,4,8", help="comma-separated concurrent Range request counts")
+    parser.add_argument("--mbps", type=float, default=80, help="simulated throughput of one request (megabits/s)")
+    parser.add_argument("--latency-ms", type=float, default=40, help="simulated latency per request")
+    parser.add_argument("--min-speedup", type=float, default=2.0, help="exit 1 if the most workers are not this much faster than one")
+    parser.add_argument("--output", help="results JSON path (default: benchmarks/results/download-<commit>-<time>.json)")
+    args = parser.parse_args()
+    worker_counts = sorted(int(count) for count in args.workers.split(","))
+
+    work_dir = tempfile.mkdtemp(prefix="bench-download-")
+    results = []
+    try:
+        source = make_file(os.path.join(work_dir, "magazine.pdf"), args.size_mb)
+        backends = local_backends.install({FILE_ID: source}, work_dir, args.latency_ms, drive_mbps=args.mbps)
+        import drive
+        for workers in worker_counts:
+            print(f"  > {args.size_mb} MB with {workers} concurrent range request(s)...", file=sys.stderr)
+            # Bagong cache bawat run, para laging totoong download
+            drive._default_cache = drive.DownloadCache(os.path.join(work_dir, f"cache-{workers}"))
+            drive.DOWNLOAD_WORKERS = workers
+            start = time.perf_counter()
+            path = drive.download_to_cache(backends["drive"], FILE_ID)
+            seconds = time.perf_counter() - start
+            if os.path.getsize(path) != args.size_mb * 1024 * 1024:
+                raise RuntimeError(f"downloaded {os.path.getsize(path)} bytes, expected {args.size_mb} MB")
+            results.append({"workers": workers, "seconds": round(seconds, 3), "mb_per_second": round(args.size_mb / seconds, 1)})
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    baseline = results[0]["seconds"]
+    for result in results:
+        result["speedup"] = round(baseline / result["seconds"], 2)
+
+    git = git_info()
+    document = {
+        "version": RESULTS_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": git,
+        "settings": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        BENCH_DIR, "results",
+        f"download-{(git['commit'] or 'nogit')[:10]}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(document, f, indent=2)
+
+    print(f"{'workers':>7} {'seconds':>9} {'MB/s':>8} {'speedup':>8}")
+    for result in results:
+        print(f"{result['workers']:>7} {result['seconds']:>9.2f} {result['mb_per_second']:>8.1f} {result['speedup']:>7.2f}x")
+    print(f"\nResults: {output}")
+    if results[-1]["speedup"] < args.min_speedup:
+        print(f"⚠️ {results[-1]['workers']} workers were only {results[-1]['speedup']}x faster than {results[0]['workers']} (expected {args.min_speedup}x)")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
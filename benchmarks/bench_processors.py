@@ -0,0 +1,280 @@
+"""
+Benchmark ng processors: image (`process_pdf_from_url`), interactive,
+reflow at combined, sa synthetic magazines at local backends (tingnan ang
+local_backends.py; walang Drive, Blob o Supabase na tinatawagan).
+
+Bawat (processor, page count, repeat) ay tumatakbo sa sariling process, kaya ang
+peak RSS ay sa job na iyon lang. Nire-record ang wall time, per-stage timings,
+peak RSS (ng job process at ng render workers nito), at bilang ng uploads at
+database requests. Ang resulta ay JSON file (default: benchmarks/results/),
+na maaaring ikumpara sa resulta ng ibang commit gamit ang `--compare`.
+
+Usage (mula sa repo root):
+    python benchmarks/bench_processors.py --pages 8,32 --processors image,reflow
+    python benchmarks/bench_processors.py --compare benchmarks/results/<baseline>.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import statistics
+import subprocess
+import tempfile
+import contextlib
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+
+from synthetic_magazine import make_magazine
+
+RESULTS_VERSION = 1
+PROCESSORS = ("image", "interactive", "reflow", "combined")
+FILE_ID = "synthetic-magazine"
+STREAMING_CHOICES = {"auto": None, "on": True, "off": False}
+
+# Stage -> (module, function o Class.method), bukod pa sa spans ng metrics.py. Inclusive ang oras; ang "upload" ay
+# pinagsamang oras ng upload threads, at ang "upload_wait" ay ang paghihintay sa join().
+STAGES = [
+    ("download", "drive", "download_to_cache"),
+    ("fingerprints", "incremental", "PageFingerprints.__init__"),
+    ("render_pages", "processor", "process_pages_sequential"),
+    ("render_pages", "processor", "process_pages_parallel"),
+    ("page_image", "processor", "build_page_image"),
+    ("hotspots", "processor", "extract_hotspots"),
+    ("interactive_page", "interactive_processor", "build_interactive_page"),
+    ("reflow_page", "reflow_processor", "reconstruct_page_layout"),
+    ("element_images", "element_images", "upload_element_image"),
+    ("upload", "uploader", "VercelBlobTarget.upload"),
+    ("upload", "uploader", "SupabaseStorageTarget.upload"),
+    ("upload_wait", "uploader", "UploadPipeline.join"),
+    ("manifest", "manifest_writer", "upload_manifest"),
+    ("database", "persistence", "with_retry"),
+]
+
+def peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    if who == resource.RUSAGE_SELF and os.path.exists("/proc/self/status"):
+        # VmHWM: peak ng process na ito lang. Ang ru_maxrss ay may kasamang memory
+        # ng parent bago ang exec (ang forked copy nito), kaya hindi eksakto.
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    # ru_maxrss: kilobytes sa Linux, bytes sa macOS
+    peak = resource.getrusage(who).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def run_case(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Runs one processor job against local backends. Called in a fresh child process."""
+    import local_backends
+    root = spec["root"]
+    backends = local_backends.install({FILE_ID: spec["pdf"]}, root, spec["latency_ms"])
+
+    from models import ReflowConfig
+    from image_codecs import ImageEncoder
+    import processor, interactive_processor, reflow_processor, combined_processor
+    import metrics
+
+    timer = local_backends.StageTimer()
+    for stage, module_name, attr in STAGES:
+        timer.instrument(stage, module_name, attr)
+
+    config = ReflowConfig(
+        issue_number=f"Bench {spec['pages']}",
+        publication_date="2026-01-01",
+        table_of_contents=[{"page": 1, "section": "Cover", "title": "Cover"}, {"page": 2, "section": "Travel", "title": "Feature"}],
+        render_workers=spec["workers"],
+        image_format=spec["image_format"],
+        native_images=spec["native_images"],
+        streaming=spec.get("streaming"),
+        srcset_widths=spec.get("srcset_widths") or [],
+    )
+    supabase = backends["supabase"]
+    jobs = {
+        "image": lambda: processor.process_pdf_from_url(
+            FILE_ID, config.issue_number, config.publication_date, config.table_of_contents,
+            workers=config.render_workers, encoder=ImageEncoder.from_config(config), tiles=config.tile_pyramid,
+            streaming=config.streaming, srcset_widths=config.srcset_widths
+        ),
+        "interactive": lambda: interactive_processor.process_pdf_interactive(FILE_ID, config, supabase),
+        "reflow": lambda: reflow_processor.process_pdf_for_reflow(FILE_ID, config, supabase),
+        "combined": lambda: combined_processor.process_pdf_all(FILE_ID, config, supabase),
+    }
+
+    # May subprocess na ang ilang imports; ang workers peak ay nire-report lang kung lumaki ito habang tumatakbo ang job
+    children_before = peak_rss_mb(resource.RUSAGE_CHILDREN)
+    # Ang logs ng processors ay hindi kasama sa output ng benchmark
+    with open(os.path.join(root, "job.log"), "w") as log, contextlib.redirect_stdout(log):
+        start = time.perf_counter()
+        with metrics.track_job(spec["processor"]) as job:
+            jobs[spec["processor"]]()
+        wall = time.perf_counter() - start
+    children_after = peak_rss_mb(resource.RUSAGE_CHILDREN)
+
+    return {
+        "processor": spec["processor"],
+        "pages": spec["pages"],
+        "streaming": spec.get("streaming"),
+        "wall_seconds": round(wall, 4),
+        "seconds_per_page": round(wall / spec["pages"], 4),
+        "peak_rss_mb": peak_rss_mb(),
+        "workers_peak_rss_mb": children_after if children_after > children_before else 0.0,
+        "uploads": backends["blob"].uploads + supabase.uploads,
+        "bytes_uploaded": backends["blob"].bytes_uploaded + supabase.bytes_uploaded,
+        "db_requests": supabase.requests,
+        "stages": timer.summary(),
+        # Ang spans ng metrics.py (leaf stages gaya ng render, autocrop, encode, text_extraction)
+        "spans": job.summary("succeeded")["stages"],
+    }
+
+def run_child(spec: Dict[str, Any]) -> Dict[str, Any]:
+    os.makedirs(spec["root"], exist_ok=True)
+    result_path = os.path.join(spec["root"], "result.json")
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", json.dumps(spec), result_path],
+        cwd=REPO_ROOT, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"{spec['processor']} ({spec['pages']} pages) failed:\n{completed.stderr[-4000:]}")
+    with open(result_path) as f:
+        return json.load(f)
+
+def git_info() -> Dict[str, Any]:
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=REPO_ROOT, capture_output=True, text=True).stdout.strip()
+    return {"commit": git("rev-parse", "HEAD") or None, "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Median ng repeats bawat metric (ang stages ay mula sa run na median ang wall time)."""
+    by_wall = sorted(runs, key=lambda run: run["wall_seconds"])
+    summary = dict(by_wall[len(by_wall) // 2])
+    for key in ("wall_seconds", "seconds_per_page", "peak_rss_mb", "workers_peak_rss_mb"):
+        summary[key] = round(statistics.median(run[key] for run in runs), 4)
+    summary["repeats"] = len(runs)
+    summary["wall_seconds_all"] = [run["wall_seconds"] for run in runs]
+    return summary
+
+def print_table(results: List[Dict[str, Any]]) -> None:
+    print(f"{'processor':<12} {'pages':>5} {'wall':>9} {'s/page':>8} {'rss MB':>8} {'workers':>8} {'uploads':>8} {'db':>4}  top stages")
+    for r in results:
+        stages = sorted(r["stages"].items(), key=lambda item: -item[1]["seconds"])[:3]
+        top = ", ".join(f"{name} {totals['seconds']:.2f}s" for name, totals in stages)
+        print(f"{r['processor']:<12} {r['pages']:>5} {r['wall_seconds']:>8.2f}s {r['seconds_per_page']:>8.3f} "
+              f"{r['peak_rss_mb']:>8.1f} {r['workers_peak_rss_mb']:>8.1f} {r['uploads']:>8} {r['db_requests']:>4}  {top}")
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, max_regression: Optional[float]) -> bool:
+    """Prints the change against a baseline results file. Returns False if a metric regressed past `max_regression` percent."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(r["processor"], r["pages"]): r for r in baseline["results"]}
+    print(f"\nCompared with {baseline_path} (commit {(baseline.get('git') or {}).get('commit') or '?'}):")
+    ok = True
+    for r in results:
+        old = previous.get((r["processor"], r["pages"]))
+        if not old:
+            print(f"  {r['processor']:<12} {r['pages']:>5}  (not in baseline)")
+            continue
+        changes = []
+        for key in ("wall_seconds", "peak_rss_mb"):
+            delta = (r[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+            regressed = max_regression is not None and delta > max_regression
+            ok = ok and not regressed
+            changes.append(f"{key} {old[key]} -> {r[key]} ({delta:+.1f}%){' ⚠️' if regressed else ''}")
+        print(f"  {r['processor']:<12} {r['pages']:>5}  " + ", ".join(changes))
+    return ok
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the magazine processors on synthetic PDFs.")
+    parser.add_argument("--pages", default="8,32", help="comma-separated page counts")
+    parser.add_argument("--processors", default=",".join(PROCESSORS), help=f"comma-separated, from {', '.join(PROCESSORS)}")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per case (the median is reported)")
+    parser.add_argument("--workers", type=int, default=1, help="render workers of the image processor")
+    parser.add_argument("--image-format", choices=["png", "webp", "avif"], default=None)
+    parser.add_argument("--native-images", action="store_true", help="JPEG passthrough for element images")
+    parser.add_argument("--streaming", choices=["auto", "on", "off"], default="auto", help="bounded-memory streaming mode (auto: by page count)")
+    parser.add_argument("--srcset-widths", default="", help="comma-separated srcset widths in pixels (default: none)")
+    parser.add_argument("--latency-ms", type=float, default=0, help="simulated latency per backend request")
+    parser.add_argument("--columns", type=int, default=3)
+    parser.add_argument("--images-per-page", type=int, default=2)
+    parser.add_argument("--links-per-page", type=int, default=3)
+    parser.add_argument("--output", help="results JSON path (default: benchmarks/results/processors-<commit>-<time>.json)")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=None, help="exit 1 if wall time or RSS grows more than this percent")
+    parser.add_argument("--keep", action="store_true", help="keep the work directory (PDFs, local stores, job logs)")
+    args = parser.parse_args()
+
+    processors = [name.strip() for name in args.processors.split(",") if name.strip()]
+    unknown = set(processors) - set(PROCESSORS)
+    if unknown:
+        parser.error(f"unknown processors: {', '.join(sorted(unknown))}")
+    page_counts = [int(count) for count in args.pages.split(",")]
+    srcset_widths = [int(width) for width in args.srcset_widths.split(",") if width.strip()]
+
+    work_dir = tempfile.mkdtemp(prefix="bench-processors-")
+    results = []
+    try:
+        for pages in page_counts:
+            pdf = make_magazine(
+                os.path.join(work_dir, f"magazine-{pages}.pdf"), pages=pages, columns=args.columns,
+                images_per_page=args.images_per_page, links_per_page=args.links_per_page
+            )
+            for name in processors:
+                runs = []
+                for repeat in range(args.repeat):
+                    print(f"  > {name}, {pages} pages, run {repeat + 1}/{args.repeat}...", file=sys.stderr)
+                    runs.append(run_child({
+                        "processor": name, "pages": pages, "pdf": pdf,
+                        "root": os.path.join(work_dir, f"{name}-{pages}-{repeat}"),
+                        "workers": args.workers, "image_format": args.image_format,
+                        "native_images": args.native_images, "latency_ms": args.latency_ms,
+                        "streaming": STREAMING_CHOICES[args.streaming],
+                        "srcset_widths": srcset_widths,
+                    }))
+                results.append(summarize(runs))
+    finally:
+        if args.keep:
+            print(f"Work directory: {work_dir}", file=sys.stderr)
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    git = git_info()
+    document = {
+        "version": RESULTS_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": git,
+        "environment": {
+            "python": platform.python_version(),
+            "pymupdf": __import__("fitz").VersionBind,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "max_regression", "keep")},
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        BENCH_DIR, "results",
+        f"processors-{(git['commit'] or 'nogit')[:10]}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(document, f, indent=2)
+
+    print_table(results)
+    print(f"\nResults: {output}")
+    if args.compare and not compare(results, args.compare, args.max_regression):
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        result = run_case(json.loads(sys.argv[2]))
+        with open(sys.argv[3], "w") as f:
+            json.dump(result, f)
+    else:
+        sys.exit(main())
@@ -0,0 +1,164 @@
+"""
+Benchmark ng rendering ng bawat page: ang page image (DEFAULT_DPI), ang srcset sizes
+at ang element clips, isang `page.get_pixmap` bawat output (dati, ini-interpret ulit
+ang content stream sa bawat isa) laban sa iisang display list bawat page
+(`PageAnalysis.render`). Rasterization lang ang sinusukat, walang encode o upload.
+
+Pinapatakbo ang parehong magazine na may dumaraming bilang ng srcset sizes, para
+makita ang dagdag na gastos ng bawat size. Ang natitipid bawat output ay ang isang
+interpretation ng page (halos ang oras ng paggawa ng display list), kaya pinakamalaki
+ito sa maliliit na element clips; sa malalaking sizes, rasterization ang nangingibabaw.
+Nag-e-exit ng 1 kapag ang element clips ay hindi umabot sa `--min-clip-speedup`, kapag
+mas mabagal ang display list sa kabuuan, o kapag hindi pareho ang pixels ng dalawang paraan.
+
+Usage (mula sa repo root):
+    python benchmarks/bench_render.py
+    python benchmarks/bench_render.py --pages 24 --widths 320,640,960,1280,1920
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Sequence, Tuple
+
+from bench_processors import BENCH_DIR, git_info
+from synthetic_magazine import make_magazine
+
+import fitz  # PyMuPDF
+from page_analysis import DEFAULT_DPI, PageAnalysis
+
+RESULTS_VERSION = 1
+# Ang zoom ng element clips ng reflow processor (ang interactive ay 1x)
+CLIP_ZOOMS = (1, 2)
+
+OUTPUT_KINDS = ("page_image", "srcset", "element_clips")
+
+def output_boxes(page: fitz.Page, widths: Sequence[int]) -> List[Tuple[str, fitz.Matrix, Any]]:
+    """(kind, matrix, clip) ng bawat output ng page, pareho sa ginagawa ng processors."""
+    zoom = DEFAULT_DPI / 72.0
+    outputs = [("page_image", fitz.Matrix(zoom, zoom), None)]
+    box = page.rect
+    for width in widths:
+        height = max(1, round(width * box.height / box.width))
+        matrix = fitz.Matrix(1, 0, 0, 1, -box.x0, -box.y0) * fitz.Matrix(width / box.width, height / box.height)
+        outputs.append(("srcset", matrix, box))
+    for info in page.get_image_info(xrefs=True):
+        for clip_zoom in CLIP_ZOOMS:
+            outputs.append(("element_clips", fitz.Matrix(clip_zoom, clip_zoom), info["bbox"]))
+    return outputs
+
+def run_case(doc: fitz.Document, widths: Sequence[int]) -> Dict[str, Any]:
+    """Oras ng lahat ng outputs ng lahat ng pages, sa dalawang paraan, bawat kind ng output."""
+    plans = [output_boxes(page, widths) for page in doc]
+    kinds = {kind: {"outputs": 0, "get_pixmap_seconds": 0.0, "display_list_seconds": 0.0} for kind in OUTPUT_KINDS}
+
+    fitz.TOOLS.store_shrink(100)
+    per_page = []
+    for page, outputs in zip(doc, plans):
+        samples = []
+        for kind, matrix, clip in outputs:
+            start = time.perf_counter()
+            samples.append(page.get_pixmap(matrix=matrix, clip=clip).samples)
+            kinds[kind]["get_pixmap_seconds"] += time.perf_counter() - start
+            kinds[kind]["outputs"] += 1
+        per_page.append(samples)
+
+    fitz.TOOLS.store_shrink(100)
+    build_seconds = 0.0
+    identical = True
+    for page, outputs, expected in zip(doc, plans, per_page):
+        analysis = PageAnalysis(page, page.number + 1)
+        start = time.perf_counter()
+        analysis.display_list
+        build_seconds += time.perf_counter() - start
+        for (kind, matrix, clip), samples in zip(outputs, expected):
+            start = time.perf_counter()
+            pixmap = analysis.render(matrix, clip=clip)
+            kinds[kind]["display_list_seconds"] += time.perf_counter() - start
+            identical = identical and pixmap.samples == samples
+
+    for totals in kinds.values():
+        totals["speedup"] = round(totals["get_pixmap_seconds"] / totals["display_list_seconds"], 2) if totals["outputs"] else None
+        totals["get_pixmap_seconds"] = round(totals["get_pixmap_seconds"], 3)
+        totals["display_list_seconds"] = round(totals["display_list_seconds"], 3)
+    get_pixmap_seconds = sum(totals["get_pixmap_seconds"] for totals in kinds.values())
+    # Kasama ang paggawa ng display lists sa kabuuan ng display list
+    display_list_seconds = build_seconds + sum(totals["display_list_seconds"] for totals in kinds.values())
+    return {
+        "srcset_sizes": len(widths),
+        "outputs": sum(totals["outputs"] for totals in kinds.values()),
+        "build_display_lists_seconds": round(build_seconds, 3),
+        "get_pixmap_seconds": round(get_pixmap_seconds, 3),
+        "display_list_seconds": round(display_list_seconds, 3),
+        "speedup": round(get_pixmap_seconds / display_list_seconds, 2),
+        "kinds": kinds,
+        "identical": identical,
+    }
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark rendering every page output from one DisplayList per page.")
+    parser.add_argument("--pages", type=int, default=16)
+    parser.add_argument("--widths", default="320,640,1280,1920", help="comma-separated srcset widths; cases use the first 0, 1, ... of them")
+    parser.add_argument("--images-per-page", type=int, default=2)
+    parser.add_argument("--vector-shapes", type=int, default=400, help="filled vector paths behind each page (content stream weight)")
+    parser.add_argument("--min-clip-speedup", type=float, default=1.2, help="exit 1 if element clips from the display list are not this much faster")
+    parser.add_argument("--output", help="results JSON path (default: benchmarks/results/render-<commit>-<time>.json)")
+    args = parser.parse_args()
+    widths = [int(width) for width in args.widths.split(",") if width.strip()]
+
+    work_dir = tempfile.mkdtemp(prefix="bench-render-")
+    results = []
+    try:
+        pdf = make_magazine(os.path.join(work_dir, "magazine.pdf"), pages=args.pages, images_per_page=args.images_per_page,
+                             vector_shapes=args.vector_shapes)
+        doc = fitz.open(pdf)
+        for count in range(len(widths) + 1):
+            print(f"  > {args.pages} pages, {count} srcset size(s)...", file=sys.stderr)
+            results.append(run_case(doc, widths[:count]))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    git = git_info()
+    document = {
+        "version": RESULTS_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": git,
+        "settings": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        BENCH_DIR, "results",
+        f"render-{(git['commit'] or 'nogit')[:10]}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(document, f, indent=2)
+
+    print(f"{'sizes':>5} {'outputs':>8} {'get_pixmap':>11} {'displaylist':>12} {'speedup':>8}   "
+          + " ".join(f"{kind:>14}" for kind in OUTPUT_KINDS))
+    for result in results:
+        print(f"{result['srcset_sizes']:>5} {result['outputs']:>8} {result['get_pixmap_seconds']:>10.3f}s "
+              f"{result['display_list_seconds']:>11.3f}s {result['speedup']:>7.2f}x   "
+              + " ".join(f"{result['kinds'][kind]['speedup'] or 0:>13.2f}x" for kind in OUTPUT_KINDS))
+    print(f"(display lists built in {results[-1]['build_display_lists_seconds']:.3f}s, counted in the display list totals)")
+    print(f"\nResults: {output}")
+    ok = True
+    if not all(result["identical"] for result in results):
+        print("⚠️ Display list rendering differs from page.get_pixmap")
+        ok = False
+    slower = [result["srcset_sizes"] for result in results if result["speedup"] < 1]
+    if slower:
+        print(f"⚠️ The display list was slower overall with {slower} srcset sizes")
+        ok = False
+    clip_speedup = min(result["kinds"]["element_clips"]["speedup"] or 0 for result in results)
+    if clip_speedup < args.min_clip_speedup:
+        print(f"⚠️ Element clips from the display list were only {clip_speedup}x faster (expected {args.min_clip_speedup}x)")
+        ok = False
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""
+Micro-benchmark: shadow-text detection sa reflow processor.
+
+Gumagawa ng synthetic text blocks na may libo-libong spans (paulit-ulit na
+salita, may mga shadow copies na < 2pt ang layo, at mga kopya na eksaktong
+nasa hangganan), at kinukumpara ang dating O(n²) na loop sa `mark_shadow_text`.
+Tinitiyak din na pareho ang `is_shadow_text` ng bawat span.
+
+Usage (mula sa repo root):
+    python benchmarks/bench_shadow_text.py [span_count ...]
+"""
+import os
+import sys
+import copy
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reflow_processor import mark_shadow_text
+
+def make_block(span_count: int, seed: int = 42):
+    rng = random.Random(seed)
+    words = ["SALE", "Manila", "Call now", "Page", "Editor's Note", "P199", "Open daily"]
+    spans = []
+    while len(spans) < span_count:
+        x, y = rng.uniform(0, 560), rng.uniform(0, 800)
+        content = rng.choice(words)
+        spans.append({"content": content, "bbox": (x, y, x + 40, y + 10), "reflow_hints": {}})
+        roll = rng.random()
+        if roll < 0.2:
+            # Shadow copy: halos nakapatong
+            dx, dy = rng.uniform(-1.9, 1.9), rng.uniform(-1.9, 1.9)
+            spans.append({"content": content, "bbox": (x + dx, y + dy, x + dx + 40, y + dy + 10), "reflow_hints": {}})
+        elif roll < 0.25:
+            # Eksaktong 2pt ang layo: hindi shadow
+            spans.append({"content": content, "bbox": (x + 2, y, x + 42, y + 10), "reflow_hints": {}})
+    return spans[:span_count]
+
+def mark_shadow_text_quadratic(spans):
+    """Ang dating implementation, para sa paghahambing."""
+    for i, current_span in enumerate(spans):
+        is_shadow = False
+        for j, other_span in enumerate(spans):
+            if i == j: continue
+            if current_span['content'] == other_span['content']:
+                dist_x = abs(current_span['bbox'][0] - other_span['bbox'][0])
+                dist_y = abs(current_span['bbox'][1] - other_span['bbox'][1])
+                if dist_x < 2 and dist_y < 2 and j < i:
+                    is_shadow = True
+                    break
+        current_span["reflow_hints"]["is_shadow_text"] = is_shadow
+
+def timed(fn, spans):
+    start = time.perf_counter()
+    fn(spans)
+    return time.perf_counter() - start
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [500, 1000, 2000, 4000]
+    print(f"{'spans':>8} {'quadratic':>12} {'indexed':>12} {'speedup':>9} {'shadows':>8}")
+    for size in sizes:
+        block = make_block(size)
+        old, new = copy.deepcopy(block), copy.deepcopy(block)
+        old_seconds = timed(mark_shadow_text_quadratic, old)
+        new_seconds = timed(mark_shadow_text, new)
+        old_flags = [span["reflow_hints"]["is_shadow_text"] for span in old]
+        new_flags = [span["reflow_hints"]["is_shadow_text"] for span in new]
+        assert old_flags == new_flags, f"is_shadow_text mismatch at {size} spans"
+        print(f"{size:>8} {old_seconds * 1000:>10.1f}ms {new_seconds * 1000:>10.2f}ms {old_seconds / new_seconds:>8.0f}x {sum(new_flags):>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Benchmark ng startup: gaano katagal ang `import main` (ang kailangan bago
+makasagot ang server sa `/healthz`) at ang background warm-up (`main.warm_up`,
+ang kailangan bago maging ready sa `/readyz`). Bawat run ay sariling process na may
+`python -X importtime`, kaya cold ang imports; ang mga module na pinakamatagal
+i-import ay nire-report din.
+
+Nag-e-exit ng 1 (may "❌ FAILED" sa stderr at `"passed": false` sa results JSON)
+kapag ang `import main` ay humila ng isa sa HEAVY_IMPORTS (dapat lazy ang mga ito),
+o kapag lumala nang higit sa `--max-regression` percent kumpara sa `--compare` baseline.
+
+Usage (mula sa repo root):
+    python benchmarks/bench_startup.py --repeat 5
+    python benchmarks/bench_startup.py --compare benchmarks/results/<baseline>.json --max-regression 20
+"""
+import os
+import sys
+import json
+import argparse
+import platform
+import statistics
+import subprocess
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from bench_processors import BENCH_DIR, REPO_ROOT, git_info
+
+RESULTS_VERSION = 1
+# Hindi dapat ma-import ang mga ito ng `import main`
+HEAVY_IMPORTS = ("fitz", "pymupdf", "PIL", "numpy", "googleapiclient", "google.oauth2", "vercel_blob", "supabase")
+
+CHILD = """
+import sys, time, json
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+eager = [name for name in HEAVY_IMPORTS if name in sys.modules]
+status = main.warm_up()
+warmed = time.perf_counter()
+print(json.dumps({
+    "import_main_seconds": imported - start,
+    "warmup_seconds": warmed - imported,
+    "warmup_status": status["status"],
+    "warmup_error": status.get("error"),
+    "eager_heavy_imports": eager,
+}))
+"""
+
+def parse_importtime(stderr: str, max_depth: int = 1) -> Dict[str, float]:
+    """
+    Module -> cumulative import seconds, mula sa `-X importtime` output, para sa
+    top-level imports at sa mga direktang ini-import nila (hal. main, processor, fitz).
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Dalawang spaces ng indent bawat level ng nesting, pagkatapos ng isang space
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth <= max_depth:
+            modules[name.strip()] = int(cumulative) / 1e6
+    return modules
+
+def throwaway_private_key() -> str:
+    """Bagong RSA key (PEM) para sa Drive credentials ng warm-up; hindi ito ginagamit sa network."""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    return key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+
+def run_once() -> Dict[str, Any]:
+    env = dict(os.environ)
+    # Ginagawa ng warm-up ang Supabase at Drive clients; hindi sila kumokonekta hangga't walang request
+    env.setdefault("SUPABASE_URL", "http://localhost/")
+    env.setdefault("SUPABASE_SERVICE_KEY", "bench")
+    if not env.get("GOOGLE_CLIENT_EMAIL") or not env.get("GOOGLE_PRIVATE_KEY"):
+        env["GOOGLE_CLIENT_EMAIL"] = "bench@example.com"
+        env["GOOGLE_PRIVATE_KEY"] = throwaway_private_key()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"HEAVY_IMPORTS = {HEAVY_IMPORTS!r}\n{CHILD}"],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"startup run failed:\n{completed.stderr[-4000:]}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["modules"] = parse_importtime(completed.stderr)
+    return result
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Median ng repeats; ang module times ay median din bawat module."""
+    summary = {key: round(statistics.median(run[key] for run in runs), 4) for key in ("import_main_seconds", "warmup_seconds")}
+    summary["warmup_status"] = runs[-1]["warmup_status"]
+    summary["warmup_error"] = runs[-1]["warmup_error"]
+    summary["eager_heavy_imports"] = sorted({name for run in runs for name in run["eager_heavy_imports"]})
+    names = set().union(*(run["modules"] for run in runs))
+    modules = {name: round(statistics.median(run["modules"].get(name, 0.0) for run in runs), 4) for name in names}
+    summary["slowest_modules"] = dict(sorted(modules.items(), key=lambda item: -item[1])[:15])
+    summary["repeats"] = len(runs)
+    return summary
+
+def compare(result: Dict[str, Any], baseline_path: str, max_regression: Optional[float]) -> bool:
+    """Prints the change against a baseline results file. Returns False if a metric regressed past `max_regression` percent."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    old = baseline["result"]
+    print(f"\nCompared with {baseline_path} (commit {(baseline.get('git') or {}).get('commit') or '?'}):")
+    ok = True
+    for key in ("import_main_seconds", "warmup_seconds"):
+        delta = (result[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+        regressed = max_regression is not None and delta > max_regression
+        ok = ok and not regressed
+        print(f"  {key} {old[key]} -> {result[key]} ({delta:+.1f}%){' ⚠️' if regressed else ''}")
+    return ok
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Profile server startup: `import main` and the background warm-up.")
+    parser.add_argument("--repeat", type=int, default=3, help="runs (the median is reported)")
+    parser.add_argument("--output", help="results JSON path (default: benchmarks/results/startup-<commit>-<time>.json)")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=None, help="exit 1 if import or warm-up time grows more than this percent")
+    args = parser.parse_args()
+
+    runs = []
+    for repeat in range(args.repeat):
+        print(f"  > startup run {repeat + 1}/{args.repeat}...", file=sys.stderr)
+        runs.append(run_once())
+    result = summarize(runs)
+
+    print(f"import main: {result['import_main_seconds']:.3f}s   warm-up: {result['warmup_seconds']:.3f}s ({result['warmup_status']})")
+    if result["warmup_error"]:
+        print(f"  warm-up error: {result['warmup_error']}")
+    print("slowest imports (top-level and their direct imports):")
+    for name, seconds in list(result["slowest_modules"].items())[:10]:
+        print(f"  {seconds:>8.3f}s  {name}")
+
+    failures = []
+    if result["eager_heavy_imports"]:
+        failures.append(f"`import main` eagerly imports: {', '.join(result['eager_heavy_imports'])}")
+    if args.compare and not compare(result, args.compare, args.max_regression):
+        failures.append(f"startup regressed more than {args.max_regression}% against {args.compare}")
+
+    git = git_info()
+    document = {
+        "version": RESULTS_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": git,
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "settings": {"repeat": args.repeat},
+        "result": result,
+        "passed": not failures,
+        "failures": failures,
+    }
+    output = args.output or os.path.join(
+        BENCH_DIR, "results",
+        f"startup-{(git['commit'] or 'nogit')[:10]}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(document, f, indent=2)
+    print(f"\nResults: {output}")
+
+    # Failure ang eager heavy imports (hindi lang warning): sinisira nito ang mabilis na `/healthz`
+    for failure in failures:
+        print(f"❌ FAILED: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Benchmark ng streaming mode (tingnan ang streaming.py): pinapatakbo ang processors
+sa synthetic magazines na palaki nang palaki, naka-on at naka-off ang streaming,
+at ikinukumpara ang peak RSS. Sa streaming mode, dapat halos pareho ang peak RSS
+ng pinakamaliit at pinakamalaking issue; nag-e-exit ng 1 kapag lumaki ito nang
+higit sa `--max-growth-mb`.
+
+Ginagamit ang parehong child-process runner ng bench_processors.py, kaya ang peak
+RSS ay sa job na iyon lang.
+
+Usage (mula sa repo root):
+    python benchmarks/bench_streaming.py
+    python benchmarks/bench_streaming.py --pages 25,100,400 --processors combined,interactive
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from bench_processors import BENCH_DIR, PROCESSORS, git_info, run_child
+from synthetic_magazine import make_magazine
+
+RESULTS_VERSION = 1
+
+def rss_growth(results: List[Dict[str, Any]], processor: str, streaming: bool) -> float:
+    """Peak RSS ng pinakamalaking issue bawas ng pinakamaliit (MB)."""
+    runs = sorted((r for r in results if r["processor"] == processor and r["streaming"] is streaming), key=lambda r: r["pages"])
+    return round(runs[-1]["peak_rss_mb"] - runs[0]["peak_rss_mb"], 1)
+
+def print_table(results: List[Dict[str, Any]], processors: List[str], page_counts: List[int]) -> None:
+    print(f"{'processor':<12} {'mode':<10} " + " ".join(f"{f'{pages}p MB':>9}" for pages in page_counts) + f" {'growth':>9}")
+    for processor in processors:
+        for streaming in (False, True):
+            rss = {r["pages"]: r["peak_rss_mb"] for r in results if r["processor"] == processor and r["streaming"] is streaming}
+            print(f"{processor:<12} {'streaming' if streaming else 'in-memory':<10} "
+                  + " ".join(f"{rss[pages]:>9.1f}" for pages in page_counts)
+                  + f" {rss_growth(results, processor, streaming):>+9.1f}")
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check that streaming mode keeps peak RSS flat as page count grows.")
+    parser.add_argument("--pages", default="25,100,200", help="comma-separated page counts (at least two)")
+    parser.add_argument("--processors", default="combined", help=f"comma-separated, from {', '.join(PROCESSORS)}")
+    parser.add_argument("--workers", type=int, default=1, help="render workers of the image processor")
+    parser.add_argument("--max-growth-mb", type=float, default=24.0, help="exit 1 if streaming peak RSS grows more than this from the smallest to the largest issue")
+    parser.add_argument("--output", help="results JSON path (default: benchmarks/results/streaming-<commit>-<time>.json)")
+    parser.add_argument("--keep", action="store_true", help="keep the work directory (PDFs, local stores, job logs)")
+    args = parser.parse_args()
+
+    processors = [name.strip() for name in args.processors.split(",") if name.strip()]
+    unknown = set(processors) - set(PROCESSORS)
+    if unknown:
+        parser.error(f"unknown processors: {', '.join(sorted(unknown))}")
+    page_counts = sorted(int(count) for count in args.pages.split(","))
+    if len(page_counts) < 2:
+        parser.error("--pages needs at least two page counts")
+
+    work_dir = tempfile.mkdtemp(prefix="bench-streaming-")
+    results = []
+    try:
+        for pages in page_counts:
+            pdf = make_magazine(os.path.join(work_dir, f"magazine-{pages}.pdf"), pages=pages)
+            for name in processors:
+                for streaming in (False, True):
+                    print(f"  > {name}, {pages} pages, streaming {'on' if streaming else 'off'}...", file=sys.stderr)
+                    results.append(run_child({
+                        "processor": name, "pages": pages, "pdf": pdf,
+                        "root": os.path.join(work_dir, f"{name}-{pages}-{'streaming' if streaming else 'memory'}"),
+                        "workers": args.workers, "image_format": None,
+                        "native_images": False, "latency_ms": 0, "streaming": streaming,
+                    }))
+    finally:
+        if args.keep:
+            print(f"Work directory: {work_dir}", file=sys.stderr)
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    git = git_info()
+    growth = {name: rss_growth(results, name, True) for name in processors}
+    document = {
+        "version": RESULTS_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": git,
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "keep")},
+        "streaming_rss_growth_mb": growth,
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        BENCH_DIR, "results",
+        f"streaming-{(git['commit'] or 'nogit')[:10]}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(document, f, indent=2)
+
+    print_table(results, processors, page_counts)
+    print(f"\nResults: {output}")
+    over = {name: value for name, value in growth.items() if value > args.max_growth_mb}
+    if over:
+        print(f"⚠️ Streaming peak RSS grew more than {args.max_growth_mb} MB: "
+              + ", ".join(f"{name} {value:+.1f} MB" for name, value in over.items()))
+        return 1
+    print(f"✅ Streaming peak RSS stayed within {args.max_growth_mb} MB from {page_counts[0]} to {page_counts[-1]} pages")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+"""
+Local stand-ins para sa Google Drive, Vercel Blob at Supabase, at stage timers.
+
+Ginagamit ng benchmarks para tumakbo ang totoong processors nang walang network:
+  - Drive: ang "file" ay isang local PDF; sinusunod ang Range header ng bawat
+    get_media request. Ang `drive_mbps` ay naglilimita sa bilis ng bawat request
+    (gaya ng isang HTTP connection), para makita ang epekto ng parallel downloads.
+  - Vercel Blob at Supabase Storage: files sa ilalim ng isang local directory.
+  - Supabase tables: in-memory rows (upsert at rpc lang ang kailangan ng processors).
+Ang `latency_ms` ay idinadagdag sa bawat request, para makita ang epekto ng
+network round-trips (hal. sa upload pipeline).
+
+Ang `StageTimer.instrument` ay pinapalitan ang isang function o method ng wrapper
+na nagre-record ng oras at bilang ng tawag. Inclusive ang oras ng bawat stage
+(kasama ang nested stages), at ang mga stage na tumatakbo sa upload threads ay
+pinagsamang oras ng lahat ng threads, kaya maaaring lumampas sa wall time.
+"""
+import os
+import sys
+import time
+import hashlib
+import threading
+import functools
+import importlib
+import types
+from typing import Any, Callable, Dict, List, Optional
+
+def _sleep(latency_ms: float) -> None:
+    if latency_ms:
+        time.sleep(latency_ms / 1000)
+
+# --- Google Drive ---
+class LocalMediaRequest:
+    """Same interface as a googleapiclient media request: honours a `range` header."""
+
+    def __init__(self, path: str, latency_ms: float = 0, mbps: float = 0):
+        self.path = path
+        self.latency_ms = latency_ms
+        self.mbps = mbps
+        self.headers: Dict[str, str] = {}
+
+    def execute(self, http: Any = None, num_retries: int = 0) -> bytes:
+        _sleep(self.latency_ms)
+        with open(self.path, "rb") as f:
+            byte_range = self.headers.get("range")
+            if byte_range:
+                start, end = (int(value) for value in byte_range[len("bytes="):].split("-"))
+                f.seek(start)
+                data = f.read(end - start + 1)
+            else:
+                data = f.read()
+        if self.mbps:
+            time.sleep(len(data) * 8 / (self.mbps * 1e6))
+        return data
+
+class _LocalCall:
+    def __init__(self, result: Any, latency_ms: float):
+        self.result, self.latency_ms = result, latency_ms
+
+    def execute(self, http: Any = None, num_retries: int = 0):
+        _sleep(self.latency_ms)
+        return self.result
+
+class _LocalFiles:
+    def __init__(self, drive: "LocalDrive"):
+        self.drive = drive
+
+    def get(self, fileId: str, fields: Optional[str] = None, supportsAllDrives: bool = False):
+        return _LocalCall(self.drive.metadata(fileId), self.drive.latency_ms)
+
+    def get_media(self, fileId: str, **kwargs):
+        return LocalMediaRequest(self.drive.files_by_id[fileId], self.drive.latency_ms, self.drive.mbps)
+
+class LocalDrive:
+    """Drive service stand-in: file ID -> local path."""
+
+    def __init__(self, files_by_id: Dict[str, str], latency_ms: float = 0, mbps: float = 0):
+        self.files_by_id = files_by_id
+        self.latency_ms = latency_ms
+        self.mbps = mbps
+
+    def metadata(self, file_id: str) -> Dict[str, Any]:
+        path = self.files_by_id[file_id]
+        with open(path, "rb") as f:
+            md5 = hashlib.md5(f.read()).hexdigest()
+        return {"id": file_id, "size": str(os.path.getsize(path)), "md5Checksum": md5, "modifiedTime": str(os.path.getmtime(path))}
+
+    def files(self) -> _LocalFiles:
+        return _LocalFiles(self)
+
+# --- Vercel Blob ---
+class LocalBlobStore:
+    """`put`/`list` of vercel_blob and `requests.get` for its URLs, backed by a directory."""
+    URL_PREFIX = "https://blob.local/"
+
+    def __init__(self, root: str, latency_ms: float = 0):
+        self.root = root
+        self.latency_ms = latency_ms
+        self.uploads = 0
+        self.bytes_uploaded = 0
+        self._lock = threading.Lock()
+
+    def _full(self, path: str) -> str:
+        return os.path.join(self.root, path)
+
+    def put(self, path: str, data: bytes, options: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+        _sleep(self.latency_ms)
+        full = self._full(path)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        with open(full, "wb") as f:
+            f.write(data)
+        with self._lock:
+            self.uploads += 1
+            self.bytes_uploaded += len(data)
+        return {"url": self.URL_PREFIX + path, "pathname": path}
+
+    def list(self, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        _sleep(self.latency_ms)
+        prefix = (options or {}).get("prefix", "")
+        if os.path.isfile(self._full(prefix)):
+            return {"blobs": [{"pathname": prefix, "url": self.URL_PREFIX + prefix}]}
+        return {"blobs": []}
+
+    def get(self, url: str, timeout: Optional[float] = None):
+        _sleep(self.latency_ms)
+        with open(self._full(url[len(self.URL_PREFIX):]), "rb") as f:
+            content = f.read()
+        return types.SimpleNamespace(content=content, raise_for_status=lambda: None)
+
+# --- Supabase ---
+class _LocalBucket:
+    def __init__(self, supabase: "LocalSupabase", name: str):
+        self.supabase, self.name = supabase, name
+
+    def _full(self, path: str) -> str:
+        return os.path.join(self.supabase.root, self.name, path)
+
+    def upload(self, file: bytes, path: str, file_options: Optional[Dict[str, Any]] = None):
+        _sleep(self.supabase.latency_ms)
+        full = self._full(path)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        with open(full, "wb") as f:
+            f.write(file)
+        with self.supabase.lock:
+            self.supabase.uploads += 1
+            self.supabase.bytes_uploaded += len(file)
+
+    def get_public_url(self, path: str) -> str:
+        return f"https://supabase.local/{self.name}/{path}"
+
+    def download(self, path: str) -> bytes:
+        _sleep(self.supabase.latency_ms)
+        with open(self._full(path), "rb") as f:
+            return f.read()
+
+class _LocalStorage:
+    def __init__(self, supabase: "LocalSupabase"):
+        self.supabase = supabase
+
+    def from_(self, name: str) -> _LocalBucket:
+        return _LocalBucket(self.supabase, name)
+
+class _LocalQuery:
+    def __init__(self, supabase: "LocalSupabase", table: str):
+        self.supabase, self.table, self.rows = supabase, table, []
+
+    def upsert(self, rows, on_conflict: Optional[str] = None, **kwargs) -> "_LocalQuery":
+        self.rows = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def execute(self):
+        _sleep(self.supabase.latency_ms)
+        saved = []
+        with self.supabase.lock:
+            self.supabase.requests += 1
+            for row in self.rows:
+                row = {"id": len(self.supabase.tables.setdefault(self.table, [])) + 1, **row}
+                self.supabase.tables[self.table].append(row)
+                saved.append(row)
+        return types.SimpleNamespace(data=saved)
+
+class LocalSupabase:
+    """Supabase client stand-in: storage buckets on disk, tables in memory."""
+
+    def __init__(self, root: str, latency_ms: float = 0):
+        self.root = root
+        self.latency_ms = latency_ms
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.requests = 0
+        self.uploads = 0
+        self.bytes_uploaded = 0
+        self.lock = threading.Lock()
+        self.storage = _LocalStorage(self)
+
+    def table(self, name: str) -> _LocalQuery:
+        return _LocalQuery(self, name)
+
+    def rpc(self, name: str, params: Dict[str, Any]):
+        # Gaya ng halimbawang save_issue_with_pages function sa persistence.py
+        def execute():
+            issue = self.table("magazine_issues").upsert(params["issue"]).execute().data[0]
+            self.table("magazine_pages").upsert([{"issue_id": issue["id"], **page} for page in params["pages"]]).execute()
+            return types.SimpleNamespace(data=issue["id"])
+        return types.SimpleNamespace(execute=execute)
+
+# --- Install ---
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def install(files_by_id: Dict[str, str], root: str, latency_ms: float = 0, drive_mbps: float = 0) -> Dict[str, Any]:
+    """
+    Points the processors at local backends under `root`. Call before the
+    first job, in a process dedicated to the benchmark. Returns the backends.
+    """
+    os.environ.setdefault("BLOB_READ_WRITE_TOKEN", "local")
+    os.environ["DRIVE_CACHE_DIR"] = os.path.join(root, "drive-cache")
+    os.environ["UPLOAD_INDEX_PATH"] = os.path.join(root, "upload_index.sqlite3")
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+
+    drive_service = LocalDrive(files_by_id, latency_ms, drive_mbps)
+    blob = LocalBlobStore(os.path.join(root, "blob"), latency_ms)
+    supabase = LocalSupabase(os.path.join(root, "supabase"), latency_ms)
+
+    for name in ("processor", "interactive_processor", "reflow_processor", "drive"):
+        module = importlib.import_module(name)
+        if hasattr(module, "get_drive_service"):
+            module.get_drive_service = lambda: drive_service
+
+    import uploader
+    uploader.put = blob.put
+    uploader.list_blobs = blob.list
+    uploader.requests = blob
+
+    import persistence
+    persistence._client = supabase
+    return {"drive": drive_service, "blob": blob, "supabase": supabase}
+
+# --- Stage timings ---
+class StageTimer:
+    """Cumulative seconds and call counts per stage, from any thread."""
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            totals = self.stages.setdefault(stage, {"seconds": 0.0, "calls": 0})
+            totals["seconds"] += seconds
+            totals["calls"] += 1
+
+    def wrap(self, stage: str, fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - start)
+        return timed
+
+    def instrument(self, stage: str, module_name: str, attr: str) -> None:
+        """
+        Times `module_name.attr` ("func" or "Class.method"). Functions are also
+        replaced in every loaded module that imported them by name.
+        """
+        module = importlib.import_module(module_name)
+        if "." in attr:
+            class_name, method = attr.split(".")
+            cls = getattr(module, class_name)
+            setattr(cls, method, self.wrap(stage, getattr(cls, method)))
+            return
+        original = getattr(module, attr)
+        wrapped = self.wrap(stage, original)
+        for loaded in list(sys.modules.values()):
+            if getattr(loaded, attr, None) is original and getattr(loaded, "__file__", "") and \
+                    os.path.dirname(os.path.abspath(loaded.__file__)) == REPO_ROOT:
+                setattr(loaded, attr, wrapped)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {stage: {"seconds": round(t["seconds"], 4), "calls": int(t["calls"])} for stage, t in sorted(self.stages.items())}
@@ -0,0 +1,144 @@
+"""
+Synthetic magazine PDFs para sa benchmarks.
+
+Deterministic (may seed) na mga pages na kahawig ng totoong issue: masthead,
+multi-column na body text, mga larawan (photos na JPEG at isang paulit-ulit na
+logo na PNG), URI links, at contact text (phones, emails, URLs) para sa hotspots.
+Opsyonal: vector artwork sa likod ng bawat page (gaya ng ads at infographics), para
+sa benchmarks na sumusukat sa pag-interpret ng content stream.
+
+Usage (mula sa repo root):
+    python benchmarks/synthetic_magazine.py out.pdf [pages]
+"""
+import io
+import sys
+import random
+from typing import Optional
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792  # US Letter, points
+MARGIN = 36
+GUTTER = 14
+
+WORDS = (
+    "Manila isla bayan kape merkado sining lungsod festival dagat bundok kultura "
+    "recipe travel fashion negosyo pamilya kwento larawan musika pagkain tindahan "
+    "weekend guide review interview feature season collection design market local"
+).split()
+SECTIONS = ["Travel", "Food", "Business", "Style", "Culture", "Home"]
+
+def _paragraph(rng: random.Random, words: int) -> str:
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+def _contact_line(rng: random.Random) -> str:
+    phone = f"+63 {rng.randint(900, 999)} {rng.randint(100, 999)} {rng.randint(1000, 9999)}"
+    shop = rng.choice(WORDS)
+    return f"Call {phone}\nEmail {shop}@example.com\nwww.{shop}.example.com"
+
+def _photo(rng: random.Random, width: int, height: int) -> bytes:
+    """Noisy gradient na JPEG, para hindi trivial ang compression."""
+    base = Image.linear_gradient("L").resize((width, height))
+    noise = Image.effect_noise((width, height), rng.uniform(20, 60))
+    tint = tuple(rng.randint(60, 255) for _ in range(3))
+    photo = Image.merge("RGB", (Image.blend(base, noise, 0.5), noise, base))
+    photo = Image.blend(photo, Image.new("RGB", (width, height), tint), 0.35)
+    buffer = io.BytesIO()
+    photo.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+def _vector_art(page: fitz.Page, rng: random.Random, shapes: int) -> None:
+    """Maliliit at mapupusyaw na filled curves na nakakalat sa page, isang path bawat shape."""
+    shape = page.new_shape()
+    for _ in range(shapes):
+        x, y = rng.uniform(0, PAGE_WIDTH), rng.uniform(0, PAGE_HEIGHT)
+        points = [fitz.Point(x + rng.uniform(-20, 20), y + rng.uniform(-20, 20)) for _ in range(4)]
+        shape.draw_bezier(*points)
+        shape.draw_line(points[-1], points[0])
+        color = tuple(rng.uniform(0.8, 1.0) for _ in range(3))
+        shape.finish(color=color, fill=color, width=rng.uniform(0.2, 1.5), closePath=True)
+    shape.commit(overlay=False)
+
+def _logo() -> bytes:
+    logo = Image.new("RGB", (240, 80), (200, 30, 40))
+    logo.paste((255, 255, 255), (20, 20, 220, 60))
+    buffer = io.BytesIO()
+    logo.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def make_magazine(
+        path: str,
+        pages: int = 24,
+        columns: int = 3,
+        images_per_page: int = 2,
+        links_per_page: int = 3,
+        paragraphs_per_column: int = 6,
+        seed: int = 7,
+        photo_size: Optional[int] = 900,
+        vector_shapes: int = 0) -> str:
+    """
+    Writes a synthetic magazine to `path` and returns the path. Every page has
+    `columns` text columns, `images_per_page` photos (plus the recurring logo),
+    `links_per_page` URI links and a contact line in each column, over
+    `vector_shapes` filled vector paths.
+    """
+    rng = random.Random(seed)
+    doc = fitz.open()
+    logo = _logo()
+    # Ilang photos lang; paulit-ulit sa iba't ibang pages (iisang xref, gaya ng recurring images sa totoong issue)
+    photos = [_photo(rng, photo_size, int(photo_size * 0.66)) for _ in range(4)]
+    column_width = (PAGE_WIDTH - 2 * MARGIN - (columns - 1) * GUTTER) / columns
+
+    for page_index in range(pages):
+        page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        page_rng = random.Random(seed * 1000 + page_index)
+        if vector_shapes:
+            # Hiwalay na rng, para pareho ang text at layout kahit ilan ang shapes
+            _vector_art(page, random.Random(seed * 1000 + page_index + 500), vector_shapes)
+
+        # Masthead: logo, section at page number
+        page.insert_image(fitz.Rect(MARGIN, MARGIN - 12, MARGIN + 90, MARGIN + 18), stream=logo)
+        section = SECTIONS[page_index % len(SECTIONS)]
+        page.insert_text((MARGIN + 100, MARGIN + 8), f"{section.upper()}  |  {page_index + 1}", fontsize=11, fontname="hebo")
+        title = " ".join(page_rng.choice(WORDS) for _ in range(4)).title()
+        page.insert_textbox(fitz.Rect(MARGIN, MARGIN + 26, PAGE_WIDTH - MARGIN, MARGIN + 70), title, fontsize=24, fontname="tibo")
+
+        # Photos: magkakatabi sa itaas ng body text
+        top = MARGIN + 76
+        if images_per_page:
+            photo_width = (PAGE_WIDTH - 2 * MARGIN - (images_per_page - 1) * GUTTER) / images_per_page
+            for i in range(images_per_page):
+                x0 = MARGIN + i * (photo_width + GUTTER)
+                rect = fitz.Rect(x0, top, x0 + photo_width, top + photo_width * 0.66)
+                page.insert_image(rect, stream=photos[(page_index + i) % len(photos)])
+            top += photo_width * 0.66 + GUTTER
+
+        # Multi-column body text, may contact line sa dulo ng bawat column
+        for column in range(columns):
+            x0 = MARGIN + column * (column_width + GUTTER)
+            rect = fitz.Rect(x0, top, x0 + column_width, PAGE_HEIGHT - MARGIN - 20)
+            paragraphs = [_paragraph(page_rng, page_rng.randint(25, 60)) for _ in range(paragraphs_per_column)]
+            contact = _contact_line(page_rng)
+            # Walang naisusulat ang insert_textbox kapag hindi kasya, kaya bawasan hanggang kumasya
+            while page.insert_textbox(rect, "\n\n".join(paragraphs + [contact]), fontsize=8.5, fontname="tiro", align=fitz.TEXT_ALIGN_JUSTIFY) < 0:
+                paragraphs.pop()
+
+        # URI links sa footer
+        for i in range(links_per_page):
+            x0 = MARGIN + i * 120
+            rect = fitz.Rect(x0, PAGE_HEIGHT - MARGIN - 12, x0 + 110, PAGE_HEIGHT - MARGIN)
+            uri = f"https://{page_rng.choice(WORDS)}.example.com/{page_index + 1}/{i}"
+            page.insert_text((rect.x0, rect.y1 - 2), uri.split("//")[1][:24], fontsize=7, color=(0, 0, 0.8))
+            page.insert_link({"kind": fitz.LINK_URI, "from": rect, "uri": uri})
+
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+    return path
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    out = make_magazine(sys.argv[1], pages=int(sys.argv[2]) if len(sys.argv) > 2 else 24)
+    print(f"Wrote {out}")
@@ -0,0 +1,173 @@
+import fitz  # PyMuPDF
+from typing import Any, Dict
+from supabase import Client
+
+from models import ReflowConfig
+from page_analysis import PageAnalysis
+from image_codecs import ImageEncoder
+from element_images import ElementImageCache
+from srcset import target_widths
+from uploader import SupabaseStorageTarget, UploadPipeline, resolve_uploads
+from incremental import DocumentHasher
+from metrics import annotate_job, count
+from streaming import PageSpool, STREAMING_UPLOAD_MAX_BYTES, trim_store, use_streaming
+from processor import (
+    download_pdf, build_page_image, build_page_srcset, build_page_tiles, extract_hotspots,
+    upload_page_image, upload_page_srcset, upload_page_tiles,
+    upload_image_manifest, empty_hotspots, get_page_dimensions, save_to_database, BLOB_TARGET,
+    image_fingerprints, load_previous_image_pages, merge_image_pages
+)
+from interactive_processor import (
+    build_interactive_page, publish_interactive_manifest, interactive_fingerprints, load_previous_interactive_pages
+)
+from reflow_processor import (
+    reconstruct_page_layout, publish_reflow_content, reflow_fingerprints, load_previous_reflow_pages
+)
+
+# --- "Analyze Once, Emit All" Processor ---
+# Isang beses lang dina-download at binubuksan ang PDF. Ang bawat page ay
+# ina-analyze nang isang beses (render, autocrop, text, links, images) at ang
+# parehong analysis ang ipinapasa sa output generators ng tatlong processors.
+# Ang srcset sizes ay isang beses lang nire-render at ine-encode bawat page, kahit
+# ina-upload ito para sa image at interactive outputs.
+# Sa incremental run, ang page ay ina-analyze lang kung nagbago ito para sa kahit
+# isang output; ang ibang outputs ay gumagamit ng dati nilang entry.
+
+def process_pdf_all(file_id: str, config: ReflowConfig, supabase: Client) -> Dict[str, Any]:
+    """
+    Produces the image manifest, the interactive manifest and the reflow
+    content.json for one issue in a single pass over the document.
+    """
+    issue_name = config.issue_number
+    print(f"--- 🚀 COMBINED PROCESSOR INITIATED for: {issue_name} 🚀 ---")
+    annotate_job(issue=issue_name)
+    srcset = target_widths(config.srcset_widths)
+
+    # 1. Download at buksan ang PDF nang isang beses lang
+    pdf_path = download_pdf(file_id)
+    doc = fitz.open(pdf_path)
+    page_count = len(doc)
+    streaming = use_streaming(config.streaming, page_count)
+    if streaming:
+        print(f"  - Streaming mode: {page_count} pages, per-page results spooled to disk")
+
+    storage = SupabaseStorageTarget(supabase, "magazine-pages")
+    encoder = ImageEncoder.from_config(config)
+    image_cache = ElementImageCache(native=config.native_images)
+    image_urls = []
+    hotspots = empty_hotspots()
+    # Sa streaming mode, ang interactive at reflow entries ng bawat page ay isinusulat agad sa disk
+    interactive_pages = PageSpool() if streaming else []
+    reflow_pages = PageSpool() if streaming else []
+    interactive_manifest = {
+        "issue_number": issue_name,
+        "publication_date": config.publication_date,
+        "table_of_contents": config.table_of_contents,
+        "image_format": encoder.image_format,
+        "pages": interactive_pages
+    }
+    structured_magazine = {
+        "issue_number": issue_name,
+        "publication_date": config.publication_date,
+        "table_of_contents": config.table_of_contents,
+        "image_format": encoder.image_format,
+        "pages": reflow_pages
+    }
+
+    # Iisang hasher: ang page hashes ay kinukwenta nang isang beses para sa tatlong outputs
+    hasher = DocumentHasher(doc)
+    image_fps = image_fingerprints(
+        doc, issue_name, config.table_of_contents, encoder, config.tile_pyramid,
+        config.incremental, config.force_pages, hasher=hasher, srcset=srcset
+    )
+    interactive_fps = interactive_fingerprints(doc, storage, config, encoder, hasher=hasher)
+    reflow_fps = reflow_fingerprints(doc, storage, config, encoder, hasher=hasher)
+
+    with UploadPipeline(max_bytes_in_flight=STREAMING_UPLOAD_MAX_BYTES if streaming else None) as pipeline:
+        # Para sa re-runs: ang mga artifacts na walang pagbabago ay hindi na ia-upload ulit
+        pipeline.load_marker(BLOB_TARGET, f"magazine-pages/{issue_name}/")
+        pipeline.load_marker(storage, f"{issue_name}/")
+        previous_images = image_fps.load_previous(lambda: load_previous_image_pages(issue_name))
+        previous_interactive = interactive_fps.load_previous(lambda: load_previous_interactive_pages(storage, issue_name))
+        previous_reflow = reflow_fps.load_previous(lambda: load_previous_reflow_pages(storage, issue_name))
+
+        # 2. Isang analysis bawat page, ipinapasa sa lahat ng output generators
+        for page_num in range(page_count):
+            page_number = page_num + 1
+            if not (image_fps.changed(page_number) or interactive_fps.changed(page_number) or reflow_fps.changed(page_number)):
+                interactive_pages.append(previous_interactive[page_number])
+                reflow_pages.append(previous_reflow[page_number])
+                count("pages_reused")
+                continue
+            page = doc.load_page(page_num)
+            print(f"\n--- Processing Page {page_number}/{page_count} (all outputs) ---")
+            analysis = PageAnalysis(page, page_number, encoder=encoder)
+            count("pages")
+
+            if image_fps.changed(page_number):
+                image_entry, image_bytes = build_page_image(analysis)
+                upload_page_image(pipeline, issue_name, image_entry, image_bytes)
+                if srcset:
+                    upload_page_srcset(pipeline, issue_name, image_entry, build_page_srcset(analysis, image_entry, srcset))
+                if config.tile_pyramid:
+                    upload_page_tiles(pipeline, issue_name, image_entry, build_page_tiles(analysis, image_entry))
+                image_urls.append(image_entry)
+                for kind, items in extract_hotspots(analysis).items():
+                    hotspots[kind].extend(items)
+
+            if interactive_fps.changed(page_number):
+                interactive_pages.append(build_interactive_page(analysis, issue_name, storage, pipeline, image_cache, srcset))
+            else:
+                interactive_pages.append(previous_interactive[page_number])
+
+            if reflow_fps.changed(page_number):
+                page_content = reconstruct_page_layout(supabase, page, doc, issue_name, page_number, pipeline, analysis=analysis, image_cache=image_cache)
+                reflow_pages.append({"page_number": page_number, "content": page_content})
+            else:
+                reflow_pages.append(previous_reflow[page_number])
+
+            if streaming:
+                analysis.release()
+                trim_store()
+
+        # 3. Hintayin ang lahat ng uploads bago isulat ang mga manifest
+        print(f"\n  - Element images: {image_cache.summary()}")
+        print("\n--- Waiting for pending uploads ---")
+        pipeline.join()
+        resolve_uploads(image_urls)
+        resolve_uploads(interactive_manifest)
+        resolve_uploads(structured_magazine)
+        changed_urls = image_urls
+        image_urls, hotspots = merge_image_pages(page_count, image_urls, hotspots, previous_images)
+
+        # 4. Isulat ang tatlong outputs, sa parehong pagkakasunod ng hiwalay na endpoints
+        manifest_url = upload_image_manifest(pipeline, file_id, issue_name, page_count, image_urls, hotspots)
+        save_to_database(
+            issue_name=issue_name,
+            publication_date=config.publication_date,
+            manifest_url=manifest_url,
+            cover_image_url=image_urls[0]['url'] if image_urls else None,
+            page_dimensions=get_page_dimensions(doc),
+            pages_data=changed_urls if image_fps.is_patch else image_urls,
+            toc_data=config.table_of_contents
+        )
+        interactive_manifest_url = publish_interactive_manifest(supabase, pipeline, storage, config, interactive_manifest)
+        reflow_content_url = publish_reflow_content(supabase, pipeline, storage, config, structured_magazine)
+        # Pagkatapos lang ng database writes, para hindi ma-reuse ang pages na hindi naisulat
+        for fingerprints in (image_fps, interactive_fps, reflow_fps):
+            fingerprints.publish(pipeline)
+        pipeline.publish_marker(BLOB_TARGET, f"magazine-pages/{issue_name}/")
+        pipeline.publish_marker(storage, f"{issue_name}/")
+
+    for pages in (interactive_pages, reflow_pages):
+        if isinstance(pages, PageSpool):
+            pages.close()
+    print(f"\n--- ✅ COMBINED PROCESSING COMPLETE for: {issue_name} ---")
+    return {
+        "status": "success",
+        "processor": "combined",
+        "page_count": page_count,
+        "manifest_url": manifest_url,
+        "interactive_manifest_url": interactive_manifest_url,
+        "reflow_content_url": reflow_content_url,
+    }
@@ -0,0 +1,337 @@
+import os
+import re
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import httplib2
+from google.oauth2 import service_account
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build
+from googleapiclient.http import MediaIoBaseDownload
+from metrics import timed
+
+# --- Google Drive Client ---
+# Iisang Drive service bawat process, ginagawa sa unang tawag. Ginagamit ang discovery
+# document na kasama ng google-api-python-client (walang HTTP fetch), at ang
+# credentials (pati ang OAuth token nito) ay naka-cache sa pagitan ng jobs.
+# Hindi thread-safe ang httplib2, kaya ang bawat thread ay may sariling
+# AuthorizedHttp na gumagamit ng parehong credentials.
+#
+# --- Disk-Backed Google Drive Downloads ---
+# Ang PDF ay dina-download diretso sa isang file (hindi sa RAM), at binubuksan ng
+# fitz gamit ang path. Hinahati ang file sa DOWNLOAD_CHUNK_SIZE na HTTP Range requests
+# na sabay-sabay (DOWNLOAD_WORKERS) na isinusulat sa tamang offset ng isang
+# preallocated na `.part` file. Ang mga natapos na chunks ay nire-record sa katabing
+# `.part.json`, kaya kapag pumalya ang download, ang kulang na chunks lang ang
+# kukunin ulit (sa parehong job o sa susunod). Sine-check ang md5Checksum ng Drive
+# bago ilipat ang file sa cache. Kapag walang `size` ang metadata, isang buong
+# (hindi ranged) download ang ginagawa; ang walang lamang file ay hindi kailanman
+# kina-cache.
+#
+# Ang mga na-download na files ay naka-cache sa disk (LRU, may size cap), kaya ang
+# paulit-ulit na jobs sa parehong file ay hindi na magda-download ulit.
+
+DRIVE_SCOPES = ['https://www.googleapis.com/auth/drive.readonly'] # Read-only lang ang kailangan
+# Laki ng bawat Range request
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("DRIVE_CHUNK_BYTES", str(8 * 1024 * 1024)))
+# Ilang Range requests ang sabay na tumatakbo
+DOWNLOAD_WORKERS = int(os.getenv("DRIVE_DOWNLOAD_WORKERS", "4"))
+# Ilang pass sa mga kulang na chunks bago sumuko (bukod pa sa retries ng bawat request)
+DOWNLOAD_ATTEMPTS = int(os.getenv("DRIVE_DOWNLOAD_ATTEMPTS", "3"))
+DOWNLOAD_TIMEOUT_SECONDS = float(os.getenv("DRIVE_DOWNLOAD_TIMEOUT", "60"))
+
+_service = None
+_credentials = None
+_service_lock = threading.Lock()
+_thread_local = threading.local()
+_download_locks: Dict[str, threading.Lock] = {}
+_download_locks_lock = threading.Lock()
+
+def get_drive_service():
+    """Ang shared na Drive service ng process; ginagawa sa unang tawag."""
+    global _service, _credentials
+    with _service_lock:
+        if _service is None:
+            client_email = os.getenv("GOOGLE_CLIENT_EMAIL")
+            private_key_raw = os.getenv("GOOGLE_PRIVATE_KEY")
+            if not client_email or not private_key_raw:
+                raise ValueError("GOOGLE_CLIENT_EMAIL and GOOGLE_PRIVATE_KEY environment variables must be set.")
+            _credentials = service_account.Credentials.from_service_account_info(
+                {
+                    "type": "service_account",
+                    "private_key": private_key_raw.replace('\\n', '\n'),
+                    "client_email": client_email,
+                    "token_uri": "https://oauth2.googleapis.com/token",
+                },
+                scopes=DRIVE_SCOPES
+            )
+            # static_discovery: ang drive v3 discovery document na kasama ng library
+            _service = build('drive', 'v3', credentials=_credentials, static_discovery=True, cache_discovery=False)
+            print("  > Drive client created (static discovery document).")
+        return _service
+
+def thread_http() -> Optional[AuthorizedHttp]:
+    """
+    Ang AuthorizedHttp ng kasalukuyang thread, para sa `request.execute(http=...)`.
+    None kapag hindi galing sa `get_drive_service` ang service (ang sariling http ng request ang gagamitin).
+    """
+    if _credentials is None:
+        return None
+    http = getattr(_thread_local, "http", None)
+    if http is None:
+        http = _thread_local.http = AuthorizedHttp(_credentials, http=httplib2.Http(timeout=DOWNLOAD_TIMEOUT_SECONDS))
+    return http
+
+class DownloadCache:
+    """
+    Size-capped LRU cache of downloaded Drive files.
+
+    Entries are keyed by Drive file ID plus md5Checksum (or modifiedTime when
+    Drive has no checksum), so a changed file never hits a stale entry.
+    Partial downloads kept for resuming count toward the cap too.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.cache_dir = cache_dir or os.getenv("DRIVE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "drive-cache"))
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv("DRIVE_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def path_for(self, file_id: str, version: str) -> str:
+        key = re.sub(r'[^A-Za-z0-9_.-]', '_', f"{file_id}-{version}")
+        return os.path.join(self.cache_dir, f"{key}.pdf")
+
+    def get(self, path: str) -> Optional[str]:
+        """Returns the cached path (marking it recently used), or None on a miss."""
+        try:
+            if os.path.getsize(path) == 0:
+                # Sirang entry (walang lamang download); ida-download ulit
+                os.remove(path)
+                return None
+            os.utime(path)
+            return path
+        except FileNotFoundError:
+            return None
+
+    def add(self, tmp_path: str, path: str) -> str:
+        """Moves a finished download into the cache, then evicts the least recently used files."""
+        os.replace(tmp_path, path)
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                # Kasama ang naiwang partial downloads (`.part`)
+                if not name.endswith((".pdf", ".pdf.part")):
+                    continue
+                full = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(full)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, full))
+            total = sum(size for _, size, _ in entries)
+            # Pinakamatagal na hindi nagamit ang unang buburahin.
+            # Ligtas burahin kahit bukas pa sa ibang job (POSIX), dahil hawak pa nito ang file handle.
+            for _, size, full in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if full == keep or _downloading(full):
+                    continue
+                os.remove(full)
+                if full.endswith(".part"):
+                    _remove_if_exists(full + ".json")
+                total -= size
+                print(f"  > Evicted cached download: {os.path.basename(full)}")
+
+_default_cache: Optional[DownloadCache] = None
+
+def get_download_cache() -> DownloadCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = DownloadCache()
+    return _default_cache
+
+def get_file_metadata(service: Any, file_id: str) -> Dict[str, Any]:
+    return service.files().get(
+        fileId=file_id, fields="id,size,md5Checksum,modifiedTime", supportsAllDrives=True
+    ).execute(http=thread_http(), num_retries=3)
+
+class DownloadProgress:
+    """Completed chunk indexes of a `.part` file, saved beside it so a failed download resumes where it stopped."""
+
+    def __init__(self, path: str, size: int, chunk_size: int):
+        self.path = path
+        self.size = size
+        self.chunk_size = chunk_size
+        self.done: Set[int] = set()
+        self._lock = threading.Lock()
+        try:
+            with open(path) as f:
+                saved = json.load(f)
+        except (FileNotFoundError, ValueError):
+            saved = None
+        # Ang progress ng ibang laki o chunk size ay hindi na magagamit
+        if saved and saved.get("size") == size and saved.get("chunk_size") == chunk_size:
+            self.done = set(saved["done"])
+
+    def mark(self, index: int) -> None:
+        with self._lock:
+            self.done.add(index)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"size": self.size, "chunk_size": self.chunk_size, "done": sorted(self.done)}, f)
+            os.replace(tmp_path, self.path)
+
+def chunk_ranges(size: int, chunk_size: Optional[int] = None) -> List[Tuple[int, int]]:
+    """Inclusive (start, end) byte ranges na sumasakop sa `size` bytes."""
+    chunk_size = chunk_size or DOWNLOAD_CHUNK_SIZE
+    return [(start, min(start + chunk_size, size) - 1) for start in range(0, size, chunk_size)]
+
+def fetch_range(service: Any, file_id: str, start: int, end: int) -> bytes:
+    """Downloads bytes `start`..`end` (inclusive) of a Drive file with one HTTP Range request."""
+    request = service.files().get_media(fileId=file_id)
+    request.headers["range"] = f"bytes={start}-{end}"
+    data = request.execute(http=thread_http(), num_retries=3)
+    if len(data) != end - start + 1:
+        # Hal. kapag hindi sinunod ng server ang Range header
+        raise IOError(f"Expected {end - start + 1} bytes for range {start}-{end}, got {len(data)}")
+    return data
+
+def file_md5(path: str) -> str:
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def download_ranges(service: Any, file_id: str, size: int, part_path: str, workers: Optional[int] = None) -> None:
+    """
+    Downloads a Drive file of `size` bytes into `part_path` with concurrent Range
+    requests, skipping chunks a previous attempt already wrote. Raises if chunks
+    are still missing after DOWNLOAD_ATTEMPTS passes; the `.part` file and its
+    progress are kept for the next attempt.
+    """
+    workers = workers or DOWNLOAD_WORKERS
+    ranges = chunk_ranges(size)
+    progress = DownloadProgress(part_path + ".json", size, DOWNLOAD_CHUNK_SIZE)
+    if progress.done:
+        print(f"  > Resuming download: {len(progress.done)}/{len(ranges)} chunks already on disk.")
+    fd = os.open(part_path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        # I-reserve agad ang buong laki, para hindi maubusan ng disk sa gitna ng download
+        if size and hasattr(os, "posix_fallocate"):
+            os.posix_fallocate(fd, 0, size)
+        else:
+            os.ftruncate(fd, size)
+
+        def fetch(index: int) -> None:
+            start, end = ranges[index]
+            os.pwrite(fd, fetch_range(service, file_id, start, end), start)
+            progress.mark(index)
+
+        for attempt in range(1, DOWNLOAD_ATTEMPTS + 1):
+            missing = [i for i in range(len(ranges)) if i not in progress.done]
+            if not missing:
+                break
+            errors = []
+            with ThreadPoolExecutor(max_workers=min(workers, len(missing)), thread_name_prefix="drive-download") as pool:
+                for future in [pool.submit(fetch, i) for i in missing]:
+                    try:
+                        future.result()
+                    except Exception as e:
+                        errors.append(e)
+            if errors:
+                print(f"  > ⚠️ {len(errors)} chunk(s) failed on attempt {attempt}/{DOWNLOAD_ATTEMPTS}: {errors[0]}")
+    finally:
+        os.close(fd)
+
+    missing = len(ranges) - len(progress.done)
+    if missing:
+        raise IOError(f"Download of {file_id} incomplete: {missing} of {len(ranges)} chunks missing (will resume on the next attempt).")
+
+def download_whole(service: Any, file_id: str, part_path: str) -> None:
+    """
+    Downloads a Drive file into `part_path` with one non-ranged request, streamed
+    to disk in DOWNLOAD_CHUNK_SIZE pieces. For files whose size Drive does not report.
+    """
+    request = service.files().get_media(fileId=file_id)
+    http = thread_http()
+    if http is not None:
+        request.http = http
+    with open(part_path, "wb") as f:
+        downloader = MediaIoBaseDownload(f, request, chunksize=DOWNLOAD_CHUNK_SIZE)
+        done = False
+        while not done:
+            _, done = downloader.next_chunk(num_retries=3)
+
+def _download_lock(path: str) -> threading.Lock:
+    # Isang download lang bawat cache path; ang ibang job na pareho ang file ay maghihintay at gagamit ng cache
+    with _download_locks_lock:
+        return _download_locks.setdefault(path, threading.Lock())
+
+def _downloading(path: str) -> bool:
+    """True kapag dina-download pa ngayon ang cache path (o ang `.part` nito)."""
+    base = path[:-len(".part")] if path.endswith(".part") else path
+    lock = _download_locks.get(base)
+    return lock is not None and lock.locked()
+
+def _remove_if_exists(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+@timed("download")
+def download_to_cache(service: Any, file_id: str) -> str:
+    """
+    Downloads a Drive file into the local download cache and returns its path.
+    The file is fetched in concurrent Range requests written straight to disk,
+    so it never sits in RAM, and a failed download resumes on the next call.
+    """
+    cache = get_download_cache()
+    metadata = get_file_metadata(service, file_id)
+    version = metadata.get("md5Checksum") or metadata.get("modifiedTime") or "unversioned"
+    path = cache.path_for(file_id, version)
+
+    with _download_lock(path):
+        cached = cache.get(path)
+        if cached:
+            print(f"  > Using cached download for file_id: {file_id}")
+            return cached
+
+        part_path = path + ".part"
+        start = time.perf_counter()
+        if metadata.get("size") is None:
+            # Hindi alam ang laki, kaya hindi mahahati sa Range requests
+            print(f"  > ⚠️ Drive reported no size for {file_id}; downloading it in one request.")
+            _remove_if_exists(part_path + ".json")
+            download_whole(service, file_id, part_path)
+            requests = 1
+        elif int(metadata["size"]) == 0:
+            raise IOError(f"Drive file {file_id} is empty (size 0).")
+        else:
+            download_ranges(service, file_id, int(metadata["size"]), part_path)
+            requests = len(chunk_ranges(int(metadata["size"])))
+        size = os.path.getsize(part_path)
+        if size == 0:
+            os.remove(part_path)
+            _remove_if_exists(part_path + ".json")
+            raise IOError(f"Download of {file_id} is empty; not caching it.")
+        expected_md5 = metadata.get("md5Checksum")
+        if expected_md5 and file_md5(part_path) != expected_md5:
+            # Sira ang na-resume na file; sa susunod na attempt, simula ulit
+            os.remove(part_path)
+            _remove_if_exists(part_path + ".json")
+            raise IOError(f"Download of {file_id} failed the md5 check; discarded the partial file.")
+        _remove_if_exists(part_path + ".json")
+        seconds = time.perf_counter() - start
+        print(f"  > Downloaded {size} bytes to disk in {seconds:.2f}s ({requests} request(s), up to {DOWNLOAD_WORKERS} at a time).")
+        return cache.add(part_path, path)
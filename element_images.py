@@ -0,0 +1,165 @@
+import os
+import hashlib
+import fitz  # PyMuPDF
+from typing import Any, Dict, Optional, Tuple
+from image_codecs import ImageEncoder
+from page_analysis import PageAnalysis
+from uploader import UploadPipeline
+from metrics import timed
+
+# --- Per-Issue Element Image Cache ---
+# Ang parehong logo, masthead o ad (parehong xref) ay lumalabas sa maraming pages.
+# Sa isang document run, ang bawat natatanging image ay isang beses lang ina-upload;
+# ang mga susunod na placements ay tumuturo sa parehong URL.
+#
+# Ang render ay clip ng buong page, kaya kasama ang text o graphics na nakapatong sa
+# image at iba-iba ito bawat placement kahit pareho ang xref at size. Kaya nire-render
+# ang bawat placement, at ang key ay (target, sha256 ng encoded bytes): ang upload
+# lang ang naiiwasan kapag pareho ang lumabas na pixels.
+#
+# Content-addressed ang paths: `{prefix}/{sha256 ng bytes}.{ext}`. Hindi nakabatay sa
+# page number o xref (nagbabago ang xrefs kapag na-save ulit ang PDF), kaya ang upload
+# ng bagong run ay hindi kailanman napapatungan ang file na tinuturo pa ng reused pages
+# (incremental mode) o ng ibang size ng parehong image.
+# Ang clips ay mula sa display list ng page (PageAnalysis.render), kaya mura ang
+# render: hindi na ini-interpret ulit ang content stream para sa bawat element.
+#
+# --- Native Extraction Mode ---
+# Sa native mode, ang simpleng placements (walang rotation/flip, walang mask, buo sa
+# loob ng page, walang clipping path na nagka-crop dito) ay kinukuha mula sa mismong
+# image stream ng PDF sa halip na i-render ang page clip. Ang JPEG ay ina-upload nang walang transcoding; ang ibang formats
+# ay ine-encode mula sa orihinal na pixels ng image. Ang clip render pa rin ang
+# fallback para sa lahat ng iba pang kaso. Ang native images ay hindi nakadepende sa
+# laki ng placement, kaya ang key ay (target, xref, "native").
+
+# Mga format ng image stream na ina-upload as-is (comma-separated). Ang "jpx" (JPEG 2000)
+# ay puwedeng idagdag, pero hindi ito nababasa ng karamihan ng browsers.
+NATIVE_PASSTHROUGH_FORMATS = {
+    fmt.strip().lower() for fmt in os.getenv("NATIVE_IMAGE_PASSTHROUGH", "jpeg").split(",") if fmt.strip()
+}
+
+PASSTHROUGH_CONTENT_TYPES = {"jpeg": "image/jpeg", "jpx": "image/jp2", "png": "image/png"}
+# Pagitan (PDF points) na hindi itinuturing na pag-crop ng clip sa gilid ng image
+CLIP_TOLERANCE = 0.5
+
+class ElementImageCache:
+    """Content-keyed (xref-keyed for native images) cache of uploaded element images for one document run."""
+
+    def __init__(self, native: bool = False):
+        self.native = native
+        self._urls: Dict[Tuple[Any, ...], Any] = {}
+        self.rendered = 0
+        self.extracted = 0
+        self.reused = 0
+
+    def __len__(self) -> int:
+        return len(self._urls)
+
+    def get(self, key: Tuple[Any, ...]) -> Any:
+        return self._urls.get(key)
+
+    def put(self, key: Tuple[Any, ...], url: Any) -> None:
+        self._urls[key] = url
+
+    def summary(self) -> str:
+        if self.native:
+            return f"{self.extracted} extracted, {self.rendered} rendered, {len(self)} uploaded, {self.reused} reused"
+        return f"{self.rendered} rendered, {len(self)} uploaded, {self.reused} reused"
+
+def content_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:32]
+
+def content_path(prefix: str, data: bytes, extension: str) -> str:
+    """Content-addressed storage path ng `data` sa ilalim ng `prefix`."""
+    return f"{prefix}/{content_digest(data)}.{extension}"
+
+def is_plain_placement(analysis: PageAnalysis, img_info: Dict[str, Any]) -> bool:
+    """
+    True kapag ang placement ay diretsong drawing ng buong image: walang mask,
+    walang rotation, skew o flip, buo sa loob ng page, at hindi naka-clip.
+    """
+    if img_info.get('has-mask'):
+        return False
+    a, b, c, d, _, _ = img_info['transform']
+    if b != 0 or c != 0 or a <= 0 or d <= 0:
+        return False
+    bbox = fitz.Rect(img_info['bbox'])
+    if not analysis.page.rect.contains(bbox):
+        return False
+    # Ang image sa frame (karaniwan sa InDesign exports) ay naka-clip: bahagi lang ng image
+    # stream ang nakikita. Hindi alam kung aling clip ang saklaw ng image, kaya ang anumang
+    # clip na tumatama sa placement ay dapat rectangle na buong naglalaman nito.
+    for scissor, is_rectangle in analysis.clip_paths:
+        if not scissor.intersects(bbox):
+            continue
+        frame = fitz.Rect(scissor.x0 - CLIP_TOLERANCE, scissor.y0 - CLIP_TOLERANCE, scissor.x1 + CLIP_TOLERANCE, scissor.y1 + CLIP_TOLERANCE)
+        if not is_rectangle or not frame.contains(bbox):
+            return False
+    return True
+
+def extract_native_image(doc: fitz.Document, xref: int, encoder: ImageEncoder) -> Optional[Tuple[bytes, str, str]]:
+    """
+    (image bytes, extension, content type) mula sa image stream ng `xref`, o None
+    kung kailangang i-render ang clip. Ang passthrough formats ay hindi tina-transcode.
+    """
+    info = doc.extract_image(xref)
+    if not info or info.get('smask'):
+        return None
+    ext = info['ext'].lower()
+    # CMYK at ibang colorspaces ay hindi maayos na naipapakita ng browsers kapag passthrough
+    if ext in NATIVE_PASSTHROUGH_FORMATS and info['colorspace'] in (1, 3):
+        return info['image'], ext, PASSTHROUGH_CONTENT_TYPES.get(ext, "application/octet-stream")
+
+    pix = fitz.Pixmap(doc, xref)
+    if pix.colorspace is None or pix.colorspace.n not in (1, 3):
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    return encoder.encode(pix), encoder.extension, encoder.content_type
+
+@timed("element_images")
+def upload_element_image(
+        cache: Optional[ElementImageCache],
+        pipeline: UploadPipeline,
+        target: Any,
+        analysis: PageAnalysis,
+        img_info: Dict[str, Any],
+        prefix: str,
+        encoder: ImageEncoder,
+        matrix: fitz.Matrix = fitz.Identity) -> Any:
+    """
+    Returns the URL (a Future until the pipeline is joined) of the image
+    placement `img_info` (an entry of the page's `analysis.image_info`).
+    Every clip placement is rendered; the bytes are uploaded only on a cache
+    miss, to a content-addressed path under `prefix` (see `content_path`), and a
+    hit returns the URL of the first upload of the same bytes.
+    """
+    page = analysis.page
+    xref, bbox = img_info['xref'], img_info['bbox']
+
+    if cache is not None and cache.native and is_plain_placement(analysis, img_info):
+        key = (target.name, xref, "native")
+        url = cache.get(key)
+        if url is not None:
+            cache.reused += 1
+            return url
+        native = extract_native_image(page.parent, xref, encoder)
+        if native is not None:
+            image_bytes, ext, content_type = native
+            url = pipeline.submit(target, content_path(prefix, image_bytes, ext), image_bytes, content_type)
+            cache.extracted += 1
+            cache.put(key, url)
+            return url
+
+    image_bytes = encoder.encode(analysis.render(matrix, clip=bbox))
+    digest = content_digest(image_bytes)
+    key = (target.name, digest)
+    if cache is not None:
+        cache.rendered += 1
+        url = cache.get(key)
+        if url is not None:
+            cache.reused += 1
+            return url
+
+    url = pipeline.submit(target, f"{prefix}/{digest}.{encoder.extension}", image_bytes, encoder.content_type)
+    if cache is not None:
+        cache.put(key, url)
+    return url
@@ -0,0 +1,67 @@
+import re
+import fitz  # PyMuPDF
+from typing import Any, Dict, List, Pattern, Tuple, Union
+
+# --- Text Hotspot Engine ---
+# Isang pass lang sa character-level text (`rawdict`) ng page: bawat span ay
+# sinasala ng mga precompiled na regex, at ang bbox ng bawat match ay kinukuha
+# mula sa bboxes ng mismong mga characters nito. Walang `page.search_for`, kaya
+# linear ang oras sa dami ng text kahit siksik sa contacts ang page.
+
+# ✨ I-DEFINE ANG MGA REGEX PATTERNS DITO ✨
+email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
+phone_pattern = r'\b(?:\+?(\d{1,3}))?[-. (]*(\d{3})[-. )]*(\d{3})[-. ]*(\d{4})\b'
+# Mas simpleng URL pattern para sa text
+url_pattern = r'\b(?:https?://|www\.)(?:[-\w.]|(?:%[\da-fA-F]{2}))+\b'
+
+# Registry ng text hotspot types: manifest key -> (label para sa logs, compiled pattern).
+# Ang pagkakasunod dito ang pagkakasunod ng keys sa manifest.
+HOTSPOT_TYPES: Dict[str, Tuple[str, Pattern[str]]] = {}
+
+def register_hotspot_type(kind: str, pattern: Union[str, Pattern[str]], label: str = None) -> None:
+    """
+    Adds (or replaces) a text hotspot type. Matches are written to the
+    manifest under `hotspots[kind]` as {"page", "value", "bbox"} entries.
+    """
+    compiled = re.compile(pattern) if isinstance(pattern, str) else pattern
+    HOTSPOT_TYPES[kind] = (label or kind, compiled)
+
+register_hotspot_type("emails", email_pattern, "Email")
+register_hotspot_type("phones", phone_pattern, "Phone")
+register_hotspot_type("urls", url_pattern, "URL")
+
+def empty_hotspots() -> Dict[str, List[Dict[str, Any]]]:
+    hotspots = {"links": []}
+    for kind in HOTSPOT_TYPES:
+        hotspots[kind] = []
+    return hotspots
+
+def match_bbox(chars: List[Dict[str, Any]], start: int, end: int) -> List[float]:
+    """Ang union ng bboxes ng chars[start:end]."""
+    rect = fitz.Rect(chars[start]["bbox"])
+    for char in chars[start + 1:end]:
+        rect |= char["bbox"]
+    return list(rect)
+
+def find_text_hotspots(raw_dict: Dict[str, Any], page_num: int) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Scans every span of a page's `rawdict` once with each registered pattern.
+    Returns {kind: [hotspot, ...]} for all registered kinds, in span order.
+    """
+    found = {kind: [] for kind in HOTSPOT_TYPES}
+    for block in raw_dict["blocks"]:
+        for line in block.get("lines", ()):
+            for span in line["spans"]:
+                chars = span["chars"]
+                if not chars:
+                    continue
+                # Ang text ng span ay katumbas ng text sa `dict`; 1 index = 1 char
+                text = "".join(char["c"] for char in chars)
+                for kind, (label, pattern) in HOTSPOT_TYPES.items():
+                    for match in pattern.finditer(text):
+                        if match.start() == match.end():
+                            continue
+                        bbox = match_bbox(chars, match.start(), match.end())
+                        print(f"      [DEBUG] Found {label}: '{match.group(0)}' at {bbox}")
+                        found[kind].append({"page": page_num, "value": match.group(0), "bbox": bbox})
+    return found
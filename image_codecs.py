@@ -0,0 +1,125 @@
+import io
+import os
+import fitz  # PyMuPDF
+from typing import Any, Optional
+from PIL import Image
+from metrics import timed
+
+# --- Image Output Codecs ---
+# Dito ine-encode ang lahat ng page at element images. Ang PNG ay lossless pero
+# mabigat para sa text-heavy pages; ang WebP at AVIF ay ilang beses na mas maliit
+# sa parehong visual quality. Ang text-only pages ay puwedeng i-palette quantize
+# (kaunting kulay lang naman ang text), para mas maliit pa at malinaw pa rin ang letra.
+
+# Optional: ang Pillow < 11.2 ay walang built-in AVIF; ang `pillow-avif-plugin` ang nagdadagdag nito
+try:
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+IMAGE_FORMATS = {
+    "png": {"extension": "png", "content_type": "image/png", "pil_format": "PNG"},
+    "webp": {"extension": "webp", "content_type": "image/webp", "pil_format": "WEBP"},
+    "avif": {"extension": "avif", "content_type": "image/avif", "pil_format": "AVIF"},
+}
+
+DEFAULT_IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "png").lower()
+DEFAULT_IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "80"))
+# Ilang kulay ang matitira sa quantized text-only pages
+QUANTIZE_COLORS = int(os.getenv("IMAGE_QUANTIZE_COLORS", "64"))
+# AVIF encoder speed, 0 (pinakamabagal, pinakamaliit) hanggang 10; 6 ang default ng Pillow
+AVIF_SPEED = int(os.getenv("IMAGE_AVIF_SPEED", "6"))
+
+def is_format_supported(image_format: str) -> bool:
+    """True kapag kaya ng naka-install na Pillow na mag-encode sa format na ito."""
+    Image.init()
+    return IMAGE_FORMATS[image_format]["pil_format"] in Image.SAVE
+
+def extension_for(image_format: str) -> str:
+    return IMAGE_FORMATS[image_format]["extension"]
+
+def content_type_for(image_format: str) -> str:
+    return IMAGE_FORMATS[image_format]["content_type"]
+
+def pixmap_to_image(pix: fitz.Pixmap) -> Image.Image:
+    """Wraps the pixmap samples in a Pillow image (gray, RGB or RGBA)."""
+    if pix.colorspace is None or pix.colorspace.n not in (1, 3):
+        # CMYK, alpha-only, atbp.: i-convert muna sa RGB
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    mode = {1: "L", 3: "RGB"}[pix.colorspace.n] + ("A" if pix.alpha else "")
+    return Image.frombytes(mode, (pix.width, pix.height), pix.samples_mv)
+
+class ImageEncoder:
+    """
+    Encodes pixmaps into the configured output format.
+
+    If the requested format cannot be encoded by the installed Pillow
+    (e.g. AVIF without the plugin), it falls back to WebP, then PNG. The
+    format actually used is `image_format`; record that, not the request.
+    """
+
+    def __init__(self, image_format: Optional[str] = None, quality: Optional[int] = None, quantize_text_pages: bool = False):
+        requested = (image_format or DEFAULT_IMAGE_FORMAT).lower()
+        if requested not in IMAGE_FORMATS:
+            raise ValueError(f"Unsupported image format: {requested}")
+        self.image_format = requested
+        for fallback in ("webp", "png"):
+            if is_format_supported(self.image_format):
+                break
+            print(f"  > ⚠️ Hindi ma-encode ang '{self.image_format}' sa Pillow na ito. Gagamitin ang '{fallback}'.")
+            self.image_format = fallback
+        self.quality = quality if quality is not None else DEFAULT_IMAGE_QUALITY
+        self.quantize_text_pages = quantize_text_pages
+
+    @classmethod
+    def from_config(cls, config: Any) -> "ImageEncoder":
+        """Gumawa ng encoder mula sa ReflowConfig (image_format, image_quality, quantize_text_pages)."""
+        return cls(config.image_format, config.image_quality, config.quantize_text_pages)
+
+    @property
+    def extension(self) -> str:
+        return extension_for(self.image_format)
+
+    @property
+    def content_type(self) -> str:
+        return content_type_for(self.image_format)
+
+    @timed("encode")
+    def encode(self, pix: fitz.Pixmap, text_only: bool = False) -> bytes:
+        """
+        Encodes one pixmap. Pass `text_only=True` for pages without raster
+        images so they are palette-quantized when `quantize_text_pages` is on.
+        """
+        quantize = self.quantize_text_pages and text_only
+        if self.image_format == "png" and not quantize:
+            # Walang binago: diretsong PNG encode ng fitz
+            return pix.tobytes("png")
+
+        image = pixmap_to_image(pix)
+        if quantize:
+            # Walang dithering para malinis ang gilid ng mga letra
+            image = image.quantize(colors=QUANTIZE_COLORS, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+
+        buffer = io.BytesIO()
+        if self.image_format == "png":
+            image.save(buffer, format="PNG", optimize=True)
+        elif self.image_format == "webp":
+            if quantize:
+                # Ang lossless WebP ng iilang kulay ay maliit na at walang artifacts sa text
+                image.save(buffer, format="WEBP", lossless=True, method=4)
+            else:
+                image.save(buffer, format="WEBP", quality=self.quality, method=4)
+        else:
+            if image.mode == "P":
+                image = image.convert("RGB")
+            image.save(buffer, format="AVIF", quality=self.quality, speed=AVIF_SPEED)
+        return buffer.getvalue()
+
+_default_encoder: Optional[ImageEncoder] = None
+
+def get_default_encoder() -> ImageEncoder:
+    """Encoder mula sa env defaults (IMAGE_FORMAT, IMAGE_QUALITY), para sa mga tumatawag na walang config."""
+    global _default_encoder
+    if _default_encoder is None:
+        _default_encoder = ImageEncoder()
+    return _default_encoder
@@ -0,0 +1,240 @@
+import re
+import json
+import hashlib
+import fitz  # PyMuPDF
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set
+
+from image_codecs import ImageEncoder, QUANTIZE_COLORS, AVIF_SPEED
+from page_analysis import DEFAULT_DPI
+from autocrop import DEFAULT_WHITE_THRESHOLD
+from tiles import TILE_SIZE, TILE_OVERLAP, TILE_MAX_DPI
+from page_ranges import parse_page_ranges  # re-export para sa processors
+
+# --- Incremental Re-processing ---
+# Kapag may isang page lang na inayos at ni-re-export ang issue, ang mga page na walang
+# pagbabago ay hindi na nire-render, ine-extract o ina-upload. Ang bawat output
+# (image, interactive, reflow) ay nagse-save ng fingerprint ng bawat page sa tabi ng
+# manifest nito; sa susunod na run, ang page na pareho ang fingerprint ay kinukuha
+# na lang mula sa dating manifest.
+#
+# Ang fingerprint ay hash ng:
+#   - content streams, resources at annotations ng page (Merkle-style: ang bawat
+#     "N 0 R" reference ay pinapalitan ng hash ng object na tinuturo nito, kaya hindi
+#     nakakaapekto ang pag-renumber ng objects sa bagong export)
+#   - ang minanang /Resources, /MediaBox, /CropBox at /Rotate ng page
+#   - page number (nasa paths at IDs ito) at processing parameters ng output
+#
+# Ang reference sa ibang page (hal. link destination) ay hash ng page number lang,
+# hindi ng buong page. Ang false positive (nagbago ang hash pero hindi ang page) ay
+# dagdag na trabaho lang; ang mahalaga ay nagbabago ang hash kapag nagbago ang page.
+
+# Dagdagan kapag nagbago ang output ng processors para sa parehong PDF
+FINGERPRINT_VERSION = 2
+# Pangalan ng fingerprints file sa tabi ng manifest (may output kind, dahil magkasama
+# ang interactive at reflow outputs sa iisang folder)
+FINGERPRINTS_NAME = ".fingerprints.json"
+
+REFERENCE_PATTERN = re.compile(r"(\d+) 0 R")
+PARENT_PATTERN = re.compile(r"/Parent\s+\d+\s+0\s+R")
+INHERITED_KEYS = ("Resources", "MediaBox", "CropBox", "Rotate")
+
+class DocumentHasher:
+    """Memoized Merkle hashes of the objects of one document."""
+
+    def __init__(self, doc: fitz.Document):
+        self.doc = doc
+        self.page_numbers = {doc.page_xref(i): i + 1 for i in range(len(doc))}
+        self._memo: Dict[int, str] = {}
+        self._stack: Set[int] = set()
+        self._pages: Dict[int, str] = {}
+
+    def source_digest(self, source: str) -> str:
+        """Hash ng PDF object source, kung saan ang bawat reference ay hash ng tinuturo nito."""
+        h = hashlib.sha256()
+        position = 0
+        for match in REFERENCE_PATTERN.finditer(source):
+            h.update(source[position:match.start()].encode('utf-8', 'surrogateescape'))
+            h.update(self.object_digest(int(match.group(1))).encode('ascii'))
+            position = match.end()
+        h.update(source[position:].encode('utf-8', 'surrogateescape'))
+        return h.hexdigest()
+
+    def object_digest(self, xref: int, root: bool = False) -> str:
+        if not root:
+            if xref in self.page_numbers:
+                return f"page:{self.page_numbers[xref]}"
+            if xref in self._stack:
+                return "cycle"
+            if xref in self._memo:
+                return self._memo[xref]
+        if xref <= 0 or xref >= self.doc.xref_length():
+            return "missing"
+
+        self._stack.add(xref)
+        try:
+            source = self.doc.xref_object(xref, compressed=True)
+            if root:
+                # Ang /Pages tree ay hindi bahagi ng page; ang minanang keys ay hiwalay na hinahash
+                source = PARENT_PATTERN.sub("", source)
+            digest = self.source_digest(source)
+            if self.doc.xref_is_stream(xref):
+                digest = hashlib.sha256(digest.encode('ascii') + self.doc.xref_stream_raw(xref)).hexdigest()
+        finally:
+            self._stack.discard(xref)
+        if not root:
+            self._memo[xref] = digest
+        return digest
+
+    def inherited_value(self, page_xref: int, key: str) -> str:
+        """Ang value ng `key` sa page o sa pinakamalapit na /Pages ancestor nito."""
+        xref, seen = page_xref, set()
+        while xref and xref not in seen:
+            seen.add(xref)
+            kind, value = self.doc.xref_get_key(xref, key)
+            if kind != "null":
+                return value
+            kind, parent = self.doc.xref_get_key(xref, "Parent")
+            xref = int(parent.split()[0]) if kind == "xref" else 0
+        return "null"
+
+    def page_digest(self, page_index: int) -> str:
+        if page_index not in self._pages:
+            page_xref = self.doc.page_xref(page_index)
+            h = hashlib.sha256(self.object_digest(page_xref, root=True).encode('ascii'))
+            for key in INHERITED_KEYS:
+                h.update(f"/{key}".encode('ascii'))
+                h.update(self.source_digest(self.inherited_value(page_xref, key)).encode('ascii'))
+            self._pages[page_index] = h.hexdigest()
+        return self._pages[page_index]
+
+def encoder_params(encoder: ImageEncoder) -> Dict[str, Any]:
+    return {
+        "format": encoder.image_format, "quality": encoder.quality,
+        "quantize_text_pages": encoder.quantize_text_pages,
+        "quantize_colors": QUANTIZE_COLORS, "avif_speed": AVIF_SPEED,
+    }
+
+def with_srcset(params: Dict[str, Any], srcset: Sequence[int]) -> Dict[str, Any]:
+    # Idinadagdag lang kapag may srcset, para hindi magbago ang fingerprints ng dating runs
+    if srcset:
+        params["srcset"] = list(srcset)
+    return params
+
+def image_params(encoder: ImageEncoder, tiles: bool, srcset: Sequence[int] = ()) -> Dict[str, Any]:
+    """Processing parameters ng image output (page image, autocrop, tiles, srcset, hotspots)."""
+    return with_srcset({
+        "output": "image", "encoder": encoder_params(encoder),
+        "dpi": DEFAULT_DPI, "white_threshold": DEFAULT_WHITE_THRESHOLD,
+        "tiles": [TILE_SIZE, TILE_OVERLAP, TILE_MAX_DPI] if tiles else None,
+    }, srcset)
+
+def element_params(output: str, encoder: ImageEncoder, native_images: bool, srcset: Sequence[int] = ()) -> Dict[str, Any]:
+    """Processing parameters ng interactive at reflow outputs."""
+    return with_srcset({
+        "output": output, "encoder": encoder_params(encoder),
+        "dpi": DEFAULT_DPI, "white_threshold": DEFAULT_WHITE_THRESHOLD,
+        "native_images": native_images,
+    }, srcset)
+
+def fingerprints_path(prefix: str, output: str) -> str:
+    """`{issue}/` + "reflow" -> `{issue}/.fingerprints.reflow.json`."""
+    stem, _, ext = FINGERPRINTS_NAME.rpartition(".")
+    return f"{prefix}{stem}.{output}.{ext}"
+
+def params_digest(params: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps({"version": FINGERPRINT_VERSION, **params}, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def page_fingerprint(hasher: DocumentHasher, page_index: int, params: Dict[str, Any]) -> str:
+    """Fingerprint of page `page_index` (0-based) for an output with the given processing parameters."""
+    return hashlib.sha256(f"{page_index + 1}:{params_digest(params)}:{hasher.page_digest(page_index)}".encode('ascii')).hexdigest()
+
+class PageFingerprints:
+    """
+    Per-page fingerprints of one output of an issue, compared against the
+    previous run's fingerprints stored next to its manifest at `path`.
+    With `enabled` False every page is processed, but the fingerprints are
+    still published for the next run.
+
+    `changed(page_number)` is True when the page must be processed again:
+    its fingerprint differs, it is forced, or the previous manifest has no
+    entry to reuse for it (see `load_previous`).
+    """
+
+    def __init__(
+            self,
+            doc: fitz.Document,
+            target: Any,
+            path: str,
+            params: Dict[str, Any],
+            enabled: bool = True,
+            force_pages: Optional[Iterable[int]] = None,
+            hasher: Optional[DocumentHasher] = None,
+            page_extras: Optional[Dict[int, Any]] = None):
+        self.target = target
+        self.path = path
+        self.enabled = enabled
+        self.force_pages = set(force_pages or ())
+        self.hasher = hasher or DocumentHasher(doc)
+        # `page_extras`: karagdagang per-page input ng output (hal. ang TOC entry ng page)
+        page_extras = page_extras or {}
+        self.fingerprints = {
+            i + 1: page_fingerprint(self.hasher, i, {**params, "page_extra": page_extras.get(i + 1)})
+            for i in range(len(doc))
+        }
+        self.previous: Dict[int, str] = {}
+        self.reusable: Set[int] = set()
+
+    def load_previous(self, load_entries: Callable[[], Dict[int, Any]]) -> Dict[int, Any]:
+        """
+        Loads the previous fingerprints and, only if some page is unchanged,
+        the previous manifest entries via `load_entries()` (page number -> entry).
+        Returns the entries of the pages that can be reused.
+        """
+        if not self.enabled:
+            return {}
+        try:
+            stored = self.target.download(self.path)
+        except Exception as e:
+            print(f"  - ⚠️ Could not read page fingerprints {self.path}: {e}")
+            stored = None
+        if not stored:
+            print("  - No previous page fingerprints; processing every page.")
+            return {}
+        self.previous = {int(page): fingerprint for page, fingerprint in json.loads(stored).get("pages", {}).items()}
+        unchanged = {
+            page for page, fingerprint in self.fingerprints.items()
+            if self.previous.get(page) == fingerprint and page not in self.force_pages
+        }
+        if not unchanged:
+            return {}
+        try:
+            entries = load_entries()
+        except Exception as e:
+            print(f"  - ⚠️ Could not load the previous manifest, processing every page: {e}")
+            return {}
+        reused = {page: entry for page, entry in entries.items() if page in unchanged}
+        self.reusable = set(reused)
+        print(f"  - ♻️ Incremental run: {len(reused)} unchanged page(s) reused, {len(self.fingerprints) - len(reused)} to process.")
+        return reused
+
+    def changed(self, page_number: int) -> bool:
+        return page_number not in self.reusable
+
+    @property
+    def changed_pages(self) -> List[int]:
+        return [page for page in self.fingerprints if self.changed(page)]
+
+    @property
+    def is_patch(self) -> bool:
+        """True kapag may nire-reuse na pages, kaya ang DB rows ng changed pages lang ang isusulat."""
+        return bool(self.reusable)
+
+    def publish(self, pipeline: Any) -> None:
+        """Saves this run's fingerprints for the next run. Call after the manifest is uploaded."""
+        body = json.dumps({"version": FINGERPRINT_VERSION, "pages": {str(page): fp for page, fp in self.fingerprints.items()}}, sort_keys=True)
+        pipeline.upload(self.target, self.path, body.encode('utf-8'), "application/json")
+
+def fetch_json(target: Any, path: str) -> Optional[Any]:
+    """Ang JSON sa `path` ng target, o None kung wala pa."""
+    data = target.download(path)
+    return json.loads(data) if data else None
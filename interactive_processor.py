@@ -1,198 +1,219 @@
 import fitz
 import os
-import json
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from io import BytesIO
+from typing import Any, Dict, Optional, Sequence
 from supabase import create_client, Client
-from PIL import Image, ImageChops
 from slugify import slugify
 from datetime import datetime
+from models import ReflowConfig
+from page_analysis import PageAnalysis
+from image_codecs import ImageEncoder, content_type_for, extension_for
+from element_images import ElementImageCache, upload_element_image
+from srcset import srcset_images, submit_srcset, target_widths
+from drive import download_to_cache, get_drive_service
+from uploader import SupabaseStorageTarget, UploadPipeline, resolve_uploads
+from manifest_writer import page_shards, upload_manifest
+from persistence import upsert_issue
+from metrics import annotate_job, count
+from incremental import PageFingerprints, element_params, fetch_json, fingerprints_path, parse_page_ranges
+from streaming import PageSpool, STREAMING_UPLOAD_MAX_BYTES, first_page, trim_store, use_streaming
 
-# --- Google Drive Authentication ---
-def get_drive_service():
-    client_email = os.getenv("GOOGLE_CLIENT_EMAIL")
-    private_key_raw = os.getenv("GOOGLE_PRIVATE_KEY")
-    if not client_email or not private_key_raw:
-        raise ValueError("GOOGLE_CLIENT_EMAIL and GOOGLE_PRIVATE_KEY environment variables must be set.")
-    private_key = private_key_raw.replace('\\n', '\n')
-    creds_info = {
-        "type": "service_account", "private_key": private_key, "client_email": client_email,
-        "token_uri": "https://oauth2.googleapis.com/token",
-    }
-    creds = service_account.Credentials.from_service_account_info(creds_info, scopes=['https://www.googleapis.com/auth/drive.readonly'])
-    return build('drive', 'v3', credentials=creds)
-
-def download_pdf_from_drive(file_id: str):
+# --- Google Drive Download ---
+def download_pdf_from_drive(file_id: str) -> str:
+    """Downloads the PDF to the local download cache (streamed to disk) and returns its path."""
     try:
         print(f"Authenticating with Google Drive to download file_id: {file_id}")
         service = get_drive_service()
-        request = service.files().get_media(fileId=file_id)
-        file_content = BytesIO()
-        downloader = request.execute(num_retries=3)
-        if downloader:
-            file_content.write(downloader)
-            file_content.seek(0)
-            print(f"Successfully downloaded PDF with file_id: {file_id}")
-            return file_content.getvalue()
-        else:
+        pdf_path = download_to_cache(service, file_id)
+        if os.path.getsize(pdf_path) == 0:
             raise Exception("Google Drive downloader returned empty content.")
+        print(f"Successfully downloaded PDF with file_id: {file_id}")
+        return pdf_path
     except Exception as e:
         print(f"Error downloading from Google Drive: {e}")
         raise
 
-# --- Supabase Upload Helper ---
-def upload_to_supabase_storage(supabase: Client, bucket_name: str, file_path: str, file_body: bytes, content_type: str):
-    """Helper function to upload a file to Supabase Storage and get its public URL."""
-    try:
-        supabase.storage.from_(bucket_name).upload(
-            file=file_body,
-            path=file_path,
-            file_options={"content-type": content_type, "cache-control": "3600", "upsert": "true"}
-        )
-        public_url = supabase.storage.from_(bucket_name).get_public_url(file_path)
-        print(f"  - ✅ Uploaded to Supabase: {public_url}")
-        return public_url
-    except Exception as e:
-        print(f"  - ❌ Supabase upload failed for {file_path}. Error Type: {type(e).__name__}, Details: {e}")
-        return None
+# --- Per-Page Output Generator ---
+def build_interactive_page(analysis: PageAnalysis, issue_name: str, storage: SupabaseStorageTarget, pipeline: UploadPipeline, image_cache: Optional[ElementImageCache] = None, srcset: Sequence[int] = ()) -> Dict[str, Any]:
+    """
+    Builds one page of the interactive manifest from the shared page analysis.
+    Uploads are queued on `pipeline`; image URLs stay Futures until it is joined.
+    Pass the run's `image_cache` so recurring images are rendered and uploaded once,
+    and `srcset` widths to add the page image at those sizes (see srcset.py).
+    """
+    page_number = analysis.page_number
 
-# --- Main Interactive Processor Function ---
-def process_pdf_interactive(pdf_file_id: str, config: dict, supabase: Client):
+    # --- ✨ STEP 1: AUTOCROP LOGIC (Mula sa lumang processor) ✨ ---
+    print("  - Analyzing image for autocropping...")
+    crop = analysis.autocrop
+    if crop["pixel_bbox"]:
+        print(f"  - Content found at pixel bbox: {crop['pixel_bbox']}. Cropped.")
+    else:
+        # Fallback kung mag-fail ang autocrop
+        print("  - ⚠️ Autocrop failed. Using full page image.")
+    content_box = crop["content_box"]
+    final_content_box = [content_box.x0, content_box.y0, content_box.x1, content_box.y1]
+    final_width = crop["width"]
+    final_height = crop["height"]
+
+    # --- ✨ STEP 2: I-UPLOAD ANG NA-CROP NA IMAHE ✨ ---
+    page_image_path = f"{issue_name}/page_{page_number}.{extension_for(crop['format'])}"
+    # Hindi na hinihintay ang upload; ang URL ay pupunan bago isulat ang manifest
+    page_image_url = pipeline.submit(
+        storage, page_image_path,
+        crop["image_bytes"], # <-- Gamit na nito ang na-crop na bytes
+        content_type_for(crop["format"])
+    )
+    if srcset:
+        srcset_entries, srcset_files = srcset_images(analysis, srcset)
+        submit_srcset(pipeline, storage, f"{issue_name}/page_{page_number}", crop["format"], srcset_entries, srcset_files)
+
+    # --- STEP 3: I-EXTRACT ANG HOTSPOTS (walang pagbabago) ---
+    hotspots = [
+        {"type": "url", "uri": link['uri'], "bbox": [link['from'].x0, link['from'].y0, link['from'].x1, link['from'].y1]}
+        for link in analysis.links if link['kind'] == fitz.LINK_URI
+    ]
+    
+    element_hotspots = []
+    print("  - Extracting text blocks...")
+    for block_bbox, block_text in analysis.text_blocks:
+        if block_text.strip():
+            element_hotspots.append({
+                "type": "text", "bbox": [block_bbox.x0, block_bbox.y0, block_bbox.x1, block_bbox.y1],
+                "content": block_text.replace('\n', ' ').strip()
+            })
+
+    print("  - Extracting, cropping, and uploading images...")
+    for img_info in analysis.image_info:
+        if img_info['xref'] == 0: continue
+        try:
+            # Ang parehong xref sa naunang page ay hindi na nire-render o ina-upload ulit
+            img_url = upload_element_image(image_cache, pipeline, storage, analysis, img_info, f"{issue_name}/elements", analysis.encoder)
+            element_hotspots.append({
+                "type": "image", "bbox": list(img_info['bbox']), "src": img_url
+            })
+        except Exception as e:
+            print(f"    - ⚠️ Could not process image element with xref {img_info['xref']}. Reason: {e}")
+
+    print(f"  - ✅ Page processed. Final dimensions: {final_width}x{final_height}")
+    entry = {
+        "page_num": page_number,
+        "image_url": page_image_url,
+        "width": final_width,             # <-- Gamitin ang bagong width
+        "height": final_height,           # <-- Gamitin ang bagong height
+        "crop_box": final_content_box,    # <-- Idagdag ang crop_box
+        "hotspots": hotspots,
+        "element_hotspots": element_hotspots
+    }
+    if srcset:
+        entry["srcset"] = srcset_entries
+    return entry
+
+def load_previous_interactive_pages(storage: SupabaseStorageTarget, issue_name: str) -> Dict[int, Dict[str, Any]]:
+    """Page number -> page entry mula sa interactive manifest ng huling run."""
+    manifest = fetch_json(storage, f"{issue_name}/manifest.json")
+    return {page["page_num"]: page for page in manifest.get("pages", [])} if manifest else {}
+
+def interactive_fingerprints(doc: fitz.Document, storage: SupabaseStorageTarget, config: ReflowConfig, encoder: ImageEncoder, hasher: Any = None) -> PageFingerprints:
+    return PageFingerprints(
+        doc, storage, fingerprints_path(f"{config.issue_number}/", "interactive"),
+        element_params("interactive", encoder, config.native_images, target_widths(config.srcset_widths)),
+        enabled=config.incremental, force_pages=parse_page_ranges(config.force_pages, len(doc)), hasher=hasher
+    )
+
+def publish_interactive_manifest(supabase: Client, pipeline: UploadPipeline, storage: SupabaseStorageTarget, config: ReflowConfig, manifest: Dict[str, Any]) -> str:
+    """Uploads the interactive manifest and updates magazine_issues. Call only after the page uploads are joined and resolved."""
     issue_name = config.issue_number
     issue_slug = slugify(issue_name)
+    manifest_path = f"{issue_name}/manifest.json"
+    print(f"\n--- Uploading final manifest to: {manifest_path} ---")
+    manifest_url = upload_manifest(
+        pipeline, storage, manifest_path, manifest,
+        shards=page_shards(manifest["pages"], "page_num", ("page_num", "image_url", "width", "height", "crop_box", "srcset"))
+    )
+    print(f"--- Updating 'magazine_issues' table for slug: {issue_slug} ---")
+    cover_page = first_page(manifest["pages"])
+    db_payload = {
+        "issue_number": issue_name,
+        "issue_slug": issue_slug,
+        "publication_date": config.publication_date,
+        "status": "published_interactive", # Isang bagong status para malinaw
+        "manifest_url": manifest_url,
+        # Ang cover_image_url ay maaaring i-set dito kung kukunin natin ang first page
+        "cover_image_url": cover_page['image_url'] if cover_page else None,
+    }
+    
+    # Ang `upsert` na may `on_conflict` ay nagsisigurong idempotent ito.
+    # I-u-update nito ang existing entry kung may kaparehong 'issue_slug', kung hindi, gagawa ito ng bago.
+    upsert_issue(supabase, db_payload)
+    print("  - ✅ Database updated successfully.")
+    return manifest_url
+
+# --- Main Interactive Processor Function ---
+def process_pdf_interactive(pdf_file_id: str, config: ReflowConfig, supabase: Client):
+    issue_name = config.issue_number
     print(f"--- 🚀 INTERACTIVE PROCESSOR INITIATED for: {issue_name} 🚀 ---")
+    annotate_job(issue=issue_name)
+    pipeline = None
+    pages = None
     
     try:
-        pdf_data = download_pdf_from_drive(pdf_file_id)
-        pdf_document = fitz.open(stream=pdf_data, filetype="pdf")
+        storage = SupabaseStorageTarget(supabase, "magazine-pages")
+        encoder = ImageEncoder.from_config(config)
+        image_cache = ElementImageCache(native=config.native_images)
+        srcset = target_widths(config.srcset_widths)
+        pdf_path = download_pdf_from_drive(pdf_file_id)
+        pdf_document = fitz.open(pdf_path)
+        streaming = use_streaming(config.streaming, len(pdf_document))
+        if streaming:
+            print(f"  - Streaming mode: {len(pdf_document)} pages, per-page results spooled to disk")
+        pipeline = UploadPipeline(max_bytes_in_flight=STREAMING_UPLOAD_MAX_BYTES if streaming else None)
+        # Para sa re-runs: ang mga artifacts na walang pagbabago ay hindi na ia-upload ulit
+        pipeline.load_marker(storage, f"{issue_name}/")
+        fingerprints = interactive_fingerprints(pdf_document, storage, config, encoder)
+        previous = fingerprints.load_previous(lambda: load_previous_interactive_pages(storage, issue_name))
         
+        # Sa streaming mode, ang bawat page entry ay isinusulat agad sa disk
+        pages = PageSpool() if streaming else []
         manifest = {
             "issue_number": issue_name,
             "publication_date": config.publication_date,
             "table_of_contents": config.table_of_contents, # <-- Idagdag ang TOC
-            "pages": []
+            "image_format": encoder.image_format,
+            "pages": pages
         }
 
         for page_num in range(len(pdf_document)):
+            if not fingerprints.changed(page_num + 1):
+                # Walang pagbabago mula sa huling run; gamitin ang dating entry
+                pages.append(previous[page_num + 1])
+                count("pages_reused")
+                continue
             page = pdf_document.load_page(page_num)
             print(f"\n--- Processing Page {page_num + 1} ---")
+            analysis = PageAnalysis(page, page_num + 1, encoder=encoder)
+            pages.append(build_interactive_page(analysis, issue_name, storage, pipeline, image_cache, srcset))
+            count("pages")
+            if streaming:
+                analysis.release()
+                trim_store()
 
-            # --- ✨ STEP 1: AUTOCROP LOGIC (Mula sa lumang processor) ✨ ---
-            dpi = 150  # Itakda ang DPI para sa initial render
-            pix_full = page.get_pixmap(dpi=dpi)
-            img_bytes_full = pix_full.tobytes("png")
-
-            print("  - Analyzing image for autocropping...")
-            image = Image.open(BytesIO(img_bytes_full))
-            grayscale_image = image.convert('L')
-            inverted_image = ImageChops.invert(grayscale_image)
-            autocrop_pixel_bbox = inverted_image.getbbox()
-
-            if autocrop_pixel_bbox:
-                print(f"  - Content found at pixel bbox: {autocrop_pixel_bbox}. Cropping...")
-                cropped_image = image.crop(autocrop_pixel_bbox)
-                
-                buffer = BytesIO()
-                cropped_image.save(buffer, format='PNG')
-                page_image_bytes = buffer.getvalue() # Ito na ang final bytes na ia-upload
-
-                # Kunin ang dimensions ng na-crop na imahe
-                final_width = cropped_image.width
-                final_height = cropped_image.height
-                
-                # I-convert ang pixel bbox pabalik sa PDF points para sa frontend
-                scale = dpi / 72.0
-                x0, y0, x1, y1 = autocrop_pixel_bbox
-                final_content_box = [x0 / scale, y0 / scale, x1 / scale, y1 / scale]
-            else:
-                # Fallback kung mag-fail ang autocrop
-                print("  - ⚠️ Autocrop failed. Using full page image.")
-                page_image_bytes = img_bytes_full
-                final_width = pix_full.width
-                final_height = pix_full.height
-                final_content_box = [page.rect.x0, page.rect.y0, page.rect.x1, page.rect.y1]
-            
-            # --- ✨ STEP 2: I-UPLOAD ANG NA-CROP NA IMAHE ✨ ---
-            page_image_path = f"{issue_name}/page_{page_num + 1}.png"
-            page_image_url = upload_to_supabase_storage(
-                supabase, "magazine-pages", page_image_path, 
-                page_image_bytes, # <-- Gamit na nito ang na-crop na bytes
-                "image/png"
-            )
-
-            # --- STEP 3: I-EXTRACT ANG HOTSPOTS (walang pagbabago) ---
-            hotspots = [
-                {"type": "url", "uri": link['uri'], "bbox": [link['from'].x0, link['from'].y0, link['from'].x1, link['from'].y1]}
-                for link in page.get_links() if link['kind'] == fitz.LINK_URI
-            ]
-            
-            element_hotspots = []
-            print("  - Extracting text blocks...")
-            text_blocks = page.get_text("blocks")
-            for block in text_blocks:
-                if block[6] == 0 and block[4].strip():
-                    element_hotspots.append({
-                        "type": "text", "bbox": [block[0], block[1], block[2], block[3]],
-                        "content": block[4].replace('\n', ' ').strip()
-                    })
+        # Hintayin ang lahat ng uploads; mag-ra-raise ng UploadError kung may hindi na-upload
+        print(f"\n  - Element images: {image_cache.summary()}")
+        print("\n--- Waiting for pending uploads ---")
+        pipeline.join()
+        resolve_uploads(manifest)
 
-            print("  - Extracting, cropping, and uploading images...")
-            for img_info in page.get_image_info(xrefs=True):
-                if img_info['xref'] == 0: continue
-                try:
-                    img_pix = page.get_pixmap(clip=img_info['bbox'])
-                    img_bytes = img_pix.tobytes("png")
-                    img_path = f"{issue_name}/elements/element_page_{page_num + 1}_xref_{img_info['xref']}.png"
-                    img_url = upload_to_supabase_storage(
-                        supabase, "magazine-pages", img_path, img_bytes, "image/png"
-                    )
-                    if img_url:
-                        element_hotspots.append({
-                            "type": "image", "bbox": list(img_info['bbox']), "src": img_url
-                        })
-                except Exception as e:
-                    print(f"    - ⚠️ Could not process image element with xref {img_info['xref']}. Reason: {e}")
-
-            # --- ✨ STEP 4: I-UPDATE ANG MANIFEST DATA ✨ ---
-            manifest["pages"].append({
-                "page_num": page_num + 1,
-                "image_url": page_image_url,
-                "width": final_width,             # <-- Gamitin ang bagong width
-                "height": final_height,           # <-- Gamitin ang bagong height
-                "crop_box": final_content_box,    # <-- Idagdag ang crop_box
-                "hotspots": hotspots,
-                "element_hotspots": element_hotspots
-            })
-            print(f"  - ✅ Page processed. Final dimensions: {final_width}x{final_height}")
-
-        # ... (ang natitirang bahagi ng code para sa pag-upload ng manifest ay mananatiling pareho) ...
-        manifest_path = f"{issue_name}/manifest.json"
-        print(f"\n--- Uploading final manifest to: {manifest_path} ---")
-        manifest_url = upload_to_supabase_storage(
-            supabase, "magazine-pages", manifest_path,
-            json.dumps(manifest, indent=2).encode('utf-8'), "application/json"
-        )
-        print(f"--- Updating 'magazine_issues' table for slug: {issue_slug} ---")
-        db_payload = {
-            "issue_number": issue_name,
-            "issue_slug": issue_slug,
-            "publication_date": config.publication_date,
-            "status": "published_interactive", # Isang bagong status para malinaw
-            "manifest_url": manifest_url,
-            # Ang cover_image_url ay maaaring i-set dito kung kukunin natin ang first page
-            "cover_image_url": manifest['pages'][0]['image_url'] if manifest['pages'] else None,
-        }
-        
-        # Ang `upsert` na may `on_conflict` ay nagsisigurong idempotent ito.
-        # I-u-update nito ang existing entry kung may kaparehong 'issue_slug', kung hindi, gagawa ito ng bago.
-        supabase.table("magazine_issues").upsert(
-            db_payload, 
-            on_conflict="issue_slug"
-        ).execute()
-        print("  - ✅ Database updated successfully.")
+        publish_interactive_manifest(supabase, pipeline, storage, config, manifest)
+        fingerprints.publish(pipeline)
+        pipeline.publish_marker(storage, f"{issue_name}/")
         print(f"--- ✅ INTERACTIVE PROCESSING COMPLETE for: {issue_name} ---")
 
     except Exception as e:
         print(f"--- ❌ An error occurred during interactive processing: {e} ---")
-        raise
\ No newline at end of file
+        raise
+    finally:
+        if pipeline is not None:
+            # Pagkatapos ng join() wala nang pending; kapag nag-error, itigil na ang naka-queue
+            pipeline.close(cancel_pending=True)
+        if isinstance(pages, PageSpool):
+            pages.close()
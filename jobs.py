@@ -0,0 +1,189 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+import traceback
+from typing import Any, Callable, Dict, List, Optional
+
+from metrics import track_job
+
+# --- Durable Job Queue ---
+# Ang mabibigat na processing jobs ay sine-save muna sa isang lokal na SQLite database
+# at pinapatakbo ng isang fixed-size na worker pool (hiwalay sa event loop ng FastAPI).
+# Kapag nag-restart ang server, ang mga job na naiwang 'running' ay ibabalik sa 'queued',
+# maliban kung umabot na sa JOB_MAX_ATTEMPTS ang `attempts` nila (dinadagdagan sa bawat
+# claim): ang job na nagpapa-crash sa process ay magiging 'failed' sa halip na
+# i-crash ito ulit sa bawat start.
+
+class QueueFullError(Exception):
+    """Raised by JobQueue.submit when the queue has reached its admission limit."""
+
+JobHandler = Callable[[Dict[str, Any]], Any]
+
+class JobQueue:
+    """
+    SQLite-backed job queue with a fixed pool of worker threads.
+
+    Jobs move through queued -> running -> succeeded | failed. `submit` refuses
+    new work once `max_queued` jobs are waiting, so callers can apply
+    backpressure (HTTP 429) instead of piling up CPU work.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, workers: Optional[int] = None, max_queued: Optional[int] = None, max_attempts: Optional[int] = None):
+        self.db_path = db_path or os.getenv("JOB_DB_PATH", "jobs.sqlite3")
+        self.workers = workers or int(os.getenv("JOB_WORKERS", "1"))
+        self.max_queued = max_queued or int(os.getenv("JOB_QUEUE_MAX", "20"))
+        self.max_attempts = max_attempts or int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+        self._handlers: Dict[str, JobHandler] = {}
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Condition()
+        # Iisang connection na pinoprotektahan ng lock, para atomic ang pag-claim ng jobs
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)")
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        """Registers the function that runs jobs of the given kind."""
+        self._handlers[kind] = handler
+
+    def start(self) -> None:
+        """
+        Re-queues jobs interrupted by a restart (failing those that already ran
+        `max_attempts` times) and starts the worker threads.
+        """
+        with self._lock:
+            abandoned = self._conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE status = 'running' AND attempts >= ?",
+                (f"Interrupted {self.max_attempts} time(s) (server restart or crash); not retried", time.time(), self.max_attempts)
+            ).rowcount
+            recovered = self._conn.execute(
+                "UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running'"
+            ).rowcount
+        if abandoned:
+            print(f"--- ❌ Failed {abandoned} job(s) interrupted {self.max_attempts} time(s) ---")
+        if recovered:
+            print(f"--- ♻️ Re-queued {recovered} interrupted job(s) ---")
+        self._stop.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"--- ✅ Job queue started with {self.workers} worker(s), max {self.max_queued} queued ---")
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stops the workers. A job that is still running stays 'running' and is re-queued on the next start."""
+        self._stop.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, kind: str, payload: Dict[str, Any]) -> str:
+        """Persists a new job and returns its ID. Raises QueueFullError when the queue is full."""
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'.")
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            queued = self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+            if queued >= self.max_queued:
+                raise QueueFullError(f"Job queue is full ({queued} jobs waiting).")
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, payload, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+                (job_id, kind, json.dumps(payload), time.time())
+            )
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Returns the job's status record, or None if the ID is unknown."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            position = None
+            if row["status"] == "queued":
+                position = self._conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created_at < ?", (row["created_at"],)
+                ).fetchone()[0]
+        return {
+            "id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "queue_position": position,
+            "attempts": row["attempts"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+        }
+
+    def queue_depth(self) -> int:
+        """Number of jobs waiting for a worker."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+
+    def _claim_next(self) -> Optional[sqlite3.Row]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ? WHERE id = ?",
+                (time.time(), row["id"])
+            )
+            return row
+
+    def _finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, json.dumps(result, default=str) if result is not None else None, error, time.time(), job_id)
+            )
+
+    def _worker_loop(self) -> None:
+        while not self._stop.is_set():
+            row = self._claim_next()
+            if row is None:
+                # Walang trabaho; maghintay ng bagong submit (o mag-poll ulit paminsan-minsan)
+                with self._wakeup:
+                    self._wakeup.wait(timeout=5)
+                continue
+
+            job_id, kind = row["id"], row["kind"]
+            print(f"--- ▶️ Starting {kind} job {job_id} ---")
+            try:
+                # Ang per-job metrics summary ay pini-print bilang isang JSON line pagkatapos ng job
+                with track_job(kind, job_id):
+                    result = self._handlers[kind](json.loads(row["payload"]))
+            except Exception as e:
+                traceback.print_exc()
+                self._finish(job_id, "failed", error=f"{type(e).__name__}: {e}")
+                print(f"--- ❌ {kind} job {job_id} failed: {e} ---")
+            else:
+                self._finish(job_id, "succeeded", result=result)
+                print(f"--- ✅ {kind} job {job_id} succeeded ---")
@@ -0,0 +1,154 @@
+import numpy as np
+from itertools import chain
+from typing import Dict, List, Sequence, Tuple
+
+# --- Vectorized Layout Engine ---
+# Lahat ng spans ng isang page ay isang array ng bboxes. Ang column clustering,
+# column assignment at alignment detection ay ginagawa nang sabay-sabay para sa
+# lahat ng groups (blocks) gamit ang NumPy, sa halip na Python loops bawat span.
+#
+# Pareho ang resulta sa dating per-block loops:
+#   - ang centers ay sinort at hinati kung saan ang agwat ay >= tolerance
+#   - ang column center ay ang average ng cluster
+#   - ang boundaries ay ang gitna ng magkatabing centers (at ang gilid ng group)
+#   - ang span ay nasa unang column na x0 <= center < x1, o column 0 kung wala
+
+# Ang block ay "center" aligned kapag ang gitna nito ay nasa loob ng 5% ng page width mula sa gitna ng page
+CENTER_ALIGNMENT_RATIO = 0.05
+
+def bbox_array(bboxes: Sequence[Sequence[float]]) -> np.ndarray:
+    """(n, 4) float64 array mula sa isang listahan ng (x0, y0, x1, y1) tuples."""
+    if not len(bboxes):
+        return np.empty((0, 4), dtype=np.float64)
+    return np.fromiter(chain.from_iterable(bboxes), dtype=np.float64, count=4 * len(bboxes)).reshape(-1, 4)
+
+def horizontal_centers(bboxes: np.ndarray) -> np.ndarray:
+    return (bboxes[:, 0] + bboxes[:, 2]) / 2
+
+def dense_ranks(values: np.ndarray) -> np.ndarray:
+    """Rank ng bawat value sa sorted distinct values (pantay na values, pantay na rank)."""
+    order = np.argsort(values)
+    sorted_values = values[order]
+    is_new = np.ones(len(values), dtype=bool)
+    is_new[1:] = sorted_values[1:] != sorted_values[:-1]
+    ranks = np.empty(len(values), dtype=np.int64)
+    ranks[order] = np.cumsum(is_new) - 1
+    return ranks
+
+def group_keys(ranks: np.ndarray, groups: np.ndarray, rank_count: int) -> np.ndarray:
+    """
+    Integer keys that order exactly by (group, value), given the values' dense ranks
+    (all below `rank_count`). Walang floating-point na pagkawala ng precision,
+    at mabilis ang integer sort/search.
+    """
+    return groups.astype(np.int64) * rank_count + ranks
+
+def cluster_columns(centers: np.ndarray, groups: np.ndarray, group_x0: np.ndarray, group_x1: np.ndarray, tolerance: float) -> Dict[str, np.ndarray]:
+    """
+    Clusters the x-centers of every group at once.
+
+    `groups[i]` is the group (0..G-1) of `centers[i]`; `group_x0/x1` are the
+    horizontal edges of each group. Returns per-cluster arrays (`center`,
+    `x0`, `x1`, `group`), per-group `column_count` and `first_column`
+    (index of the group's first cluster).
+    """
+    group_count = len(group_x0)
+    if not len(centers):
+        empty = np.empty(0, dtype=np.float64)
+        return {
+            "center": empty, "x0": empty, "x1": empty, "group": np.empty(0, dtype=np.int64),
+            "column_count": np.zeros(group_count, dtype=np.int64),
+            "first_column": np.zeros(group_count, dtype=np.int64),
+        }
+
+    order = np.argsort(group_keys(dense_ranks(centers), groups, len(centers)))
+    sorted_centers = centers[order]
+    sorted_groups = groups[order]
+
+    # Bagong cluster kapag bagong group, o kapag ang agwat sa naunang center ay >= tolerance
+    starts = np.ones(len(order), dtype=bool)
+    starts[1:] = (sorted_groups[1:] != sorted_groups[:-1]) | ((sorted_centers[1:] - sorted_centers[:-1]) >= tolerance)
+    cluster_ids = np.cumsum(starts) - 1
+
+    # Ang bincount ay nagdadagdag ayon sa pagkakasunod, katulad ng sum() sa dating loop
+    counts = np.bincount(cluster_ids)
+    column_centers = np.bincount(cluster_ids, weights=sorted_centers) / counts
+    column_groups = sorted_groups[starts]
+
+    is_first = np.ones(len(column_centers), dtype=bool)
+    is_first[1:] = column_groups[1:] != column_groups[:-1]
+    is_last = np.ones(len(column_centers), dtype=bool)
+    is_last[:-1] = column_groups[1:] != column_groups[:-1]
+
+    midpoints = (column_centers[1:] + column_centers[:-1]) / 2
+    column_x0 = np.empty_like(column_centers)
+    column_x0[1:] = midpoints
+    column_x0[is_first] = group_x0[column_groups[is_first]]
+    column_x1 = np.empty_like(column_centers)
+    column_x1[:-1] = midpoints
+    column_x1[is_last] = group_x1[column_groups[is_last]]
+
+    column_count = np.bincount(column_groups, minlength=group_count)
+    first_column = np.concatenate(([0], np.cumsum(column_count)[:-1]))
+    return {
+        "center": column_centers, "x0": column_x0, "x1": column_x1, "group": column_groups,
+        "column_count": column_count, "first_column": first_column,
+    }
+
+def assign_columns(centers: np.ndarray, groups: np.ndarray, columns: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Column index of every center within its group: the first column with
+    x0 <= center < x1, or 0 when none matches.
+    """
+    if not len(centers):
+        return np.empty(0, dtype=np.int64)
+    column_groups = columns["group"]
+    # Ang interior boundaries lang (x0 ng bawat column maliban sa una) ang naghahati ng columns
+    interior = np.ones(len(column_groups), dtype=bool)
+    interior[columns["first_column"][columns["column_count"] > 0]] = False
+
+    # Ang candidate column ng center ay ang bilang ng interior boundaries ng group nito na <= center.
+    # Ang boundaries ay naka-sort na ayon sa (group, x0), kaya isang searchsorted lang ito.
+    boundary_groups = column_groups[interior]
+    boundary_x0 = columns["x0"][interior]
+    ranks = dense_ranks(np.concatenate((boundary_x0, centers)))
+    boundary_keys = group_keys(ranks[:len(boundary_x0)], boundary_groups, len(ranks))
+    center_keys = group_keys(ranks[len(boundary_x0):], groups, len(ranks))
+    boundaries_per_group = np.bincount(boundary_groups, minlength=len(columns["column_count"]))
+    boundaries_before_group = np.concatenate(([0], np.cumsum(boundaries_per_group)[:-1]))
+    candidate = np.searchsorted(boundary_keys, center_keys, side="right") - boundaries_before_group[groups]
+
+    # I-verify laban sa mismong column (para sa centers na nasa labas ng group)
+    column = columns["first_column"][groups] + candidate
+    inside = (columns["x0"][column] <= centers) & (centers < columns["x1"][column])
+    return np.where(inside, candidate, 0)
+
+def detect_alignment(group_x0: np.ndarray, group_x1: np.ndarray, page_width: float) -> np.ndarray:
+    """True para sa groups na naka-center sa page, False kung left."""
+    group_centers = (group_x0 + group_x1) / 2
+    return np.abs(group_centers - page_width / 2) < (page_width * CENTER_ALIGNMENT_RATIO)
+
+def analyze_page_layout(
+        span_bboxes: np.ndarray,
+        span_blocks: np.ndarray,
+        block_bboxes: np.ndarray,
+        page_width: float,
+        tolerance: float = 20) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Per-block column layout for all spans of a page in one batch.
+
+    `span_blocks[i]` is the index (into `block_bboxes`) of span i's block.
+    Returns per span: (column_count, column_index), and per block: is_centered.
+    """
+    block_x0, block_x1 = block_bboxes[:, 0], block_bboxes[:, 2]
+    centers = horizontal_centers(span_bboxes)
+    columns = cluster_columns(centers, span_blocks, block_x0, block_x1, tolerance)
+    column_index = assign_columns(centers, span_blocks, columns)
+    column_count = columns["column_count"][span_blocks] if len(span_blocks) else np.empty(0, dtype=np.int64)
+    return column_count, column_index, detect_alignment(block_x0, block_x1, page_width)
+
+def column_bounds(centers: np.ndarray, x0: float, x1: float, tolerance: float) -> Tuple[List[float], List[Tuple[float, float]]]:
+    """Column centers at (x0, x1) ranges para sa isang group lang (ginagamit ng detect_columns wrappers)."""
+    groups = np.zeros(len(centers), dtype=np.int64)
+    columns = cluster_columns(np.asarray(centers, dtype=np.float64), groups, np.array([x0], dtype=np.float64), np.array([x1], dtype=np.float64), tolerance)
+    return columns["center"].tolist(), list(zip(columns["x0"].tolist(), columns["x1"].tolist()))
@@ -1,53 +1,146 @@
 import os
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends
+import time
+import threading
+from typing import TYPE_CHECKING, Any, Dict
+from fastapi import FastAPI, HTTPException, Depends, Response
+from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 from fastapi.concurrency import asynccontextmanager
-from processor import process_pdf_from_url
 
-from processor import process_pdf_from_url
-from reflow_processor import process_pdf_for_reflow
-from interactive_processor import process_pdf_interactive
 from models import ProcessRequest, ReflowRequest
+from jobs import JobQueue, QueueFullError
+from metrics import render_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE, JOB_QUEUE_DEPTH
 
-from supabase import create_client, Client
+if TYPE_CHECKING:
+    from supabase import Client
 # I-load ang environment variables mula sa .env file (para sa local dev)
 load_dotenv()
 
+# --- Lazy Imports at Warm-up ---
+# Ang processors (at ang fitz, PIL, googleapiclient, google.oauth2, vercel_blob at
+# supabase na hinihila nila) ay hindi ini-import sa module load, para agad na
+# makasagot ang server pagka-cold start o scale-to-zero wakeup. Ini-import ang mga ito
+# sa background warm-up pagka-start, o sa unang job na nangailangan (kung alin ang
+# mauna; ligtas ang sabay na import). Ang Supabase at Drive clients ay ginagawa rin sa warm-up.
+#   GET /healthz  liveness: buhay ang process
+#   GET /readyz   readiness: tapos na ang warm-up at tumatakbo ang job queue (503 kung hindi pa)
+# Tingnan ang benchmarks/bench_startup.py para sa import-time profile.
+HEAVY_MODULES = ("processor", "interactive_processor", "reflow_processor", "combined_processor")
+# I-warm-up sa background pagka-start (1), o sa unang job na lang (0)
+WARMUP_ON_START = os.getenv("WARMUP_ON_START", "1") == "1"
+
 # --- App State ---
 # Gagawa tayo ng isang dictionary para paglagyan ng ating shared resources
 app_state = {}
 
+def warm_up() -> Dict[str, Any]:
+    """Imports the processor modules and creates the shared Supabase and Drive clients. Returns the warm-up status."""
+    start = time.perf_counter()
+    try:
+        for name in HEAVY_MODULES:
+            # __import__ sa halip na importlib.import_module, para lumabas sa `python -X importtime`
+            __import__(name)
+        get_supabase()
+        from drive import get_drive_service
+        get_drive_service()
+        status = {"status": "ready"}
+    except Exception as e:
+        status = {"status": "failed", "error": str(e)}
+    status["seconds"] = round(time.perf_counter() - start, 3)
+    return status
+
+def run_warm_up() -> None:
+    status = warm_up()
+    app_state["warmup"] = status
+    if status["status"] == "ready":
+        print(f"--- ✅ Warm-up done in {status['seconds']}s (processors imported, Supabase and Drive clients ready) ---")
+    else:
+        print(f"--- ❌ Warm-up failed after {status['seconds']}s: {status['error']} ---")
+
+# --- Job Handlers ---
+# Tumatakbo ang mga ito sa job worker threads, hindi sa event loop.
+# Ang payload ay ang JSON ng orihinal na request body. Ang processor ay ini-import
+# dito (walang gastos kung tapos na ang warm-up).
+def run_process_pdf_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    from processor import process_pdf_from_url
+    from image_codecs import ImageEncoder
+    request = ProcessRequest.model_validate(payload)
+    config = request.config
+    return process_pdf_from_url(
+        request.pdf_file_id,
+        config.issue_number,
+        config.publication_date,
+        config.table_of_contents,
+        workers=config.render_workers,
+        encoder=ImageEncoder.from_config(config),
+        tiles=config.tile_pyramid,
+        incremental=config.incremental,
+        force_pages=config.force_pages,
+        streaming=config.streaming,
+        srcset_widths=config.srcset_widths
+    )
+
+def run_reflow_pdf_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    from reflow_processor import process_pdf_for_reflow
+    request = ReflowRequest.model_validate(payload)
+    return process_pdf_for_reflow(request.pdf_file_id, request.config, get_supabase())
+
+def run_interactive_job(payload: Dict[str, Any]) -> None:
+    from interactive_processor import process_pdf_interactive
+    request = ProcessRequest.model_validate(payload)
+    return process_pdf_interactive(request.pdf_file_id, request.config, get_supabase())
+
+def run_process_all_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    from combined_processor import process_pdf_all
+    request = ProcessRequest.model_validate(payload)
+    return process_pdf_all(request.pdf_file_id, request.config, get_supabase())
+
 # --- Lifespan Events ---
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Ito ay tatakbo bago mag-start ang server
-    print("--- 🚀 Initializing Supabase Client on App Startup 🚀 ---")
-    supabase_url = os.environ.get("SUPABASE_URL")
-    supabase_key = os.environ.get("SUPABASE_SERVICE_KEY")
+    # Ito ay tatakbo bago mag-start ang server; ang mabibigat na imports ay nasa background
+    if WARMUP_ON_START:
+        print("--- 🚀 Warming up processors and Supabase client in the background 🚀 ---")
+        app_state["warmup"] = {"status": "warming"}
+        threading.Thread(target=run_warm_up, name="warm-up", daemon=True).start()
+    else:
+        # Lazy: ini-import sa unang job
+        app_state["warmup"] = {"status": "ready", "lazy": True}
 
-    if not supabase_url or not supabase_key:
-        raise ValueError("Supabase URL and Key must be set in environment variables.")
-    
-    if not supabase_url.endswith('/'):
-        print("WARNING: SUPABASE_URL does not have a trailing slash. Appending it.")
-        supabase_url += '/'
-            
-    # I-initialize ang client at i-save sa app_state
-    app_state["supabase_client"] = create_client(supabase_url, supabase_key)
-    print("--- ✅ Supabase Client Initialized ---")
+    # I-start ang job queue; ang mga naiwang jobs mula sa huling run ay itutuloy
+    job_queue = JobQueue()
+    job_queue.register("process-pdf", run_process_pdf_job)
+    job_queue.register("reflow-pdf", run_reflow_pdf_job)
+    job_queue.register("process-interactive", run_interactive_job)
+    job_queue.register("process-all", run_process_all_job)
+    job_queue.start()
+    app_state["job_queue"] = job_queue
     
     yield # Ito ang magpapatakbo sa application
     
     # Ito ay tatakbo pagkatapos mag-shutdown ng server (optional)
     print("---  shutting down ---")
+    job_queue.stop(timeout=5)
     app_state.clear()
 
 app = FastAPI(lifespan=lifespan)
 
 # --- ✨ DEPENDENCY INJECTION ✨ ---
-def get_supabase() -> Client:
-    """Dependency to get the Supabase client from app state."""
-    return app_state["supabase_client"]
+def get_supabase() -> "Client":
+    """Dependency to get the shared Supabase client (ginagawa sa warm-up o sa unang gamit)."""
+    from persistence import get_supabase_client
+    return get_supabase_client()
+
+def get_job_queue() -> JobQueue:
+    """Dependency to get the job queue from app state."""
+    return app_state["job_queue"]
+
+def enqueue_job(job_queue: JobQueue, kind: str, payload: Dict[str, Any]) -> str:
+    """I-save ang job sa queue; mag-return ng 429 kapag puno na ang queue."""
+    try:
+        return job_queue.submit(kind, payload)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "60"})
 
 @app.on_event("startup")
 async def startup_event():
@@ -59,48 +152,69 @@ async def startup_event():
 async def root():
     return {"greeting": "Hello, World!", "message": "Welcome to FastAPI!"}
 
-@app.post("/process-pdf")
-async def create_processing_job(request: ProcessRequest, background_tasks: BackgroundTasks):
+@app.get("/healthz")
+async def liveness():
+    """Liveness: sumasagot agad, kahit hindi pa tapos ang warm-up."""
+    return {"status": "alive"}
+
+@app.get("/readyz")
+async def readiness():
+    """Readiness: 200 kapag tapos na ang warm-up at tumatakbo ang job queue, 503 kung hindi pa."""
+    warmup = app_state.get("warmup", {"status": "starting"})
+    ready = warmup["status"] == "ready" and "job_queue" in app_state
+    return JSONResponse(status_code=200 if ready else 503, content={"ready": ready, "warmup": warmup})
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus metrics: stage timings, pages, uploads, DB requests, at queue depths."""
+    job_queue = app_state.get("job_queue")
+    if job_queue is not None:
+        JOB_QUEUE_DEPTH.set(job_queue.queue_depth())
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str, job_queue: JobQueue = Depends(get_job_queue)):
+    """Ibinabalik ang status (queued, running, succeeded, failed) ng isang processing job."""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job
+
+@app.post("/process-pdf", status_code=202)
+async def create_processing_job(request: ProcessRequest, job_queue: JobQueue = Depends(get_job_queue)):
     """
     Tumatanggap ng request at sinisimulan ang PDF processing sa background.
     """
     try:
-        # Gamitin ang BackgroundTasks para agad na mag-return ng response
-        # habang tumatakbo ang mabigat na trabaho sa background.
+        # I-queue ang job para agad na mag-return ng response
+        # habang tumatakbo ang mabigat na trabaho sa job workers.
         config = request.config
-        background_tasks.add_task(process_pdf_from_url,
-                                  request.pdf_file_id,
-                                  config.issue_number,
-                                  config.publication_date,
-                                  config.table_of_contents
-        )
+        job_id = enqueue_job(job_queue, "process-pdf", request.model_dump())
         
         print(f"Accepted job for issue: {config.issue_number}. Processing in background.")
         
         # Agad na mag-return ng 202 Accepted response
-        return {"message": "Processing job accepted", "issue_name": config.issue_number}
+        return {"message": "Processing job accepted", "issue_name": config.issue_number, "job_id": job_id}
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/reflow-pdf")
+@app.post("/reflow-pdf", status_code=202)
 async def trigger_reflow_pdf(
     request: ReflowRequest,
-    background_tasks: BackgroundTasks,
-    # I-inject ang Supabase client sa endpoint
-    supabase: Client = Depends(get_supabase) 
+    # I-inject ang job queue sa endpoint
+    job_queue: JobQueue = Depends(get_job_queue)
     ): # <-- Gamitin ang bagong model
     """
     Endpoint para sa bago at improved na 'reflow' processing.
     """
     try:
-        background_tasks.add_task(
-            process_pdf_for_reflow,
-            request.pdf_file_id,
-            request.config, # <-- Ipasa ang buong config object
-            supabase
-        )
-        return {"message": f"Accepted REFLOW job for issue: {request.config.issue_number}. Processing in background."}
+        job_id = enqueue_job(job_queue, "reflow-pdf", request.model_dump())
+        return {"message": f"Accepted REFLOW job for issue: {request.config.issue_number}. Processing in background.", "job_id": job_id}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -108,22 +222,35 @@ async def trigger_reflow_pdf(
 def read_root():
     return {"status": "Magazine Worker is running"}
 
-@app.post("/process-interactive")
+@app.post("/process-interactive", status_code=202)
 async def trigger_process_pdf_interactive(
     request: ProcessRequest, 
-    background_tasks: BackgroundTasks,
-    supabase: Client = Depends(get_supabase)
+    job_queue: JobQueue = Depends(get_job_queue)
     ):
     """
     The new endpoint that will create a manifest with detailed element hotspots.
     """
     try:
-        background_tasks.add_task(
-            process_pdf_interactive, # <-- Tinatawag na nito ang bagong function
-            request.pdf_file_id, 
-            request.config,
-            supabase # <-- ✨ At ipasa ito sa background task ✨
-        )
-        return {"message": f"Accepted INTERACTIVE processing job for issue: {request.config.issue_number}."}
+        job_id = enqueue_job(job_queue, "process-interactive", request.model_dump())
+        return {"message": f"Accepted INTERACTIVE processing job for issue: {request.config.issue_number}.", "job_id": job_id}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/process-all", status_code=202)
+async def trigger_process_all(
+    request: ProcessRequest,
+    job_queue: JobQueue = Depends(get_job_queue)
+    ):
+    """
+    Gumagawa ng image, interactive at reflow outputs sa isang pass lang:
+    isang download, isang parse, at isang analysis bawat page.
+    """
+    try:
+        job_id = enqueue_job(job_queue, "process-all", request.model_dump())
+        return {"message": f"Accepted COMBINED processing job for issue: {request.config.issue_number}.", "job_id": job_id}
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
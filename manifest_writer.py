@@ -0,0 +1,152 @@
+import io
+import os
+import gzip
+import json
+from concurrent.futures import Future
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from uploader import UploadPipeline
+from metrics import timed
+from streaming import PageSpool
+
+# Optional: kung walang `brotli`, gzip variant lang ang ina-upload
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# --- Manifest Writer ---
+# Ang manifest.json at content.json ay isinusulat nang compact (walang indent at
+# spaces), kasama ang precompressed variants (.gz at .br) sa tabi ng bawat file.
+#
+# Para hindi na i-download ng viewer ang buong issue bago ipakita ang page 1,
+# hinahati rin ang manifest sa per-page shards at isang maliit na index:
+#   {stem}/index.json        metadata + page summaries (laki, image URL) + shard URL
+#   {stem}/page-0001.json    buong data ng isang page
+# Ang buong manifest ay ina-upload pa rin sa dating path para sa kasalukuyang viewers.
+#
+# Ang Vercel Blob at Supabase Storage ay hindi nagse-save ng Content-Encoding ng
+# isang object, kaya ang variants ay hiwalay na files (`.json.gz`, `.json.br`) at ang
+# index ay naglilista kung alin ang available. Ang viewer (o isang edge rewrite na
+# nagdadagdag ng `Content-Encoding`) ang pipili ng variant.
+#
+# Sa streaming mode, ang `pages` ay isang PageSpool sa disk: ang shards ay binabasa
+# at ina-upload isa-isa, at ang buong manifest ay sine-serialize page by page, kaya
+# hindi nabubuo sa memory ang buong listahan ng page dicts.
+
+ENCODING_SUFFIXES = {"gzip": ".gz", "br": ".br"}
+ENCODING_CONTENT_TYPES = {"gzip": "application/gzip", "br": "application/x-brotli"}
+
+# Comma-separated na encodings na ia-upload (default: gzip at br)
+MANIFEST_ENCODINGS = [
+    encoding.strip() for encoding in os.getenv("MANIFEST_ENCODINGS", "gzip,br").split(",")
+    if encoding.strip() in ENCODING_SUFFIXES
+]
+# Isulat din ang per-page shards at index (1) o ang buong manifest lang (0)
+MANIFEST_SHARDS = os.getenv("MANIFEST_SHARDS", "1") == "1"
+# Isang beses lang kino-compress bawat issue, kaya sulit ang pinakamataas na levels
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+def dumps_compact(value: Any) -> bytes:
+    """JSON na walang whitespace; ang non-ASCII (hal. ñ) ay UTF-8 sa halip na \\u escapes."""
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode('utf-8')
+
+def available_encodings() -> List[str]:
+    return [encoding for encoding in MANIFEST_ENCODINGS if encoding != "br" or brotli is not None]
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        # mtime=0 para pareho ang bytes sa bawat run (para sa upload dedup)
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY, mode=brotli.MODE_TEXT)
+    raise ValueError(f"Unsupported manifest encoding: {encoding}")
+
+def dumps_manifest(value: Any) -> bytes:
+    """
+    Katulad ng `dumps_compact` (parehong bytes), pero ang PageSpool values ng isang
+    dict ay isinusulat isang page sa isang pagkakataon.
+    """
+    if not isinstance(value, dict) or not any(isinstance(item, PageSpool) for item in value.values()):
+        return dumps_compact(value)
+    out = io.BytesIO()
+    out.write(b"{")
+    for i, (key, item) in enumerate(value.items()):
+        if i:
+            out.write(b",")
+        out.write(dumps_compact(key) + b":")
+        if isinstance(item, PageSpool):
+            out.write(b"[")
+            for j, page in enumerate(item):
+                if j:
+                    out.write(b",")
+                out.write(dumps_compact(page))
+            out.write(b"]")
+        else:
+            out.write(dumps_compact(item))
+    out.write(b"}")
+    return out.getvalue()
+
+def submit_json(pipeline: UploadPipeline, target: Any, path: str, value: Any) -> Future:
+    """Queues `value` as compact JSON at `path`, plus a precompressed variant per encoding."""
+    body = dumps_manifest(value)
+    for encoding in available_encodings():
+        pipeline.submit(target, path + ENCODING_SUFFIXES[encoding], compress(body, encoding), ENCODING_CONTENT_TYPES[encoding])
+    return pipeline.submit(target, path, body, "application/json")
+
+def shard_stem(path: str) -> str:
+    """`{issue}/manifest.json` -> `{issue}/manifest` (ang folder ng index at shards)."""
+    return path[:-len(".json")] if path.endswith(".json") else path
+
+def page_shards(pages: Iterable[Dict[str, Any]], number_key: str, summary_keys: Sequence[str]) -> Iterator[Tuple[int, Dict[str, Any], Any]]:
+    """
+    (page number, summary, shard) para sa manifests na ang bawat page entry ay buong shard na.
+    Lazy, para ang pages ng isang PageSpool ay binabasa isa-isa.
+    """
+    for page in pages:
+        yield page[number_key], {key: page[key] for key in summary_keys if key in page}, page
+
+@timed("manifest")
+def upload_manifest(
+        pipeline: UploadPipeline,
+        target: Any,
+        path: str,
+        manifest: Dict[str, Any],
+        shards: Optional[Iterable[Tuple[int, Dict[str, Any], Any]]] = None,
+        pages_key: str = "pages",
+        sharded_keys: Sequence[str] = ()) -> str:
+    """
+    Uploads `manifest` compactly to `path` and returns its URL. With `shards`
+    (page number, summary, shard data), also writes one file per page and an
+    index of the manifest minus `pages_key` (and `sharded_keys`, whose data the
+    shards already carry), listing each page's summary and shard URL.
+    `shards` is iterated once, so it can be a generator.
+    Call only after the page uploads are joined and resolved.
+    """
+    encodings = available_encodings()
+    index_url = None
+    if shards is not None and MANIFEST_SHARDS:
+        stem = shard_stem(path)
+        # Ang summaries lang ang itinatago; ang shard mismo ay nasa pipeline na
+        summaries, shard_urls = [], []
+        for page_number, summary, shard in shards:
+            summaries.append(summary)
+            shard_urls.append(submit_json(pipeline, target, f"{stem}/page-{page_number:04d}.json", shard))
+        # Kailangan ang shard URLs bago isulat ang index
+        pipeline.join()
+        index = {key: value for key, value in manifest.items() if key != pages_key and key not in sharded_keys}
+        index["encodings"] = {encoding: ENCODING_SUFFIXES[encoding] for encoding in encodings}
+        index[pages_key] = [
+            {**summary, "shard": url.result()}
+            for summary, url in zip(summaries, shard_urls)
+        ]
+        index_url = submit_json(pipeline, target, f"{stem}/index.json", index)
+
+    url = submit_json(pipeline, target, path, manifest)
+    pipeline.join()
+    if index_url is not None:
+        print(f"  - Uploaded manifest index ({len(shard_urls)} page shards): {index_url.result()}")
+    if encodings:
+        print(f"  - Precompressed variants: {', '.join(path + ENCODING_SUFFIXES[encoding] for encoding in encodings)}")
+    return url.result()
@@ -0,0 +1,310 @@
+import json
+import time
+import threading
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# --- Metrics ---
+# Timing spans sa bawat stage ng processors (download, render, autocrop, encode,
+# text extraction, uploads, DB writes, ...), pinagsama sa Prometheus histograms at
+# counters na makikita sa `/metrics` ng main.py. Ang bawat job ay may sariling
+# JobMetrics; kapag natapos ang job, isang JSON summary line ang pini-print.
+#
+# Walang external dependency: ang exposition ay ang Prometheus text format (0.0.4).
+# Nasa memory ng process ang values, kaya isang server process bawat scrape target.
+# Ang spans sa render worker processes ay ibinabalik kasama ng resulta nila at
+# nire-record sa parent (tingnan ang `collect_spans` at `record_spans`).
+
+# Seconds; mula sa maliliit na per-page stages hanggang sa buong downloads
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+JOB_BUCKETS = (1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1200.0, 1800.0, 3600.0)
+
+LabelValues = Tuple[str, ...]
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Ang metric na walang labels ay laging may sample (0 sa simula)
+        self._values: Dict[LabelValues, float] = {} if self.labelnames else {(): 0}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in sorted(self._values.items())]
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Ang metric na walang labels ay laging may sample (0 sa simula)
+        self._values: Dict[LabelValues, float] = {} if self.labelnames else {(): 0}
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in sorted(self._values.items())]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = STAGE_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # label values -> [per-bucket counts (hindi cumulative), sum, count]
+        self._values: Dict[LabelValues, List[Any]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    le = f'le="{_format_value(bound)}"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+class MetricsRegistry:
+    """The process's metrics, in registration order."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = STAGE_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Prometheus text exposition of every metric."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STAGE_SECONDS = REGISTRY.histogram("magazine_stage_duration_seconds", "Time spent in each processing stage.", ("kind", "stage"))
+JOB_SECONDS = REGISTRY.histogram("magazine_job_duration_seconds", "Duration of processing jobs.", ("kind", "status"), JOB_BUCKETS)
+JOBS = REGISTRY.counter("magazine_jobs_total", "Finished processing jobs.", ("kind", "status"))
+JOBS_IN_PROGRESS = REGISTRY.gauge("magazine_jobs_in_progress", "Processing jobs currently running.", ("kind",))
+JOB_QUEUE_DEPTH = REGISTRY.gauge("magazine_job_queue_depth", "Jobs waiting for a worker.")
+PAGES = REGISTRY.counter("magazine_pages_processed_total", "Pages processed (not counting reused unchanged pages).", ("kind",))
+PAGES_REUSED = REGISTRY.counter("magazine_pages_reused_total", "Unchanged pages reused from the previous run.", ("kind",))
+PAGES_PER_SECOND = REGISTRY.gauge("magazine_last_job_pages_per_second", "Processed pages per second of the last finished job.", ("kind",))
+UPLOADS = REGISTRY.counter("magazine_uploads_total", "Upload attempts by outcome (uploaded, skipped, retried, failed).", ("target", "result"))
+UPLOAD_BYTES = REGISTRY.counter("magazine_upload_bytes_total", "Bytes uploaded.", ("target",))
+UPLOAD_QUEUE_DEPTH = REGISTRY.gauge("magazine_upload_queue_depth", "Uploads queued or in flight across all pipelines.")
+UPLOAD_QUEUE_BYTES = REGISTRY.gauge("magazine_upload_queue_bytes", "Bytes queued or in flight across all pipelines.")
+DB_REQUESTS = REGISTRY.counter("magazine_db_requests_total", "Database requests by outcome (ok, retried, failed).", ("result",))
+
+# --- Per-job metrics ---
+class JobMetrics:
+    """
+    Stage totals and counters of one job. With `keep_spans` the individual
+    spans are kept too, so a worker process can hand them to its parent.
+    """
+
+    def __init__(self, kind: str, job_id: Optional[str] = None, keep_spans: bool = False):
+        self.kind = kind
+        self.job_id = job_id
+        self.info: Dict[str, Any] = {}
+        self.stages: Dict[str, List[float]] = {}
+        self.counts: Dict[str, float] = {}
+        self.spans: Optional[List[Tuple[str, float]]] = [] if keep_spans else None
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add_span(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            totals = self.stages.setdefault(stage, [0.0, 0])
+            totals[0] += seconds
+            totals[1] += 1
+            if self.spans is not None:
+                self.spans.append((stage, seconds))
+
+    def count(self, key: str, amount: float = 1) -> None:
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + amount
+
+    def summary(self, status: str = "running") -> Dict[str, Any]:
+        duration = time.perf_counter() - self.started
+        pages = self.counts.get("pages", 0)
+        with self._lock:
+            return {
+                "event": "job_summary",
+                "kind": self.kind,
+                "job_id": self.job_id,
+                **self.info,
+                "status": status,
+                "duration_seconds": round(duration, 3),
+                "pages_per_second": round(pages / duration, 3) if duration else None,
+                **{key: value for key, value in sorted(self.counts.items())},
+                "stages": {stage: {"seconds": round(seconds, 4), "count": int(count)} for stage, (seconds, count) in sorted(self.stages.items())},
+            }
+
+_current_job: ContextVar[Optional[JobMetrics]] = ContextVar("current_job", default=None)
+
+def current_job() -> Optional[JobMetrics]:
+    return _current_job.get()
+
+@contextmanager
+def track_job(kind: str, job_id: Optional[str] = None) -> Iterator[JobMetrics]:
+    """
+    Runs a job under its own JobMetrics. On exit the job counters and the
+    duration histogram are updated and the JSON summary is printed.
+    """
+    job = JobMetrics(kind, job_id)
+    token = _current_job.set(job)
+    JOBS_IN_PROGRESS.inc(kind=kind)
+    status = "failed"
+    try:
+        yield job
+        status = "succeeded"
+    finally:
+        _current_job.reset(token)
+        JOBS_IN_PROGRESS.dec(kind=kind)
+        summary = job.summary(status)
+        JOBS.inc(kind=kind, status=status)
+        JOB_SECONDS.observe(summary["duration_seconds"], kind=kind, status=status)
+        if status == "succeeded" and summary["pages_per_second"] is not None:
+            PAGES_PER_SECOND.set(summary["pages_per_second"], kind=kind)
+        print(json.dumps(summary, default=str))
+
+def annotate_job(**info) -> None:
+    """Adds fields (e.g. the issue) to the current job's summary."""
+    job = current_job()
+    if job is not None:
+        job.info.update(info)
+
+def count(key: str, amount: float = 1, job: Optional[JobMetrics] = None) -> None:
+    """Adds to a per-job counter of the current (or given) job; pages also feed the global counters."""
+    job = job or current_job()
+    kind = job.kind if job else "none"
+    if key == "pages":
+        PAGES.inc(amount, kind=kind)
+    elif key == "pages_reused":
+        PAGES_REUSED.inc(amount, kind=kind)
+    if job is not None:
+        job.count(key, amount)
+
+# --- Spans ---
+def record_span(stage: str, seconds: float, job: Optional[JobMetrics] = None) -> None:
+    job = job or current_job()
+    STAGE_SECONDS.observe(seconds, kind=job.kind if job else "none", stage=stage)
+    if job is not None:
+        job.add_span(stage, seconds)
+
+def record_spans(spans: List[Tuple[str, float]], job: Optional[JobMetrics] = None) -> None:
+    """Records spans collected in another process (see `collect_spans`)."""
+    for stage, seconds in spans:
+        record_span(stage, seconds, job)
+
+@contextmanager
+def span(stage: str, job: Optional[JobMetrics] = None) -> Iterator[None]:
+    """Times the enclosed block as one `stage` span of the current (or given) job."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(stage, time.perf_counter() - start, job)
+
+def timed(stage: str) -> Callable:
+    """Decorator: every call of the function is one `stage` span."""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+@contextmanager
+def collect_spans() -> Iterator[JobMetrics]:
+    """For worker processes: collects spans (in `.spans`) instead of recording them locally."""
+    job = JobMetrics("worker", keep_spans=True)
+    token = _current_job.set(job)
+    try:
+        yield job
+    finally:
+        _current_job.reset(token)
+
+def render_metrics() -> str:
+    return REGISTRY.render()
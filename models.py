@@ -1,11 +1,47 @@
-from pydantic import BaseModel
-from typing import List, Dict, Any
+from pydantic import BaseModel, Field, conint, field_validator
+from typing import List, Dict, Any, Literal, Optional
+from page_ranges import parse_page_ranges
 
 # --- Model para sa Reflow Config ---
 class ReflowConfig(BaseModel):
     issue_number: str
     publication_date: str
     table_of_contents: List[Dict[str, Any]]
+    # Ilang worker processes ang gagamitin sa pag-render (default: PDF_RENDER_WORKERS o CPU count)
+    render_workers: Optional[int] = None
+    # Format ng page at element images (default: IMAGE_FORMAT env o "png")
+    image_format: Optional[Literal["png", "webp", "avif"]] = None
+    # Quality ng lossy formats, 1-100 (default: IMAGE_QUALITY env o 80)
+    image_quality: Optional[int] = Field(default=None, ge=1, le=100)
+    # I-palette quantize ang pages na walang raster images (text at vector lang)
+    quantize_text_pages: bool = False
+    # Gumawa rin ng Deep Zoom tile pyramid para sa bawat page (image processor)
+    tile_pyramid: bool = False
+    # Kunin ang orihinal na image stream ng element images (JPEG passthrough) sa halip na i-render ang clip
+    native_images: bool = False
+    # Format ng reflow content: 1 = dating per-element dicts, 2 = columnar na may style tables sa
+    # hiwalay na content.v2.json; ang content.json ay laging 1 (default: REFLOW_FORMAT_VERSION env o 1)
+    reflow_format_version: Optional[Literal[1, 2]] = None
+    # I-reuse ang pages na walang pagbabago mula sa huling run ng parehong issue
+    incremental: bool = True
+    # Mga page na laging ipoproseso ulit, hal. "3,5-7" (o "all")
+    force_pages: Optional[str] = None
+    # Bounded-memory streaming mode (per-page results sa disk); None = awtomatiko ayon sa
+    # dami ng pages (STREAMING_MIN_PAGES env o 200)
+    streaming: Optional[bool] = None
+    # Mga lapad (pixels) ng dagdag na page images para sa srcset, hal. [320, 640, 1280];
+    # None = SRCSET_WIDTHS env (default: wala), [] = walang srcset
+    srcset_widths: Optional[List[conint(ge=1)]] = None
+
+    @field_validator("force_pages")
+    @classmethod
+    def check_force_pages(cls, value: Optional[str]) -> Optional[str]:
+        # I-reject agad (422) ang maling syntax, hal. "abc" o "5-3", sa halip na sa gitna ng job
+        try:
+            parse_page_ranges(value, 0)
+        except ValueError:
+            raise ValueError(f'Invalid page ranges: {value!r} (expected e.g. "3,5-7" or "all")')
+        return value
 
 # --- Model para sa Reflow Request Body ---
 class ReflowRequest(BaseModel):
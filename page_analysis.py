@@ -0,0 +1,181 @@
+import fitz  # PyMuPDF
+from functools import cached_property
+from typing import Any, Dict, List, Optional, Tuple
+from autocrop import DEFAULT_WHITE_THRESHOLD, autocrop_pixmap
+from image_codecs import ImageEncoder, get_default_encoder
+from metrics import span
+
+# --- Shared Per-Page Analysis ---
+# Ang bawat processor (image, interactive, reflow) ay gumagamit ng parehong
+# raw analysis ng page. Dito ito kinukuha nang isang beses lang, at tamad (lazy):
+# walang ire-render o ie-extract hangga't hindi kailangan ng isang output generator.
+#
+# Lahat ng raster ng page (page image, srcset sizes, tiles, element clips) ay mula sa
+# iisang fitz.DisplayList: ang content stream ay ini-interpret nang isang beses lang,
+# at ang bawat dagdag na output size ay rasterization na lang.
+
+DEFAULT_DPI = 150
+
+class PageAnalysis:
+    """
+    Lazily computed, cached analysis of one PDF page.
+
+    Every attribute is computed at most once, so when several output
+    generators share one instance, the page is rendered once and its text
+    is extracted once.
+    """
+
+    def __init__(self, page: fitz.Page, page_number: int, dpi: int = DEFAULT_DPI, white_threshold: int = DEFAULT_WHITE_THRESHOLD, encoder: Optional[ImageEncoder] = None):
+        self.page = page
+        self.page_number = page_number
+        self.dpi = dpi
+        self.white_threshold = white_threshold
+        self.encoder = encoder or get_default_encoder()
+
+    @cached_property
+    def display_list(self) -> fitz.DisplayList:
+        """Ang na-interpret na content ng page (kasama ang annotations, gaya ng `page.get_pixmap`)."""
+        with span("display_list"):
+            return self.page.get_displaylist()
+
+    def render(self, matrix: fitz.Matrix = fitz.Identity, clip: Any = None) -> fitz.Pixmap:
+        """Katumbas ng `page.get_pixmap(matrix=matrix, clip=clip)`, pero mula sa display list."""
+        display_list = self.display_list  # hiwalay na "display_list" span
+        with span("render"):
+            return display_list.get_pixmap(matrix=matrix, clip=clip)
+
+    def render_box(self, box: fitz.Rect, width: int, height: int) -> fitz.Pixmap:
+        """Nire-render ang `box` (PDF points) diretso sa eksaktong `width` x `height` pixels."""
+        matrix = fitz.Matrix(1, 0, 0, 1, -box.x0, -box.y0) * fitz.Matrix(width / box.width, height / box.height)
+        return self.render(matrix, clip=box)
+
+    @cached_property
+    def pixmap(self) -> fitz.Pixmap:
+        """Ang buong page na naka-render sa `dpi`."""
+        zoom = self.dpi / 72.0
+        pixmap = self.render(fitz.Matrix(zoom, zoom))
+        # Gaya ng `page.get_pixmap(dpi=...)`, para pareho ang PNG metadata
+        pixmap.set_dpi(self.dpi, self.dpi)
+        return pixmap
+
+    @cached_property
+    def autocrop(self) -> Dict[str, Any]:
+        """
+        Inaalis ang puting borders ng na-render na page, direkta sa pixmap samples.
+        Returns the cropped image bytes (encoded once, in the encoder's format), its
+        pixel size, the pixel bbox (None if the page is blank) and the content box
+        converted back to PDF points.
+        """
+        pixmap = self.pixmap  # hiwalay na "render" span
+        with span("autocrop"):
+            cropped, pixel_bbox = autocrop_pixmap(pixmap, self.white_threshold)
+        if pixel_bbox is None:
+            # Kung walang nahanap na content, gamitin ang buong page
+            content_box = self.page.rect
+        else:
+            # Ang scale factor ay dpi / 72 (standard PDF points per inch)
+            scale = self.dpi / 72.0
+            x0, y0, x1, y1 = pixel_bbox
+            content_box = fitz.Rect(x0 / scale, y0 / scale, x1 / scale, y1 / scale)
+        return {
+            "image_bytes": self.encoder.encode(cropped, text_only=self.encoder.quantize_text_pages and self.is_text_only),
+            "format": self.encoder.image_format,
+            "pixel_bbox": pixel_bbox,
+            "content_box": content_box,
+            "width": cropped.width,
+            "height": cropped.height,
+        }
+
+    @cached_property
+    def renditions(self) -> Dict[int, Dict[str, Any]]:
+        """Width -> rendition (tingnan ang `rendition`)."""
+        return {}
+
+    def rendition(self, width: int) -> Dict[str, Any]:
+        """
+        Ang autocropped content box na naka-render sa lapad na `width` pixels (hal. para
+        sa srcset): its encoded bytes and pixel size. Cached per width, so outputs sharing
+        this analysis rasterize and encode each size once.
+        """
+        if width not in self.renditions:
+            box = self.autocrop["content_box"] & self.page.rect
+            height = max(1, round(width * box.height / box.width))
+            pixmap = self.render_box(box, width, height)
+            self.renditions[width] = {
+                "image_bytes": self.encoder.encode(pixmap, text_only=self.encoder.quantize_text_pages and self.is_text_only),
+                "width": pixmap.width,
+                "height": pixmap.height,
+            }
+        return self.renditions[width]
+
+    @cached_property
+    def textpage(self) -> fitz.TextPage:
+        """Ang text ng page, ina-analyze nang isang beses; lahat ng text views ay mula rito."""
+        with span("text_extraction"):
+            return self.page.get_textpage(flags=fitz.TEXTFLAGS_TEXT)
+
+    @cached_property
+    def text_dict(self) -> Dict[str, Any]:
+        textpage = self.textpage
+        with span("text_extraction"):
+            return self.page.get_text("dict", textpage=textpage)
+
+    @cached_property
+    def raw_dict(self) -> Dict[str, Any]:
+        """Katulad ng `text_dict` pero may bbox ang bawat character (para sa hotspots)."""
+        textpage = self.textpage
+        with span("text_extraction"):
+            return self.page.get_text("rawdict", textpage=textpage)
+
+    @cached_property
+    def text_blocks(self) -> List[Tuple[fitz.Rect, str]]:
+        """
+        Text blocks bilang (bbox, text), katumbas ng `page.get_text("blocks")`
+        pero kinuha mula sa `text_dict` para hindi na ulitin ang extraction.
+        """
+        blocks = []
+        for block in self.text_dict["blocks"]:
+            if block["type"] != 0:
+                continue
+            lines = ["".join(span["text"] for span in line["spans"]) for line in block["lines"]]
+            blocks.append((fitz.Rect(block["bbox"]), "\n".join(lines)))
+        return blocks
+
+    @cached_property
+    def links(self) -> List[Dict[str, Any]]:
+        return self.page.get_links()
+
+    @cached_property
+    def image_info(self) -> List[Dict[str, Any]]:
+        return self.page.get_image_info(xrefs=True)
+
+    @cached_property
+    def clip_paths(self) -> List[Tuple[fitz.Rect, bool]]:
+        """
+        Ang clipping paths ng page bilang (scissor, is_rectangle). Ang scissor ay ang bbox
+        ng clip, naka-intersect na sa mga parent clips nito.
+        """
+        with span("clip_paths"):
+            drawings = self.page.get_drawings(extended=True)
+        clips = []
+        for drawing in drawings:
+            if drawing["type"] != "clip":
+                continue
+            items = drawing["items"]
+            is_rectangle = len(items) == 1 and (items[0][0] == "re" or (items[0][0] == "qu" and items[0][1].is_rectangular))
+            clips.append((fitz.Rect(drawing["scissor"]), is_rectangle))
+        return clips
+
+    @cached_property
+    def is_text_only(self) -> bool:
+        """True kapag walang raster images ang page (text at vector graphics lang)."""
+        return not self.image_info
+
+    def release(self) -> None:
+        """
+        Binibitawan agad ang display list, ang na-render na pixmap, ang encoded image at ang text ng page
+        (streaming mode), sa halip na hintayin ang susunod na page. Kung kailanganin
+        pa ulit ang isa sa mga ito, kukuwentahin ulit.
+        """
+        for name in ("display_list", "pixmap", "autocrop", "renditions", "textpage", "text_dict", "raw_dict", "text_blocks", "clip_paths"):
+            self.__dict__.pop(name, None)
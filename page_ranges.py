@@ -0,0 +1,25 @@
+from typing import Optional, Set
+
+# --- Page Range Specs ---
+# Ang syntax ng `force_pages`: "3,5-7" (1-based) o "all"/"*". Walang heavy imports
+# dito, dahil ginagamit din ito ng models.py sa request validation.
+
+def parse_page_ranges(spec: Optional[str], page_count: int) -> Set[int]:
+    """
+    "1,3-5,9" -> {1, 3, 4, 5, 9} (1-based, within 1..page_count).
+    Ang "all" o "*" ay lahat ng pages.
+    """
+    pages: Set[int] = set()
+    if not spec:
+        return pages
+    for part in spec.replace(" ", "").split(","):
+        if not part:
+            continue
+        if part in ("all", "*"):
+            return set(range(1, page_count + 1))
+        start, _, stop = part.partition("-")
+        first, last = int(start), int(stop or start)
+        if first > last:
+            raise ValueError(f"Invalid page range: {part}")
+        pages.update(range(max(first, 1), min(last, page_count) + 1))
+    return pages
@@ -0,0 +1,176 @@
+import os
+import time
+import threading
+from typing import Any, Dict, List, Optional
+
+from supabase import create_client, Client
+from metrics import span, count, DB_REQUESTS
+
+# --- Persistence Layer ---
+# Iisang lugar para sa lahat ng database writes ng tatlong processors.
+#   - Isang shared Supabase client bawat process (ang httpx connections nito ay
+#     nire-reuse), sa halip na `create_client` sa bawat job.
+#   - Ang TOC ay naka-index ayon sa page, kaya O(pages + toc) ang paghahanda ng rows.
+#   - Ang page rows ay ina-upsert nang naka-chunk (hindi lalampas sa request-size
+#     limits ng PostgREST), at bawat request ay may retry na may backoff.
+#
+# Transactional na issue+pages write: ang PostgREST ay walang multi-request
+# transactions, kaya kapag naka-set ang SUPABASE_SAVE_ISSUE_RPC, ang issue at lahat
+# ng pages ay ipinapasa sa isang Postgres function na tumatakbo sa iisang transaction.
+# Halimbawang function (i-adjust sa totoong columns ng tables):
+#
+#   create or replace function save_issue_with_pages(issue jsonb, pages jsonb)
+#   returns bigint language plpgsql as $$
+#   declare saved_id bigint;
+#   begin
+#     insert into magazine_issues (issue_slug, issue_number, publication_date, status,
+#                                  manifest_url, cover_image_url, page_dimensions)
+#     select issue_slug, issue_number, publication_date, status, manifest_url,
+#            cover_image_url, page_dimensions
+#     from jsonb_populate_record(null::magazine_issues, issue)
+#     on conflict (issue_slug) do update set
+#       issue_number = excluded.issue_number, publication_date = excluded.publication_date,
+#       status = excluded.status, manifest_url = excluded.manifest_url,
+#       cover_image_url = excluded.cover_image_url, page_dimensions = excluded.page_dimensions
+#     returning id into saved_id;
+#
+#     insert into magazine_pages (issue_id, page_number, background_image_url, section,
+#                                 title, crop_box, width, height, image_format)
+#     select saved_id, page_number, background_image_url, section, title, crop_box,
+#            width, height, image_format
+#     from jsonb_populate_recordset(null::magazine_pages, pages)
+#     on conflict (issue_id, page_number) do update set
+#       background_image_url = excluded.background_image_url, section = excluded.section,
+#       title = excluded.title, crop_box = excluded.crop_box, width = excluded.width,
+#       height = excluded.height, image_format = excluded.image_format;
+#     return saved_id;
+#   end $$;
+#
+# Kung wala ito, ang issue ay isinusulat muna at saka ang page chunks (may retry lahat).
+
+# Ilang page rows bawat upsert request
+DB_UPSERT_CHUNK_SIZE = int(os.getenv("DB_UPSERT_CHUNK_SIZE", "200"))
+DB_RETRIES = int(os.getenv("DB_RETRIES", "3"))
+DB_BACKOFF_SECONDS = float(os.getenv("DB_BACKOFF_SECONDS", "0.5"))
+# Pangalan ng Postgres function para sa transactional issue+pages write (walang laman = naka-off)
+SAVE_ISSUE_RPC = os.getenv("SUPABASE_SAVE_ISSUE_RPC", "")
+
+_client: Optional[Client] = None
+_client_lock = threading.Lock()
+
+def get_supabase_client() -> Client:
+    """Ang shared na Supabase client ng process; ginagawa sa unang tawag."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            supabase_url = os.environ.get("SUPABASE_URL")
+            supabase_key = os.environ.get("SUPABASE_SERVICE_KEY")
+            if not supabase_url or not supabase_key:
+                raise ValueError("Supabase URL and Key must be set in environment variables.")
+            if not supabase_url.endswith('/'):
+                print("WARNING: SUPABASE_URL does not have a trailing slash. Appending it.")
+                supabase_url += '/'
+            _client = create_client(supabase_url, supabase_key)
+        return _client
+
+def with_retry(description: str, operation, retries: Optional[int] = None, backoff_seconds: Optional[float] = None):
+    """Runs `operation()` with exponential backoff, re-raising the last error."""
+    retries = retries or DB_RETRIES
+    backoff_seconds = DB_BACKOFF_SECONDS if backoff_seconds is None else backoff_seconds
+    for attempt in range(1, retries + 1):
+        try:
+            with span("db"):
+                result = operation()
+            DB_REQUESTS.inc(result="ok")
+            count("db_requests")
+            return result
+        except Exception as e:
+            if attempt == retries:
+                DB_REQUESTS.inc(result="failed")
+                print(f"  > ❌ {description} failed after {attempt} attempts: {e}")
+                raise
+            DB_REQUESTS.inc(result="retried")
+            delay = backoff_seconds * (2 ** (attempt - 1))
+            print(f"  > ⚠️ {description} attempt {attempt} failed ({e}). Retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+def index_toc(toc_data: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+    """Page number -> ang unang TOC entry para sa page na iyon."""
+    toc_by_page: Dict[int, Dict[str, Any]] = {}
+    for item in toc_data:
+        toc_by_page.setdefault(item['page'], item)
+    return toc_by_page
+
+def upsert_rows(
+        client: Client,
+        table: str,
+        rows: List[Dict[str, Any]],
+        on_conflict: str,
+        chunk_size: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Upserts `rows` in chunks of `chunk_size`, each with retry. Returns the upserted rows."""
+    chunk_size = chunk_size or DB_UPSERT_CHUNK_SIZE
+    saved: List[Dict[str, Any]] = []
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        response = with_retry(
+            f"Upsert of {table} rows {start + 1}-{start + len(chunk)}",
+            lambda: client.table(table).upsert(chunk, on_conflict=on_conflict).execute()
+        )
+        saved.extend(response.data)
+    return saved
+
+def upsert_issue(client: Client, issue_row: Dict[str, Any]) -> Dict[str, Any]:
+    """Upserts one magazine_issues row (keyed by issue_slug) and returns it."""
+    response = with_retry(
+        f"Upsert of magazine_issues '{issue_row['issue_slug']}'",
+        lambda: client.table("magazine_issues").upsert(issue_row, on_conflict="issue_slug").execute()
+    )
+    return response.data[0]
+
+def build_page_rows(pages_data: List[Dict[str, Any]], toc_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """magazine_pages rows (walang issue_id pa) mula sa image manifest pages at sa TOC."""
+    toc_by_page = index_toc(toc_data)
+    rows = []
+    for page in pages_data:
+        page_num = page['page_number']
+        toc_entry = toc_by_page.get(page_num)
+        rows.append({
+            "page_number": page_num,
+            "background_image_url": page['url'],
+            "section": toc_entry['section'] if toc_entry else None,
+            "title": toc_entry['title'] if toc_entry else None,
+            "crop_box": page['crop_box'],
+            "width": page['width'],
+            "height": page['height'],
+            "image_format": page.get('format', 'png'),
+        })
+    return rows
+
+def save_issue_with_pages(
+        client: Client,
+        issue_row: Dict[str, Any],
+        page_rows: List[Dict[str, Any]],
+        chunk_size: Optional[int] = None) -> int:
+    """
+    Writes the issue and its pages; returns the issue ID. Uses the
+    SUPABASE_SAVE_ISSUE_RPC function (one transaction) when configured,
+    otherwise the issue upsert followed by chunked page upserts.
+    """
+    if SAVE_ISSUE_RPC:
+        response = with_retry(
+            f"{SAVE_ISSUE_RPC} for '{issue_row['issue_slug']}'",
+            lambda: client.rpc(SAVE_ISSUE_RPC, {"issue": issue_row, "pages": page_rows}).execute()
+        )
+        print(f"  > Saved issue and {len(page_rows)} pages in one transaction ({SAVE_ISSUE_RPC}).")
+        return response.data
+
+    issue_id = upsert_issue(client, issue_row)['id']
+    print(f"  > Upserted issue with ID: {issue_id}")
+    # Tiyakin na may composite unique key ka sa (issue_id, page_number) sa iyong Supabase table
+    saved = upsert_rows(
+        client, "magazine_pages",
+        [{"issue_id": issue_id, **row} for row in page_rows],
+        on_conflict="issue_id, page_number", chunk_size=chunk_size
+    )
+    print(f"  > Upserted {len(saved)} pages.")
+    return issue_id
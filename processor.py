@@ -1,39 +1,26 @@
 import fitz  # PyMuPDF
-import json
-from vercel_blob import put
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Sequence, Tuple
 import os
-import io
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
-from supabase import create_client, Client
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from supabase import Client
 from slugify import slugify
-import re
-from PIL import Image, ImageChops
-import io
-
-def get_drive_service():
-    client_email = os.getenv("GOOGLE_CLIENT_EMAIL")
-    private_key = os.getenv("GOOGLE_PRIVATE_KEY")
-
-    if not client_email or not private_key:
-        raise ValueError("GOOGLE_CLIENT_EMAIL and GOOGLE_PRIVATE_KEY environment variables must be set.")
-
-    """Creates an authenticated Google Drive service object."""
-    creds = service_account.Credentials.from_service_account_info(
-        {
-            "type": "service_account",
-            "private_key": os.getenv("GOOGLE_PRIVATE_KEY").replace('\\n', '\n'),
-            "client_email": os.getenv("GOOGLE_CLIENT_EMAIL"),
-            "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-            "token_uri": "https://oauth2.googleapis.com/token",
-            "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs"
-        },
-        scopes=['https://www.googleapis.com/auth/drive.readonly'] # Read-only lang ang kailangan
-    )
-    service = build('drive', 'v3', credentials=creds)
-    return service
+from uploader import UploadPipeline, VercelBlobTarget, resolve_uploads
+from page_analysis import PageAnalysis
+from drive import download_to_cache, get_drive_service
+from autocrop import autocrop_pixmap
+from image_codecs import ImageEncoder, content_type_for, extension_for, get_default_encoder
+from hotspots import empty_hotspots, find_text_hotspots
+from tiles import pyramid_metadata, iter_pyramid_tiles, dzi_descriptor
+from srcset import srcset_images, submit_srcset, target_widths
+from manifest_writer import upload_manifest
+from persistence import get_supabase_client, build_page_rows, save_issue_with_pages, index_toc
+from metrics import timed, annotate_job, count, collect_spans, record_spans
+from incremental import DocumentHasher, PageFingerprints, parse_page_ranges, fetch_json, fingerprints_path, image_params
+from streaming import STREAMING_CHUNK_PAGES, STREAMING_UPLOAD_MAX_BYTES, trim_store, use_streaming
+
+BLOB_TARGET = VercelBlobTarget()
 
 def save_to_database(
         issue_name: str, 
@@ -48,51 +35,24 @@ def save_to_database(
     print("  > Saving data to Supabase...")
     
     try:
-        # I-initialize ang Supabase client
-        url: str = os.environ.get("SUPABASE_URL")
-        key: str = os.environ.get("SUPABASE_SERVICE_KEY")
-        supabase: Client = create_client(url, key)
-        # 1. Gumamit ng 'upsert' para sa magazine_issues
-        issue_slug = slugify(issue_name)
-        issue_response = supabase.table("magazine_issues").upsert({
-            "issue_slug": issue_slug,
+        # Ang shared (pooled) client ng process, hindi bagong client bawat job
+        supabase: Client = get_supabase_client()
+        # 1. Ang magazine_issues row; 'upsert' sa issue_slug
+        issue_row = {
+            "issue_slug": slugify(issue_name),
             "issue_number": issue_name,
             "publication_date": publication_date,
             "status": "published",
             "manifest_url": manifest_url,
             "cover_image_url": cover_image_url,
             "page_dimensions": page_dimensions # <-- I-save ang dimensions
-        }, on_conflict="issue_slug").execute()
-        
-        # Kunin ang ID ng na-upsert na issue
-        issue_id = issue_response.data[0]['id']
-        print(f"  > Upserted issue with ID: {issue_id}")
-
-        # 2. Ihanda ang records para sa magazine_pages
-        pages_to_upsert = []
-        for page in pages_data:
-            page_num = page['page_number']
-            # Hanapin ang katumbas na TOC entry para sa page number na ito
-            toc_entry = next((item for item in toc_data if item['page'] == page_num), None)
-            
-            pages_to_upsert.append({
-                "issue_id": issue_id,
-                "page_number": page_num,
-                "background_image_url": page['url'],
-                "section": toc_entry['section'] if toc_entry else None,
-                "title": toc_entry['title'] if toc_entry else None,
-                "crop_box": page['crop_box'],
-                "width": page['width'],
-                "height": page['height'],
-            })
+        }
 
-        # 3. Gumamit ng 'upsert' para sa magazine_pages
-        # Tiyakin na may composite unique key ka sa (issue_id, page_number) sa iyong Supabase table
-        pages_response = supabase.table("magazine_pages").upsert(
-            pages_to_upsert, on_conflict="issue_id, page_number"
-        ).execute()
+        # 2. Ihanda ang records para sa magazine_pages (ang TOC ay naka-index ayon sa page)
+        page_rows = build_page_rows(pages_data, toc_data)
 
-        print(f"  > Upserted {len(pages_response.data)} pages.")
+        # 3. Isulat ang issue at ang pages (naka-chunk, may retry)
+        save_issue_with_pages(supabase, issue_row, page_rows)
         return {"db_status": "success"}
 
     except Exception as e:
@@ -109,216 +69,434 @@ def autocrop_image(image_bytes: bytes) -> bytes:
     Tatanggap ng image bytes, aalisin ang mga puting borders,
     at ibabalik ang na-crop na image bytes.
     """
-    # I-load ang image mula sa bytes
-    image = Image.open(io.BytesIO(image_bytes))
-    
-    # I-convert sa grayscale para mas madali ang analysis
-    # (Hindi kailangan kung sigurado kang laging puti ang background)
-    # bg = Image.new(image.mode, image.size, image.getpixel((0,0)))
-    # diff = ImageChops.difference(image, bg)
-    # diff = ImageChops.add(diff, diff, 2.0, -100)
-    # bbox = diff.getbbox()
-
-    # Isang mas simpleng approach: i-convert sa 'L' (grayscale) at kunin ang bbox
-    grayscale_image = image.convert('L')
-    
-    # I-invert ang image para ang content ay maging puti at ang background ay itim
-    inverted_image = ImageChops.invert(grayscale_image)
-    
-    # Kunin ang bounding box ng non-black (original content) pixels
-    bbox = inverted_image.getbbox()
-    
+    # I-decode nang isang beses diretso sa isang pixmap; ang bbox ay hinahanap sa samples
+    pix = fitz.Pixmap(image_bytes)
+    cropped, bbox = autocrop_pixmap(pix)
+
     if bbox:
-        # I-crop ang original (colored) na image gamit ang nahanap na bbox
-        cropped_image = image.crop(bbox)
-        
-        # I-save ang na-crop na image pabalik sa isang in-memory bytes buffer
-        buffer = io.BytesIO()
-        cropped_image.save(buffer, format='PNG')
-        return buffer.getvalue()
+        # I-encode ang na-crop na pixmap bilang PNG (isang beses lang)
+        return cropped.tobytes("png")
     else:
         # Kung walang nahanap na content (e.g., isang blangkong page),
         # ibalik na lang ang original na image bytes
         return image_bytes
 
-def process_pdf_from_url(file_id: str, issue_name: str, publication_date: str, toc_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+def get_render_workers(requested: Optional[int] = None) -> int:
     """
-    Downloads a PDF, renders pages to PNG, extracts hotspots, and uploads to Vercel Blob.
+    Ilang worker processes ang gagamitin sa pag-render.
+    Priority: request config > PDF_RENDER_WORKERS env var > bilang ng CPU cores.
     """
-    print(f"Processing PDF for issue: {issue_name}")
-    drive_service = get_drive_service()
-    request = drive_service.files().get_media(fileId=file_id)
-
-    # Gumamit ng in-memory buffer para i-download ang file
-    fh = io.BytesIO()
-    downloader = MediaIoBaseDownload(fh, request)
-    done = False
-    while done is False:
-        status, done = downloader.next_chunk()
-        print(f"  > Download {int(status.progress() * 100)}%.")
-    
-    pdf_bytes = fh.getvalue()
-    print("  > PDF downloaded successfully.")
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    hotspots = {
-        "links": [],
-        "emails": [],
-        "phones": [],
-        "urls": []
+    if requested:
+        return max(1, requested)
+    env_workers = os.getenv("PDF_RENDER_WORKERS")
+    if env_workers:
+        return max(1, int(env_workers))
+    return os.cpu_count() or 1
+
+def split_pages(pages: List[int], workers: int, max_chunk_pages: Optional[int] = None) -> List[List[int]]:
+    """
+    Hinahati ang listahan ng page indexes sa magkakasunod na chunks.
+    Mas marami ang chunks kaysa workers para pantay ang load kahit may mabibigat na pages.
+    Ang `max_chunk_pages` ay naglilimita sa laki ng bawat chunk (streaming mode).
+    """
+    chunk_count = min(len(pages), workers * 4)
+    chunk_size = -(-len(pages) // chunk_count)
+    if max_chunk_pages:
+        chunk_size = min(chunk_size, max_chunk_pages)
+    return [pages[start:start + chunk_size] for start in range(0, len(pages), chunk_size)]
+
+def build_page_image(analysis: PageAnalysis) -> Tuple[Dict[str, Any], bytes]:
+    """
+    Builds the page image entry (without URL yet) from the shared page analysis.
+    Returns the entry and the cropped image bytes to upload.
+    """
+    page_num = analysis.page_number
+    # --- ✨ HAKBANG 1 at 2: I-RENDER ANG BUONG PAGE AT I-AUTOCROP ✨ ---
+    crop = analysis.autocrop
+    final_content_box = crop["content_box"]
+    if crop["pixel_bbox"]:
+        print(f"  > Autocropped image to pixel bbox {crop['pixel_bbox']}. Cropped: {len(crop['image_bytes'])} bytes")
+    else:
+        print(f"  > Warning: Autocrop failed for page {page_num}. Using full page.")
+
+    image_entry = {
+        "page_number": page_num, 
+        "url": None, # <-- Pupunan pagkatapos ng upload
+        # ✨ IDAGDAG ANG BAGONG DIMENSIONS ✨
+        "width": crop["width"],
+        "height": crop["height"],
+        "format": crop["format"],
+        "crop_box": {
+            "x0": final_content_box.x0, 
+            "y0": final_content_box.y0, 
+            "x1": final_content_box.x1, 
+            "y1": final_content_box.y1
+        }
     }
-    
-    # ✨ I-DEFINE ANG MGA REGEX PATTERNS DITO ✨
-    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    phone_pattern = r'\b(?:\+?(\d{1,3}))?[-. (]*(\d{3})[-. )]*(\d{3})[-. ]*(\d{4})\b'
-    # Mas simpleng URL pattern para sa text
-    url_pattern = r'\b(?:https?://|www\.)(?:[-\w.]|(?:%[\da-fA-F]{2}))+\b'
+    return image_entry, crop["image_bytes"]
+
+@timed("hotspots")
+def extract_hotspots(analysis: PageAnalysis) -> Dict[str, List[Dict[str, Any]]]:
+    """Extracts link hotspots and the registered text hotspots (emails, phones, URLs, ...) of one page."""
+    page_num = analysis.page_number
+    hotspots = empty_hotspots()
+    # --- B. I-extract ang mga links (hotspots) ---
+    for link in analysis.links:
+        if link.get('kind') == fitz.LINK_URI:
+            hotspots["links"].append({
+                "page": page_num,
+                "url": link.get('uri'),
+                "bbox": list(link.get('from')) # Ang 'from' ay ang Rect object
+            })
+    # --- C. ✨ I-SCAN ANG TEXT GAMIT ANG REGEX ✨ ---
+    # Ang bbox ng bawat match ay mula sa character bboxes (walang page.search_for)
+    for kind, items in find_text_hotspots(analysis.raw_dict, page_num).items():
+        hotspots[kind].extend(items)
+    return hotspots
+
+def build_page_tiles(analysis: PageAnalysis, image_entry: Dict[str, Any]) -> Iterator[Tuple[str, bytes]]:
+    """
+    Idinadagdag ang tile pyramid metadata sa image entry (`image_entry["tiles"]`)
+    at ibinabalik ang mga tiles bilang (relative_path, bytes), level by level.
+    """
+    meta = pyramid_metadata(analysis)
+    image_entry["tiles"] = meta
+    print(f"  > Tile pyramid: {meta['width']}x{meta['height']} px, {meta['max_level'] + 1} levels")
+    return iter_pyramid_tiles(analysis, meta)
+
+def build_page_srcset(analysis: PageAnalysis, image_entry: Dict[str, Any], widths: Sequence[int]) -> List[bytes]:
+    """
+    Idinadagdag ang srcset entries sa image entry (`image_entry["srcset"]`)
+    at ibinabalik ang image bytes ng bawat size, sa parehong pagkakasunod.
+    """
+    image_entry["srcset"], images = srcset_images(analysis, widths)
+    return images
+
+def render_page(page: fitz.Page, page_num: int, page_count: int, encoder: Optional[ImageEncoder] = None, tiles: bool = False, srcset: Sequence[int] = ()) -> Tuple[Dict[str, Any], bytes, Dict[str, List[Dict[str, Any]]], List[Tuple[str, bytes]], List[bytes]]:
+    """
+    Renders and autocrops one page, then extracts its hotspots.
+    Returns the page's image entry (without URL yet), the encoded image bytes to upload, its hotspots,
+    its pyramid tiles (empty unless `tiles` is set) and its srcset images (one per `srcset` width).
+    """
+    print(f"Processing Page {page_num}/{page_count}...")
+    analysis = PageAnalysis(page, page_num, encoder=encoder)
+    image_entry, image_bytes = build_page_image(analysis)
+    srcset_files = build_page_srcset(analysis, image_entry, srcset) if srcset else []
+    tile_files = list(build_page_tiles(analysis, image_entry)) if tiles else []
+    return image_entry, image_bytes, extract_hotspots(analysis), tile_files, srcset_files
+
+def upload_page_tiles(pipeline: UploadPipeline, issue_name: str, image_entry: Dict[str, Any], tile_files: Iterable[Tuple[str, bytes]]):
+    """
+    I-queue ang upload ng .dzi descriptor at ng lahat ng tiles ng page.
+    Ang `tiles.dzi_url` ay magiging Future; ang tile URLs ay sumusunod sa Deep Zoom layout.
+    """
+    meta = image_entry["tiles"]
+    base_path = f"magazine-pages/{issue_name}/tiles/page-{image_entry['page_number']:02d}"
+    content_type = content_type_for(meta["format"])
+    for relative_path, tile_bytes in tile_files:
+        pipeline.submit(BLOB_TARGET, f"{base_path}_files/{relative_path}", tile_bytes, content_type)
+    meta["dzi_url"] = pipeline.submit(BLOB_TARGET, f"{base_path}.dzi", dzi_descriptor(meta), "application/xml")
+
+def upload_page_srcset(pipeline: UploadPipeline, issue_name: str, image_entry: Dict[str, Any], srcset_files: Iterable[bytes]):
+    """I-queue ang upload ng srcset sizes ng page (`page-01-320w.png`, ...); ang URLs ay magiging Futures."""
+    submit_srcset(
+        pipeline, BLOB_TARGET, f"magazine-pages/{issue_name}/page-{image_entry['page_number']:02d}",
+        image_entry["format"], image_entry["srcset"], srcset_files
+    )
+
+def upload_page_image(pipeline: UploadPipeline, issue_name: str, image_entry: Dict[str, Any], image_bytes: bytes):
+    """I-queue ang upload ng na-crop na page image; ang URL ay magiging Future hanggang matapos ang upload."""
+    image_format = image_entry["format"]
+    image_filename = f"page-{image_entry['page_number']:02d}.{extension_for(image_format)}"
+    image_entry["url"] = pipeline.submit(
+        BLOB_TARGET,
+        f"magazine-pages/{issue_name}/{image_filename}",
+        image_bytes, # <-- Gamitin ang na-crop na bytes
+        content_type_for(image_format)
+    )
+
+# --- Worker process state ---
+# Bawat worker ay may sariling fitz document, binuksan mula sa na-download na file.
+_worker_doc = None
+_worker_encoder = None
+_worker_tiles = False
+_worker_streaming = False
+_worker_srcset = ()
+
+def _init_render_worker(pdf_path: str, encoder: Optional[ImageEncoder] = None, tiles: bool = False, streaming: bool = False, srcset: Sequence[int] = ()):
+    global _worker_doc, _worker_encoder, _worker_tiles, _worker_streaming, _worker_srcset
+    _worker_doc = fitz.open(pdf_path)
+    _worker_encoder = encoder
+    _worker_tiles = tiles
+    _worker_streaming = streaming
+    _worker_srcset = srcset
+
+def render_pages(doc: fitz.Document, pages: List[int], encoder: Optional[ImageEncoder] = None, tiles: bool = False, streaming: bool = False, srcset: Sequence[int] = ()) -> Dict[str, Any]:
+    """
+    Renders the given pages (0-based indexes) of an open document, in list order.
+    With `streaming`, MuPDF's store is trimmed after every page.
+    """
+    result = {"pages": [], "images": [], "tiles": [], "srcset": [], "hotspots": empty_hotspots()}
+    for i in pages:
+        image_entry, image_bytes, page_hotspots, tile_files, srcset_files = render_page(doc[i], i + 1, len(doc), encoder, tiles, srcset)
+        result["pages"].append(image_entry)
+        result["images"].append(image_bytes)
+        result["tiles"].append(tile_files)
+        result["srcset"].append(srcset_files)
+        for kind, items in page_hotspots.items():
+            result["hotspots"][kind].extend(items)
+        if streaming:
+            trim_store()
+    return result
+
+def _render_worker_task(pages: List[int]) -> Dict[str, Any]:
+    # Ang timing spans ng worker ay ibinabalik sa parent kasama ng resulta
+    with collect_spans() as worker_metrics:
+        result = render_pages(_worker_doc, pages, _worker_encoder, _worker_tiles, _worker_streaming, _worker_srcset)
+    result["spans"] = worker_metrics.spans
+    return result
 
+def process_pages_sequential(doc: fitz.Document, pages: List[int], issue_name: str, pipeline: UploadPipeline, encoder: Optional[ImageEncoder] = None, tiles: bool = False, streaming: bool = False, srcset: Sequence[int] = ()) -> Tuple[List[Dict[str, Any]], Dict[str, List[Dict[str, Any]]]]:
+    """Isa-isang nire-render ang `pages` (0-based); ang upload ng bawat page ay tumatakbo habang nire-render ang susunod."""
     image_urls = []
+    hotspots = empty_hotspots()
+    for i in pages:
+        print(f"Processing Page {i + 1}/{len(doc)}...")
+        analysis = PageAnalysis(doc[i], i + 1, encoder=encoder)
+        image_entry, image_bytes = build_page_image(analysis)
+        upload_page_image(pipeline, issue_name, image_entry, image_bytes)
+        if srcset:
+            upload_page_srcset(pipeline, issue_name, image_entry, build_page_srcset(analysis, image_entry, srcset))
+        if tiles:
+            # Ina-upload ang tiles habang nire-render pa ang susunod na level
+            upload_page_tiles(pipeline, issue_name, image_entry, build_page_tiles(analysis, image_entry))
+        page_hotspots = extract_hotspots(analysis)
+        image_urls.append(image_entry)
+        for kind, items in page_hotspots.items():
+            hotspots[kind].extend(items)
+        if streaming:
+            analysis.release()
+            trim_store()
+    return image_urls, hotspots
+
+def process_pages_parallel(pdf_path: str, pages: List[int], issue_name: str, workers: int, pipeline: UploadPipeline, encoder: Optional[ImageEncoder] = None, tiles: bool = False, streaming: bool = False, srcset: Sequence[int] = ()) -> Tuple[List[Dict[str, Any]], Dict[str, List[Dict[str, Any]]]]:
+    """
+    Hinahati ang `pages` (0-based) sa isang process pool. Ang uploads ay sinisimulan agad pagkatapos
+    ng bawat chunk, at ang image_urls at hotspots ay naka-merge ayon sa page order,
+    pareho ng output ng sequential loop.
+    With `streaming`, chunks are small and only a few are in flight at a time, so
+    finished-but-not-yet-uploaded page images never pile up in the parent.
+    """
+    chunks = split_pages(pages, workers, STREAMING_CHUNK_PAGES if streaming else None)
+    print(f"  > Rendering {len(pages)} pages with {workers} worker processes ({len(chunks)} chunks)...")
+    chunk_results = [None] * len(chunks)
+    # 'spawn' para hindi ma-inherit ng workers ang threads at sockets ng web server
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_render_worker,
+        initargs=(pdf_path, encoder, tiles, streaming, srcset)
+    ) as executor:
+        pending = iter(enumerate(chunks))
+        # Ilang chunks ang sabay na naka-submit (lahat, maliban sa streaming mode)
+        window = workers * 2 if streaming else len(chunks)
+        futures = {executor.submit(_render_worker_task, chunk): idx for idx, chunk in islice(pending, window)}
+        # I-upload agad ang bawat chunk na natapos, kahit hindi pa ito ang susunod sa page order
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                record_spans(result.pop("spans"))
+                for image_entry, image_bytes, tile_files, srcset_files in zip(result["pages"], result.pop("images"), result.pop("tiles"), result.pop("srcset")):
+                    upload_page_image(pipeline, issue_name, image_entry, image_bytes)
+                    if srcset:
+                        upload_page_srcset(pipeline, issue_name, image_entry, srcset_files)
+                    if tiles:
+                        upload_page_tiles(pipeline, issue_name, image_entry, tile_files)
+                chunk_results[futures.pop(future)] = result
+            for idx, chunk in islice(pending, len(done)):
+                futures[executor.submit(_render_worker_task, chunk)] = idx
+
+    image_urls = []
+    hotspots = empty_hotspots()
+    for result in chunk_results:
+        image_urls.extend(result["pages"])
+        for kind, items in result["hotspots"].items():
+            hotspots[kind].extend(items)
+    return image_urls, hotspots
+
+def download_pdf(file_id: str) -> str:
+    """
+    Downloads the PDF from Google Drive to the local download cache and returns its path.
+    Open it with `fitz.open(path)` so the PDF is read from disk instead of held in RAM.
+    """
+    pdf_path = download_to_cache(get_drive_service(), file_id)
+    print("  > PDF downloaded successfully.")
+    return pdf_path
+
+def get_page_dimensions(doc: fitz.Document) -> Dict[str, float]:
+    """Ang original na PDF dimensions (points) ng unang page, para sa magazine_issues.page_dimensions."""
+    first_page_for_dims = doc[0]
+    return {
+        "width": first_page_for_dims.rect.width,
+        "height": first_page_for_dims.rect.height
+    }
+
+def hotspots_by_page(hotspots: Dict[str, List[Dict[str, Any]]]) -> Dict[int, Dict[str, List[Dict[str, Any]]]]:
+    """Page number -> ang hotspots ng page na iyon, sa parehong kinds (at pagkakasunod) ng `hotspots`."""
+    page_hotspots: Dict[int, Dict[str, List[Dict[str, Any]]]] = {}
+    for kind, items in hotspots.items():
+        for item in items:
+            page_hotspots.setdefault(item["page"], {k: [] for k in hotspots})[kind].append(item)
+    return page_hotspots
+
+def load_previous_image_pages(issue_name: str) -> Dict[int, Dict[str, Any]]:
+    """Page number -> {"entry", "hotspots"} mula sa manifest.json ng huling run."""
+    manifest = fetch_json(BLOB_TARGET, f"magazine-pages/{issue_name}/manifest.json")
+    if not manifest:
+        return {}
+    page_hotspots = hotspots_by_page(manifest.get("hotspots", {}))
+    return {
+        entry["page_number"]: {"entry": entry, "hotspots": page_hotspots.get(entry["page_number"], {})}
+        for entry in manifest.get("pages", [])
+    }
+
+def image_fingerprints(
+        doc: fitz.Document,
+        issue_name: str,
+        toc_data: List[Dict[str, Any]],
+        encoder: Optional[ImageEncoder] = None,
+        tiles: bool = False,
+        incremental: bool = True,
+        force_pages: Optional[str] = None,
+        hasher: Optional[DocumentHasher] = None,
+        srcset: Sequence[int] = ()) -> PageFingerprints:
+    # Kasama ang TOC entry ng page: ang pagbago nito ay nagbabago rin sa magazine_pages row
+    return PageFingerprints(
+        doc, BLOB_TARGET, fingerprints_path(f"magazine-pages/{issue_name}/", "image"),
+        image_params(encoder or get_default_encoder(), tiles, srcset),
+        enabled=incremental, force_pages=parse_page_ranges(force_pages, len(doc)),
+        hasher=hasher, page_extras=index_toc(toc_data)
+    )
 
-    # 3. I-proseso ang bawat page
-    for i, page in enumerate(doc):
-        page_num = i + 1
-        print(f"Processing Page {page_num}/{len(doc)}...")
-        # --- ✨ HAKBANG 1: I-RENDER ANG BUONG PAGE ✨ ---
-        dpi = 150
-        pix = page.get_pixmap(dpi=dpi)
-        img_bytes = pix.tobytes("png")
-
-        # --- ✨ HAKBANG 2: I-CALCULATE ANG CROP BOX GAMIT ANG PILLOW ✨ ---
-        image = Image.open(io.BytesIO(img_bytes))
-        grayscale_image = image.convert('L')
-        inverted_image = ImageChops.invert(grayscale_image)
-        # Ang bbox na ito ay nasa PIXEL coordinates
-        autocrop_pixel_bbox = inverted_image.getbbox()
-
-        if autocrop_pixel_bbox:
-            # I-crop ang imahe
-            cropped_image = image.crop(autocrop_pixel_bbox)
-            buffer = io.BytesIO()
-            cropped_image.save(buffer, format='PNG')
-            cropped_img_bytes = buffer.getvalue()
-            
-            # ✨ I-CONVERT ANG PIXEL BBOX PABALIK SA PDF POINTS ✨
-            # Ang scale factor ay dpi / 72 (standard PDF points per inch)
-            scale = dpi / 72.0
-            x0, y0, x1, y1 = autocrop_pixel_bbox
-            final_content_box = fitz.Rect(x0 / scale, y0 / scale, x1 / scale, y1 / scale)
-            
-            print(f"  > Autocropped image. Original: {len(img_bytes)} bytes, Cropped: {len(cropped_img_bytes)} bytes")
+def merge_image_pages(
+        page_count: int,
+        image_urls: List[Dict[str, Any]],
+        hotspots: Dict[str, List[Dict[str, Any]]],
+        previous: Dict[int, Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, List[Dict[str, Any]]]]:
+    """Pinagsasama ang bagong na-render na pages at ang reused na pages, ayon sa page order."""
+    new_entries = {entry["page_number"]: entry for entry in image_urls}
+    new_hotspots = hotspots_by_page(hotspots)
+    merged_urls, merged_hotspots = [], empty_hotspots()
+    for page_number in range(1, page_count + 1):
+        if page_number in new_entries:
+            entry, page_hotspots = new_entries[page_number], new_hotspots.get(page_number, {})
         else:
-            # Kung walang nahanap na content, gamitin ang original
-            cropped_img_bytes = img_bytes
-            final_content_box = page.rect
-            print(f"  > Warning: Autocrop failed for page {page_num}. Using full page.")
-
-        # 3. I-upload ang na-crop na image bytes
-        image_filename = f"page-{page_num:02d}.png"
-        blob_image = put(
-            f"magazine-pages/{issue_name}/{image_filename}",
-            cropped_img_bytes, # <-- Gamitin ang na-crop na bytes
-            options={'token': os.environ['BLOB_READ_WRITE_TOKEN'], "allowOverwrite": True, "access": 'public'}
-        )
-        # Para makuha ang bagong dimensions, kailangan nating i-load ulit ang na-crop na image
-        final_image = Image.open(io.BytesIO(cropped_img_bytes))
-
-        image_urls.append({
-            "page_number": page_num, 
-            "url": blob_image['url'],
-            # ✨ IDAGDAG ANG BAGONG DIMENSIONS ✨
-            "width": final_image.width,
-            "height": final_image.height,
-            "crop_box": {
-                "x0": final_content_box.x0, 
-                "y0": final_content_box.y0, 
-                "x1": final_content_box.x1, 
-                "y1": final_content_box.y1
-            }
-        })
-        print(f"  > Uploaded image to: {blob_image['url']}")
-        # --- B. I-extract ang mga links (hotspots) ---
-        links = page.get_links()
-        for link in links:
-            if link.get('kind') == fitz.LINK_URI:
-                hotspots["links"].append({
-                    "page": page_num,
-                    "url": link.get('uri'),
-                    "bbox": list(link.get('from')) # Ang 'from' ay ang Rect object
-                })
-        # --- C. ✨ I-EXTRACT ANG TEXT AT I-SCAN GAMIT ANG REGEX ✨ ---
-        
-        # --- ✨ HAKBANG 4: I-adjust ang hotspot bbox gamit ang Master Content Box ✨ ---
-
-        # Kunin ang top-left offset ng page's cropbox
-        # print(f"    [DEBUG] Page {page_num}: Starting HYBRID hotspot extraction...")
-
-        # I-iterate ang lahat ng text blocks
-        text_blocks = page.get_text("dict", flags=fitz.TEXT_PRESERVE_LIGATURES)["blocks"]
-        for block in text_blocks:
-            if "lines" in block:
-                for line in block["lines"]:
-                    for span in line["spans"]:
-                        text = span["text"]
-                        span_bbox = fitz.Rect(span["bbox"]) # Bbox ng buong span
-
-                        # 1. Hanapin ang emails sa loob ng text ng span
-                        for match in re.finditer(email_pattern, text):
-                            # Ngayon, hanapin ang eksaktong BBOX ng match na iyon
-                            # sa loob lang ng span's bounding box.
-                            match_rects = page.search_for(match.group(0), clip=span_bbox, quads=False)
-                            if match_rects:
-                                # Kunin ang unang match (kadalasang isa lang naman ito)
-                                rect = match_rects[0]
-                                print(f"      [DEBUG] Found Email: '{match.group(0)}' at {list(rect)}")
-                                hotspots["emails"].append({"page": page_num, "value": match.group(0), "bbox": list(rect)})
-
-                        # 2. Gawin din para sa phones
-                        for match in re.finditer(phone_pattern, text):
-                            match_rects = page.search_for(match.group(0), clip=span_bbox, quads=False)
-                            if match_rects:
-                                rect = match_rects[0]
-                                print(f"      [DEBUG] Found Phone: '{match.group(0)}' at {list(rect)}")
-                                hotspots["phones"].append({"page": page_num, "value": match.group(0), "bbox": list(rect)})
-
-                        # 3. Gawin din para sa URLs
-                        for match in re.finditer(url_pattern, text):
-                            match_rects = page.search_for(match.group(0), clip=span_bbox, quads=False)
-                            if match_rects:
-                                rect = match_rects[0]
-                                print(f"      [DEBUG] Found URL: '{match.group(0)}' at {list(rect)}")
-                                hotspots["urls"].append({"page": page_num, "value": match.group(0), "bbox": list(rect)})
+            entry, page_hotspots = previous[page_number]["entry"], previous[page_number]["hotspots"]
+        merged_urls.append(entry)
+        for kind, items in page_hotspots.items():
+            merged_hotspots.setdefault(kind, []).extend(items)
+    return merged_urls, merged_hotspots
+
+def image_manifest_shards(image_urls: List[Dict[str, Any]], hotspots: Dict[str, List[Dict[str, Any]]]) -> List[Tuple[int, Dict[str, Any], Dict[str, Any]]]:
+    """Per-page shards ng image manifest: ang page entry at ang hotspots ng page na iyon."""
+    page_hotspots = hotspots_by_page(hotspots)
+    return [
+        (entry["page_number"], entry, {"page": entry, "hotspots": page_hotspots.get(entry["page_number"], {k: [] for k in hotspots})})
+        for entry in image_urls
+    ]
+
+def upload_image_manifest(
+        pipeline: UploadPipeline,
+        file_id: str,
+        issue_name: str,
+        page_count: int,
+        image_urls: List[Dict[str, Any]],
+        hotspots: Dict[str, List[Dict[str, Any]]]) -> str:
+    """Assembles and uploads manifest.json. Call only after the page uploads are joined and resolved."""
     # 4. I-assemble ang manifest/hotspots JSON
     manifest = {
         "metadata": {
             "issue_name": issue_name,
-            "total_pages": len(doc),
+            "total_pages": page_count,
             "pdf_file_id": file_id
         },
         "hotspots": hotspots,
         "pages": image_urls # Isama ang listahan ng mga na-upload na images
     }
 
-    # 5. I-upload ang manifest.json sa Vercel Blob
-    manifest_str = json.dumps(manifest, indent=2)
-    blob_manifest = put(
+    # 5. I-upload ang manifest.json (at ang per-page shards) sa Vercel Blob
+    manifest_url = upload_manifest(
+        pipeline,
+        BLOB_TARGET,
         f"magazine-pages/{issue_name}/manifest.json",
-        manifest_str.encode('utf-8'),
-        options={"allowOverwrite": True, "access": 'public'}
+        manifest,
+        shards=image_manifest_shards(image_urls, hotspots),
+        sharded_keys=("hotspots",)
     )
-    print(f"Uploaded manifest to: {blob_manifest['url']}")
-    first_page_for_dims = doc[0]
-    original_pdf_dimensions = {
-        "width": first_page_for_dims.rect.width,
-        "height": first_page_for_dims.rect.height
-    }
-    save_to_database(
-        issue_name=issue_name,
-        publication_date=publication_date,
-        manifest_url=blob_manifest['url'],
-        cover_image_url=image_urls[0]['url'] if image_urls else None,
-        # Ipasa ang bagong dimensions
-        page_dimensions=original_pdf_dimensions, 
-        pages_data=image_urls,
-        toc_data=toc_data
-    )
-    print(f"  First page dim: ")
-    return {"status": "success", "manifest_url": blob_manifest['url'], "page_count": len(doc)}
\ No newline at end of file
+    print(f"Uploaded manifest to: {manifest_url}")
+    return manifest_url
+
+def process_pdf_from_url(file_id: str, issue_name: str, publication_date: str, toc_data: List[Dict[str, Any]], workers: Optional[int] = None, encoder: Optional[ImageEncoder] = None, tiles: bool = False, incremental: bool = True, force_pages: Optional[str] = None, streaming: Optional[bool] = None, srcset_widths: Optional[List[int]] = None) -> Dict[str, Any]:
+    """
+    Downloads a PDF, renders pages to images (PNG by default, or `encoder`'s format),
+    extracts hotspots, and uploads to Vercel Blob.
+    Pages are split across a process pool when more than one worker is configured.
+    With `tiles`, each page also gets a Deep Zoom tile pyramid (see tiles.py).
+    With `incremental`, pages unchanged since the last run of the issue are reused
+    from its manifest (see incremental.py); `force_pages` (e.g. "3,5-7") are always redone.
+    `streaming` (None = by page count, see streaming.py) bounds memory for very large issues.
+    `srcset_widths` (None = SRCSET_WIDTHS env) adds page images at those pixel widths (see srcset.py).
+    """
+    print(f"Processing PDF for issue: {issue_name}")
+    annotate_job(issue=issue_name)
+    srcset = target_widths(srcset_widths)
+    pdf_path = download_pdf(file_id)
+    doc = fitz.open(pdf_path)
+    page_count = len(doc)
+    streaming = use_streaming(streaming, page_count)
+    if streaming:
+        print(f"  > Streaming mode: {page_count} pages")
+
+    fingerprints = image_fingerprints(doc, issue_name, toc_data, encoder, tiles, incremental, force_pages, srcset=srcset)
+
+    with UploadPipeline(max_bytes_in_flight=STREAMING_UPLOAD_MAX_BYTES if streaming else None) as pipeline:
+        # Para sa re-runs: ang mga artifacts na walang pagbabago ay hindi na ia-upload ulit
+        pipeline.load_marker(BLOB_TARGET, f"magazine-pages/{issue_name}/")
+        previous = fingerprints.load_previous(lambda: load_previous_image_pages(issue_name))
+
+        # 3. I-proseso ang bawat page na nagbago (lahat, kung walang dating run)
+        pages = [page_number - 1 for page_number in fingerprints.changed_pages]
+        count("pages", len(pages))
+        count("pages_reused", page_count - len(pages))
+        workers = min(get_render_workers(workers), len(pages)) if pages else 1
+        if workers > 1:
+            image_urls, hotspots = process_pages_parallel(pdf_path, pages, issue_name, workers, pipeline, encoder, tiles, streaming, srcset)
+        else:
+            image_urls, hotspots = process_pages_sequential(doc, pages, issue_name, pipeline, encoder, tiles, streaming, srcset)
+
+        # Hintayin ang lahat ng page uploads bago isulat ang manifest
+        pipeline.join()
+        resolve_uploads(image_urls)
+        changed_urls = image_urls
+        image_urls, hotspots = merge_image_pages(page_count, image_urls, hotspots, previous)
+
+        manifest_url = upload_image_manifest(pipeline, file_id, issue_name, page_count, image_urls, hotspots)
+
+        page_dimensions = get_page_dimensions(doc)
+        save_to_database(
+            issue_name=issue_name,
+            publication_date=publication_date,
+            manifest_url=manifest_url,
+            cover_image_url=image_urls[0]['url'] if image_urls else None,
+            # Ipasa ang bagong dimensions
+            page_dimensions=page_dimensions,
+            # Sa incremental run, ang rows lang ng nagbagong pages ang isusulat
+            pages_data=changed_urls if fingerprints.is_patch else image_urls,
+            toc_data=toc_data
+        )
+        # Pagkatapos lang ng database write, para ang susunod na run ay hindi mag-reuse ng pages na hindi naisulat
+        fingerprints.publish(pipeline)
+        pipeline.publish_marker(BLOB_TARGET, f"magazine-pages/{issue_name}/")
+    print(f"  First page dim: {page_dimensions['width']:.1f} x {page_dimensions['height']:.1f} pt")
+    return {"status": "success", "manifest_url": manifest_url, "page_count": page_count}
@@ -0,0 +1,189 @@
+import os
+import copy
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+from streaming import PageSpool
+
+# --- Reflow Content Format (versioned) ---
+# Version 1: ang dating content.json, isang dict bawat element na may sariling
+# `font_info` at `reflow_hints`, at ang `p{n}_` prefix sa bawat id at block_id.
+#
+# Version 2: columnar at dictionary-encoded. Kaunti lang ang natatanging styles sa
+# isang issue, kaya ang `font_info` at `reflow_hints` ay nasa issue-wide tables at
+# ang bawat element ay may index lang papunta doon:
+#
+#   "format": "reflow", "version": 2,
+#   "types":  ["text", "image"],
+#   "styles": [{"size": 9.0, "font": "Helvetica", "color": "#000000"}, ...],
+#   "hints":  [{"alignment": "left", "layout_info": {...}, "is_shadow_text": false}, ...],
+#   "pages": [{
+#       "page_number": 1,
+#       "blocks": ["grouped_block_0", "b3", ...],      # block_ids na walang "p1_"
+#       "elements": {                                   # isang array bawat field
+#           "id": ["b0_s0", ...], "type": [0, ...], "block": [0, ...],
+#           "x0": [...], "y0": [...], "x1": [...], "y1": [...],
+#           "content": ["...", null], "src": [null, "https://..."],
+#           "style": [0, -1], "hints": [0, 1], "background": [-1, 5]
+#       }
+#   }]
+#
+# Ang `background` ay ang posisyon (sa parehong page) ng background image ng element,
+# o -1. Ang bboxes ay hindi ni-round, kaya ang `decode_reflow_content` ay ibinabalik
+# ang eksaktong version 1 na structure.
+#
+# Ang content.json ay laging version 1 (iyon ang binabasa ng deployed viewers). Kapag
+# version 2 ang hiniling, hiwalay na object ito (content.v2.json) at naka-advertise ang
+# URL nito sa `formats` ng content.json at ng shard index nito.
+
+REFLOW_FORMAT_VERSION = 2
+# Version na isinusulat ng reflow processor kapag walang `reflow_format_version` sa config
+DEFAULT_REFLOW_FORMAT_VERSION = int(os.getenv("REFLOW_FORMAT_VERSION", "1"))
+
+ELEMENT_COLUMNS = ("id", "type", "block", "x0", "y0", "x1", "y1", "content", "src", "style", "hints", "background")
+
+class Interner:
+    """Assigns each distinct value a stable index, in order of first appearance."""
+
+    def __init__(self, key: Callable[[Any], Any] = lambda value: value):
+        self.values: List[Any] = []
+        self._ids: Dict[Any, int] = {}
+        self._key = key
+
+    def intern(self, value: Any) -> int:
+        key = self._key(value)
+        index = self._ids.get(key)
+        if index is None:
+            index = self._ids[key] = len(self.values)
+            self.values.append(value)
+        return index
+
+def _dict_key(value: Dict[str, Any]) -> tuple:
+    # Kasama ang pagkakasunod ng keys, para pareho ang JSON ng decoded na element
+    return tuple((key, _dict_key(item) if isinstance(item, dict) else item) for key, item in value.items())
+
+def page_prefix(page_number: int) -> str:
+    return f"p{page_number}_"
+
+def _strip_prefix(value: str, prefix: str) -> str:
+    if not value.startswith(prefix):
+        raise ValueError(f"Reflow id {value!r} does not start with page prefix {prefix!r}")
+    return value[len(prefix):]
+
+def encode_reflow_page(page: Dict[str, Any], types: Interner, styles: Interner, hints: Interner) -> Dict[str, Any]:
+    """Encodes one version 1 page ({"page_number", "content"}) using the issue-wide tables."""
+    page_number = page["page_number"]
+    prefix = page_prefix(page_number)
+    blocks = Interner()
+    columns: Dict[str, List[Any]] = {name: [] for name in ELEMENT_COLUMNS}
+    positions = {el["id"]: i for i, el in enumerate(page["content"])}
+
+    for el in page["content"]:
+        x0, y0, x1, y1 = el["bbox"]
+        element_hints = dict(el["reflow_hints"])
+        background_id = element_hints.pop("background_image_id", None)
+        columns["id"].append(_strip_prefix(el["id"], prefix))
+        columns["type"].append(types.intern(el["type"]))
+        columns["block"].append(blocks.intern(_strip_prefix(el["block_id"], prefix)))
+        columns["x0"].append(x0)
+        columns["y0"].append(y0)
+        columns["x1"].append(x1)
+        columns["y1"].append(y1)
+        columns["content"].append(el.get("content"))
+        columns["src"].append(el.get("src"))
+        columns["style"].append(styles.intern(el["font_info"]) if "font_info" in el else -1)
+        columns["hints"].append(hints.intern(element_hints))
+        columns["background"].append(positions[background_id] if background_id is not None else -1)
+
+    return {"page_number": page_number, "blocks": blocks.values, "elements": columns}
+
+def encode_reflow_content(structured_magazine: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Version 1 structured magazine -> version 2 document. When the pages are a
+    PageSpool (streaming mode), the encoded pages go to a new PageSpool.
+    """
+    types, styles, hints = Interner(), Interner(_dict_key), Interner(_dict_key)
+    source = structured_magazine["pages"]
+    encoded = (encode_reflow_page(page, types, styles, hints) for page in source)
+    if isinstance(source, PageSpool):
+        pages = PageSpool()
+        for page in encoded:
+            pages.append(page)
+    else:
+        pages = list(encoded)
+    document = {key: value for key, value in structured_magazine.items() if key != "pages"}
+    document.update({
+        "format": "reflow",
+        "version": REFLOW_FORMAT_VERSION,
+        "types": types.values,
+        "styles": styles.values,
+        "hints": hints.values,
+        "pages": pages,
+    })
+    return document
+
+def decode_reflow_page(page: Dict[str, Any], tables: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Version 2 page -> version 1 page ({"page_number", "content"}). `tables` is
+    the document (or shard index) carrying `types`, `styles` and `hints`.
+    """
+    prefix = page_prefix(page["page_number"])
+    columns = page["elements"]
+    ids = [prefix + element_id for element_id in columns["id"]]
+    blocks = [prefix + block_id for block_id in page["blocks"]]
+
+    content = []
+    for i, element_id in enumerate(ids):
+        el: Dict[str, Any] = {
+            "id": element_id,
+            "block_id": blocks[columns["block"][i]],
+            "type": tables["types"][columns["type"][i]],
+            "bbox": [columns["x0"][i], columns["y0"][i], columns["x1"][i], columns["y1"][i]],
+        }
+        if columns["content"][i] is not None:
+            el["content"] = columns["content"][i]
+        if columns["src"][i] is not None:
+            el["src"] = columns["src"][i]
+        if columns["style"][i] >= 0:
+            el["font_info"] = dict(tables["styles"][columns["style"][i]])
+        # Kopya, para hindi magkabahagi ng dicts ang mga elements
+        el["reflow_hints"] = copy.deepcopy(tables["hints"][columns["hints"][i]])
+        if columns["background"][i] >= 0:
+            el["reflow_hints"]["background_image_id"] = ids[columns["background"][i]]
+        content.append(el)
+
+    return {"page_number": page["page_number"], "content": content}
+
+def reflow_format_version(document: Dict[str, Any]) -> int:
+    # Ang version 1 ay walang "version" key
+    return document.get("version", 1)
+
+def decode_reflow_content(document: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Any supported content.json -> the version 1 structure. Version 1
+    documents are returned unchanged.
+    """
+    version = reflow_format_version(document)
+    if version == 1:
+        return document
+    if version != REFLOW_FORMAT_VERSION:
+        raise ValueError(f"Unsupported reflow format version: {version}")
+    structured_magazine = {
+        key: value for key, value in document.items()
+        if key not in ("format", "version", "types", "styles", "hints", "pages")
+    }
+    structured_magazine["pages"] = [decode_reflow_page(page, document) for page in document["pages"]]
+    return structured_magazine
+
+def load_reflow_content(data: bytes) -> Dict[str, Any]:
+    """Parses content.json bytes (any version) into the version 1 structure."""
+    return decode_reflow_content(json.loads(data))
+
+def encode_for_version(structured_magazine: Dict[str, Any], version: Optional[int] = None) -> Dict[str, Any]:
+    """Ang structured magazine sa hinihinging version (default: DEFAULT_REFLOW_FORMAT_VERSION)."""
+    version = version or DEFAULT_REFLOW_FORMAT_VERSION
+    if version == 1:
+        return structured_magazine
+    if version != REFLOW_FORMAT_VERSION:
+        raise ValueError(f"Unsupported reflow format version: {version}")
+    return encode_reflow_content(structured_magazine)
@@ -1,15 +1,27 @@
 import fitz  # PyMuPDF
 import io
-import json
-from typing import Dict, Any, List
+import numpy as np
+from typing import Dict, Any, List, Optional
 from collections import Counter
 from supabase import create_client, Client 
 import os
 from slugify import slugify
 
 # I-import ang mga helper functions at models
-from processor import get_drive_service, save_to_database # Gagamitin natin ang save_to_database mamaya
+from processor import download_pdf, save_to_database # Gagamitin natin ang save_to_database mamaya
 from models import ReflowConfig
+from page_analysis import PageAnalysis
+from image_codecs import ImageEncoder
+from spatial_index import GridIndex
+from element_images import ElementImageCache, upload_element_image
+from manifest_writer import page_shards, upload_manifest
+from reflow_format import DEFAULT_REFLOW_FORMAT_VERSION, encode_for_version, decode_reflow_content
+from persistence import upsert_issue
+from incremental import PageFingerprints, element_params, fetch_json, fingerprints_path, parse_page_ranges
+from layout_engine import analyze_page_layout, bbox_array, column_bounds, horizontal_centers
+from uploader import SupabaseStorageTarget, UploadPipeline, resolve_uploads
+from metrics import timed, annotate_job, count
+from streaming import PageSpool, STREAMING_UPLOAD_MAX_BYTES, trim_store, use_streaming
 
 def int_to_hex_color(color_int: int) -> str:
     """Converts an integer color representation to a CSS hex string."""
@@ -26,156 +38,117 @@ def detect_columns(page: fitz.Page, blocks: List[Dict[str, Any]], tolerance_px:
     if not blocks:
         return [page.rect] # Kung walang blocks, i-assume na 1 column (buong page)
 
-    # Step 1: Kunin ang horizontal center ng bawat block
-    center_points = sorted([((b['bbox'][0] + b['bbox'][2]) / 2) for b in blocks])
-
-    if not center_points:
-        return [page.rect]
-
-    # Step 2: I-cluster ang mga center points
-    clusters = []
-    current_cluster = [center_points[0]]
-    
-    for i in range(1, len(center_points)):
-        # Kung ang agwat sa pagitan ng dalawang center points ay maliit, nasa iisang cluster sila
-        if center_points[i] - current_cluster[-1] < tolerance_px:
-            current_cluster.append(center_points[i])
-        else:
-            # Kung malaki ang agwat, simulan ang bagong cluster
-            clusters.append(current_cluster)
-            current_cluster = [center_points[i]]
-    clusters.append(current_cluster)
-
-    # Step 3: I-calculate ang average center ng bawat cluster
-    # Ito ang magiging representative x-coordinate ng bawat column
-    column_x_centers = [sum(c) / len(c) for c in clusters]
+    # I-cluster ang horizontal center ng bawat block (tingnan ang layout_engine)
+    centers = horizontal_centers(bbox_array([b['bbox'] for b in blocks]))
+    column_x_centers, bounds = column_bounds(centers, 0, page.rect.width, tolerance_px)
     print(f"      - Detected {len(column_x_centers)} potential column centers at x-coords: {[round(c) for c in column_x_centers]}")
 
-    # Step 4: I-define ang boundaries (bbox) ng bawat column
-    column_bboxes = []
-    page_width = page.rect.width
-    
     # Kung isa lang ang column, sakupin ang buong page
     if len(column_x_centers) <= 1:
         return [page.rect]
-
-    # Kung marami, hatiin ang page
-    for i, center_x in enumerate(column_x_centers):
-        # Define ang left (x0) at right (x1) boundary ng column
-        if i == 0:
-            x0 = 0
-        else:
-            # Ang gitna sa pagitan ng kasalukuyang center at ng nakaraang center
-            x0 = (center_x + column_x_centers[i-1]) / 2
-        
-        if i == len(column_x_centers) - 1:
-            x1 = page_width
-        else:
-            # Ang gitna sa pagitan ng kasalukuyang center at ng susunod na center
-            x1 = (center_x + column_x_centers[i+1]) / 2
-            
-        column_bboxes.append(fitz.Rect(x0, 0, x1, page.rect.height))
-        
-    return column_bboxes
+    return [fitz.Rect(x0, 0, x1, page.rect.height) for x0, x1 in bounds]
 
 # --- ✨ BAGONG HELPER: "PER-BLOCK" COLUMN DETECTION ✨ ---
 def detect_columns_within_block(spans: List[Dict[str, Any]], block_bbox: fitz.Rect, tolerance_px: int = 10) -> List[fitz.Rect]:
     """
     Analyzes span positions WITHIN a single block to detect internal columns.
     Returns a list of bounding boxes for each detected column, relative to the block.
+    For a whole page, `layout_engine.analyze_page_layout` does every block at once.
     """
     if not spans:
         return [block_bbox]
 
-    # Step 1: Kunin ang horizontal center ng bawat span
-    center_points = sorted([((s['bbox'][0] + s['bbox'][2]) / 2) for s in spans])
-
-    if not center_points:
-        return [block_bbox]
-
-    # Step 2: I-cluster ang mga center points (parehong logic tulad ng dati)
-    clusters = []
-    current_cluster = [center_points[0]]
-    for i in range(1, len(center_points)):
-        if center_points[i] - current_cluster[-1] < tolerance_px:
-            current_cluster.append(center_points[i])
-        else:
-            clusters.append(current_cluster)
-            current_cluster = [center_points[i]]
-    clusters.append(current_cluster)
+    centers = horizontal_centers(bbox_array([s['bbox'] for s in spans]))
+    column_x_centers, bounds = column_bounds(centers, block_bbox.x0, block_bbox.x1, tolerance_px)
 
-    column_x_centers = [sum(c) / len(c) for c in clusters]
-    
     # Kung isa lang ang column, ang buong block ang column
     if len(column_x_centers) <= 1:
         return [block_bbox]
+    return [fitz.Rect(x0, block_bbox.y0, x1, block_bbox.y1) for x0, x1 in bounds]
 
-    # Step 3: I-define ang boundaries ng bawat column sa loob ng block
-    column_bboxes = []
-    for i, center_x in enumerate(column_x_centers):
-        x0 = (center_x + column_x_centers[i-1]) / 2 if i > 0 else block_bbox.x0
-        x1 = (center_x + column_x_centers[i+1]) / 2 if i < len(column_x_centers) - 1 else block_bbox.x1
-        column_bboxes.append(fitz.Rect(x0, block_bbox.y0, x1, block_bbox.y1))
+# --- ✨ SHADOW TEXT DETECTION (HASH INDEX) ✨ ---
+# Ang "shadow" ay kopya ng parehong text na halos nakapatong (< SHADOW_DISTANCE_PT)
+# sa isang naunang span. Sa halip na ikumpara ang bawat pares ng spans (O(n²)),
+# ang mga naunang spans ay naka-index ayon sa (content, quantized x, quantized y),
+# at ang 3x3 na kalapit na cells lang ang sinisilip.
+SHADOW_DISTANCE_PT = 2
 
-    return column_bboxes
-
-def upload_to_supabase_storage(supabase: Client, bucket_name: str, file_path: str, file_body: bytes, content_type: str):
-    """Helper function para mag-upload ng file sa Supabase Storage."""
-    try:
-        supabase.storage.from_(bucket_name).upload(
-            file=file_body,
-            path=file_path,
-            file_options={"content-type": content_type, "cache-control": "3600", "upsert": "true"}
-        )
-        public_url = supabase.storage.from_(bucket_name).get_public_url(file_path)
-        print(f"  - ✅ Uploaded to Supabase: {public_url}")
-        return public_url
-    except Exception as e:
-        # Mag-print ng mas detalyadong error
-        print(f"  - ❌ Supabase upload failed for {file_path}. Error Type: {type(e).__name__}, Details: {e}")
-        return None
+def mark_shadow_text(spans: List[Dict[str, Any]]) -> None:
+    """
+    Sets `reflow_hints.is_shadow_text` on every span: True when an earlier span
+    in the list has the same content and its top-left corner is less than
+    SHADOW_DISTANCE_PT away on both axes. Runs in linear time.
+    """
+    seen: Dict[tuple, List[tuple]] = {}
+    for span in spans:
+        content = span['content']
+        x, y = span['bbox'][0], span['bbox'][1]
+        # Ang cell size ay katumbas ng distance, kaya ang anumang kapitbahay na
+        # mas malapit sa SHADOW_DISTANCE_PT ay nasa loob ng 3x3 cells sa paligid
+        cell_x, cell_y = int(x // SHADOW_DISTANCE_PT), int(y // SHADOW_DISTANCE_PT)
+        is_shadow = False
+        for nx in (cell_x - 1, cell_x, cell_x + 1):
+            for ny in (cell_y - 1, cell_y, cell_y + 1):
+                for other_x, other_y in seen.get((content, nx, ny), ()):
+                    if abs(x - other_x) < SHADOW_DISTANCE_PT and abs(y - other_y) < SHADOW_DISTANCE_PT:
+                        is_shadow = True
+                        break
+                if is_shadow: break
+            if is_shadow: break
+        span["reflow_hints"]["is_shadow_text"] = is_shadow
+        seen.setdefault((content, cell_x, cell_y), []).append((x, y))
 
+@timed("layout")
 def reconstruct_page_layout(
         supabase: Client,
         page: fitz.Page,
         pdf_document: fitz.Document,
         issue_name: str,
-        page_number: int) -> List[Dict[str, Any]]:
+        page_number: int,
+        pipeline: UploadPipeline,
+        analysis: Optional[PageAnalysis] = None,
+        image_cache: Optional[ElementImageCache] = None) -> List[Dict[str, Any]]:
     """
     Main analysis function, now with PER-BLOCK column detection and advanced element grouping.
+    Image uploads are queued on `pipeline`; their `src` stays a Future until the pipeline is joined.
+    Pass a shared `analysis` to reuse text and image info already extracted for other outputs,
+    and the run's `image_cache` so recurring images are rendered and uploaded once.
     """
+    if analysis is None:
+        analysis = PageAnalysis(page, page_number)
     print("    - Starting advanced layout analysis with element grouping...")
+    storage = SupabaseStorageTarget(supabase, "magazine-pages")
     page_width = page.rect.width
-    page_center_x = page_width / 2
     
     raw_elements = [] # Ito ang maglalaman ng lahat ng na-extract na spans at images
 
-    # --- Step 1: I-iterate ang bawat TEXT BLOCK ---
-    text_dict = page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT)
+    # --- Step 1: Kunin ang lahat ng text spans ng page, kasama ang block nila ---
+    text_dict = analysis.text_dict
+    text_blocks = [] # (block_idx, block, spans na may laman)
     for block_idx, block in enumerate(text_dict.get("blocks", [])):
         if block['type'] != 0: continue
-
-        block_bbox = fitz.Rect(block['bbox'])
         spans_in_block_raw = [s for line in block.get("lines", []) for s in line.get("spans", []) if s['text'].strip()]
-        
-        column_layout = detect_columns_within_block(spans_in_block_raw, block_bbox, tolerance_px=20)
-        column_count = len(column_layout)
+        text_blocks.append((block_idx, block, spans_in_block_raw))
+
+    # Column detection, column assignment at alignment para sa buong page nang sabay-sabay
+    all_spans = [span for _, _, spans in text_blocks for span in spans]
+    span_blocks = np.repeat(np.arange(len(text_blocks)), [len(spans) for _, _, spans in text_blocks])
+    column_counts, column_indexes, is_centered = analyze_page_layout(
+        bbox_array([span['bbox'] for span in all_spans]),
+        span_blocks,
+        bbox_array([block['bbox'] for _, block, _ in text_blocks]),
+        page_width,
+        tolerance=20
+    )
+    column_counts, column_indexes, is_centered = column_counts.tolist(), column_indexes.tolist(), is_centered.tolist()
+
+    span_pos = 0
+    for block_pos, (block_idx, block, spans_in_block_raw) in enumerate(text_blocks):
+        # Alignment detection (para sa buong block)
+        alignment = "center" if is_centered[block_pos] else "left"
 
         spans_in_block_processed = []
-        span_counter_in_block = 0 # Use a separate counter for unique span IDs within the block
-        for span_raw in spans_in_block_raw: # Iterate directly over the raw spans
-            # Alignment detection (para sa buong block)
-            block_center_x = (block_bbox.x0 + block_bbox.x1) / 2
-            alignment = "center" if abs(block_center_x - page_center_x) < (page_width * 0.05) else "left"
-
-            # Assign span to its column within the block
-            span_center_x = (span_raw['bbox'][0] + span_raw['bbox'][2]) / 2
-            col_idx = 0
-            for i, col_bbox in enumerate(column_layout):
-                if col_bbox.x0 <= span_center_x < col_bbox.x1:
-                    col_idx = i
-                    break
-            
+        for span_counter_in_block, span_raw in enumerate(spans_in_block_raw):
             spans_in_block_processed.append({
                 "id": f"p{page_number}_b{block_idx}_s{span_counter_in_block}",
                 "block_id": f"p{page_number}_b{block_idx}",
@@ -183,49 +156,28 @@ def reconstruct_page_layout(
                 "font_info": {"size": round(span_raw["size"], 2), "font": span_raw["font"], "color": int_to_hex_color(span_raw["color"])},
                 "reflow_hints": {
                     "alignment": alignment,
-                    "layout_info": {"column_count": column_count, "column_index": col_idx}
+                    "layout_info": {"column_count": column_counts[span_pos], "column_index": column_indexes[span_pos]}
                 }
             })
-            span_counter_in_block += 1 # Increment counter for unique ID
+            span_pos += 1
 
         # Shadow Text Detection
-        final_spans_for_block = []
-        for i, current_span in enumerate(spans_in_block_processed):
-            is_shadow = False
-            for j, other_span in enumerate(spans_in_block_processed):
-                if i == j: continue
-                if current_span['content'] == other_span['content']:
-                    dist_x = abs(current_span['bbox'][0] - other_span['bbox'][0])
-                    dist_y = abs(current_span['bbox'][1] - other_span['bbox'][1])
-                    if dist_x < 2 and dist_y < 2 and j < i:
-                        is_shadow = True
-                        break
-            current_span["reflow_hints"]["is_shadow_text"] = is_shadow
-            final_spans_for_block.append(current_span)
-        
-        raw_elements.extend(final_spans_for_block)
-
+        mark_shadow_text(spans_in_block_processed)
+        raw_elements.extend(spans_in_block_processed)
 
     # --- Step 2: Process Images ---
-    image_info_list = page.get_image_info(xrefs=True)
+    image_info_list = analysis.image_info
     for img_info in image_info_list:
         bbox = img_info['bbox']
         xref = img_info['xref']
         if xref == 0: continue
 
         zoom_matrix = fitz.Matrix(2, 2)
-        pix = page.get_pixmap(matrix=zoom_matrix, clip=bbox)
-        image_bytes = pix.tobytes("png")
-        
-        image_filename = f"page_{page_number}_xref_{xref}_cropped.png"
-        supabase_path = f"{issue_name}/images/{image_filename}"
         
-        public_url = upload_to_supabase_storage(
-            supabase,
-            bucket_name="magazine-pages",
-            file_path=supabase_path,
-            file_body=image_bytes,
-            content_type="image/png"
+        # Ang parehong xref sa naunang page ay hindi na nire-render o ina-upload ulit
+        public_url = upload_element_image(
+            image_cache, pipeline, storage, analysis, img_info,
+            f"{issue_name}/images", analysis.encoder, matrix=zoom_matrix
         )
         
         # Assign image to a column (page-level column, for now, or default to 1-column block)
@@ -233,15 +185,14 @@ def reconstruct_page_layout(
         # but we still need to assign them a column_index if they are part of a page-level grid.
         # For simplicity, let's assume images are always in column 0 of their own block.
         
-        if public_url:
-            raw_elements.append({
-                "id": f"p{page_number}_img_{xref}",
-                "block_id": f"p{page_number}_img_block_{xref}", # Each image is its own block
-                "type": "image", "bbox": bbox, "src": public_url,
-                "reflow_hints": {
-                    "layout_info": {"column_count": 1, "column_index": 0} # Default to 1-column block
-                }
-            })
+        raw_elements.append({
+            "id": f"p{page_number}_img_{xref}",
+            "block_id": f"p{page_number}_img_block_{xref}", # Each image is its own block
+            "type": "image", "bbox": bbox, "src": public_url,
+            "reflow_hints": {
+                "layout_info": {"column_count": 1, "column_index": 0} # Default to 1-column block
+            }
+        })
 
     # --- ✨ Step 3: ADVANCED ELEMENT GROUPING (Re-clustering) ✨ ---
     # Ito ang bagong logic para i-handle ang interleaved elements
@@ -249,47 +200,43 @@ def reconstruct_page_layout(
     # Sort muna ang lahat ng raw elements by their top position (y0)
     raw_elements.sort(key=lambda el: el["bbox"][1])
     
+    # Heuristic: Kung ang element ay parehong type at malapit sa isang naunang element
+    # (vertically at horizontally), i-group sila. Ang dating code ay ang huling element
+    # lang ang tinitingnan, kaya nahahati ang group kapag magkasalit ang columns.
+    # Ngayon, ang pinakahuling naunang element na pasok sa heuristic ang kinukuha,
+    # gamit ang spatial index (isang index bawat type).
+    # Ang tolerance ay pwedeng i-adjust.
+    vertical_overlap_threshold = 5 # pixels
+
     grouped_elements = []
-    current_group = []
+    group_of = [] # index ng element sa raw_elements -> index ng group nito
+    placed = {} # type -> GridIndex ng mga naunang elements (item = index sa raw_elements)
 
     for i, el in enumerate(raw_elements):
-        if not current_group:
-            current_group.append(el)
-            continue
-
-        last_el_in_group = current_group[-1]
-
-        # Heuristic: Kung ang current element ay parehong type at malapit sa last element
-        # (vertically at horizontally), i-group sila.
-        # Ang tolerance ay pwedeng i-adjust.
-        vertical_overlap_threshold = 5 # pixels
-        horizontal_overlap_threshold = 5 # pixels
-        
-        # Check for vertical proximity (top of current element is close to bottom of last element)
-        is_vertically_close = (el["bbox"][1] - last_el_in_group["bbox"][3]) < vertical_overlap_threshold
-        
-        # Check for horizontal overlap (they are roughly in the same horizontal space)
-        # Check if their x-ranges overlap significantly
-        horizontal_overlap = max(0, min(el["bbox"][2], last_el_in_group["bbox"][2]) - max(el["bbox"][0], last_el_in_group["bbox"][0]))
-        min_width = min(el["bbox"][2] - el["bbox"][0], last_el_in_group["bbox"][2] - last_el_in_group["bbox"][0])
-        is_horizontally_overlapping = horizontal_overlap > (min_width * 0.5) # Overlap by at least 50% of the narrower element
-
-        # Condition for grouping:
-        # 1. Same type (text with text, image with image)
-        # 2. Vertically close
-        # 3. Horizontally overlapping
-        if (el["type"] == last_el_in_group["type"] and
-            is_vertically_close and
-            is_horizontally_overlapping):
-            
-            current_group.append(el)
-        else:
+        x0, y0, x1, y1 = el["bbox"][0], el["bbox"][1], el["bbox"][2], el["bbox"][3]
+        index = placed.setdefault(el["type"], GridIndex())
+
+        # Mga kandidato: elements na ang baba ay malapit o lampas sa itaas ng current element
+        # at tumatama sa parehong horizontal space
+        group_idx = None
+        for candidate in reversed(index.query((x0, y0 - vertical_overlap_threshold, x1, y0))):
+            cx0, cy0, cx1, cy1 = index.bbox(candidate)
+            # Check for vertical proximity (top of current element is close to bottom of the candidate)
+            is_vertically_close = (y0 - cy1) < vertical_overlap_threshold
+            # Check for horizontal overlap: at least 50% of the narrower element
+            horizontal_overlap = max(0, min(x1, cx1) - max(x0, cx0))
+            min_width = min(x1 - x0, cx1 - cx0)
+            if is_vertically_close and horizontal_overlap > (min_width * 0.5):
+                group_idx = group_of[index.item(candidate)]
+                break
+
+        if group_idx is None:
             # Simulan ang bagong group
-            grouped_elements.append(current_group)
-            current_group = [el]
-    
-    if current_group:
-        grouped_elements.append(current_group)
+            group_idx = len(grouped_elements)
+            grouped_elements.append([])
+        grouped_elements[group_idx].append(el)
+        group_of.append(group_idx)
+        index.insert(el["bbox"], i)
 
     # Ngayon, i-flatten ang grouped_elements pabalik sa isang listahan ng elements
     # Pero i-update ang block_id ng mga na-group na elements
@@ -306,19 +253,23 @@ def reconstruct_page_layout(
             # Kung isa lang, gamitin ang existing block_id
             final_elements.extend(group)
 
-    # --- Step 4: Background Image Heuristics (walang pagbabago) ---
+    # --- Step 4: Background Image Heuristics ---
     # Ito ay tatakbo sa final_elements
-    text_elements = [el for el in final_elements if el['type'] == 'text']
+    # Ang images ay naka-index; ang unang image (sa pagkakasunod ng final_elements)
+    # na buong sumasakop sa text ang magiging background nito
     image_elements = [el for el in final_elements if el['type'] == 'image']
-    for text_el in text_elements:
-        text_bbox = fitz.Rect(text_el['bbox'])
-        for image_el in image_elements:
-            image_bbox = fitz.Rect(image_el['bbox'])
-            if image_bbox.contains(text_bbox):
-                image_el['reflow_hints']['is_background'] = True
-                if 'background_image_id' not in text_el['reflow_hints']:
-                    text_el['reflow_hints']['background_image_id'] = image_el['id']
-                break 
+    image_index = GridIndex()
+    for image_el in image_elements:
+        image_index.insert(image_el['bbox'])
+    for text_el in final_elements:
+        if text_el['type'] != 'text':
+            continue
+        containing = image_index.containing(text_el['bbox'])
+        if containing:
+            image_el = image_elements[containing[0]]
+            image_el['reflow_hints']['is_background'] = True
+            if 'background_image_id' not in text_el['reflow_hints']:
+                text_el['reflow_hints']['background_image_id'] = image_el['id']
 
     # --- Step 5: Final Sorting (optional, dahil na-sort na natin ang raw_elements) ---
     # Pero para masigurado, i-sort ulit base sa block_id at y0
@@ -328,6 +279,70 @@ def reconstruct_page_layout(
     
     return final_elements
 
+def load_previous_reflow_pages(storage: SupabaseStorageTarget, issue_name: str) -> Dict[int, Dict[str, Any]]:
+    """Page number -> page ({"page_number", "content"}) mula sa content.json ng huling run (anumang version)."""
+    content = fetch_json(storage, f"{issue_name}/content.json")
+    if not content:
+        return {}
+    return {page["page_number"]: page for page in decode_reflow_content(content)["pages"]}
+
+def reflow_fingerprints(doc: fitz.Document, storage: SupabaseStorageTarget, config: ReflowConfig, encoder: ImageEncoder, hasher: Any = None) -> PageFingerprints:
+    return PageFingerprints(
+        doc, storage, fingerprints_path(f"{config.issue_number}/", "reflow"),
+        element_params("reflow", encoder, config.native_images),
+        enabled=config.incremental, force_pages=parse_page_ranges(config.force_pages, len(doc)), hasher=hasher
+    )
+
+def publish_reflow_content(supabase: Client, pipeline: UploadPipeline, storage: SupabaseStorageTarget, config: ReflowConfig, structured_magazine: Dict[str, Any]) -> str:
+    """Uploads content.json and updates magazine_issues. Call only after the image uploads are joined and resolved."""
+    issue_name = config.issue_number
+    # 4. I-UPLOAD ANG FINAL JSON SA SUPABASE STORAGE
+    print("\n--- Uploading final semantic JSON to Supabase ---")
+    json_path = f"{issue_name}/content.json"
+    content = structured_magazine
+    version = config.reflow_format_version or DEFAULT_REFLOW_FORMAT_VERSION
+    if version != 1:
+        # Version 2 sa sariling object; ang content.json ay nananatiling version 1 para sa
+        # deployed viewers, at naka-advertise lang dito ang URL ng v2
+        encoded = encode_for_version(structured_magazine, version)
+        try:
+            encoded_url = upload_manifest(
+                pipeline,
+                storage,
+                f"{issue_name}/content.v{version}.json",
+                encoded,
+                shards=page_shards(encoded["pages"], "page_number", ("page_number",))
+            )
+        finally:
+            if isinstance(encoded["pages"], PageSpool):
+                encoded["pages"].close()
+        content = {**structured_magazine, "formats": {str(version): encoded_url}}
+
+    json_public_url = upload_manifest(
+        pipeline,
+        storage, # O kung saan mo gustong i-save ang JSON
+        json_path,
+        content,
+        shards=page_shards(content["pages"], "page_number", ("page_number",))
+    )
+
+    # 5. I-UPDATE ANG DATABASE
+    print("\n--- Updating 'magazine_issues' table in Supabase DB ---")
+    try:
+        issue_slug = slugify(issue_name) # Siguraduhing may slugify function ka
+        upsert_issue(supabase, {
+            "issue_number": issue_name,
+            "issue_slug": issue_slug,
+            "publication_date": config.publication_date,
+            "reflow_content_url": json_public_url,
+            "status": "processed_reflow"
+        })
+        print("  - ✅ Database updated successfully.")
+    except Exception as e:
+        print(f"  - ❌ Database update failed. Error: {e}")
+        raise
+    return json_public_url
+
 def process_pdf_for_reflow(file_id: str, config: ReflowConfig, supabase: Client) -> Dict[str, Any]:
     """
     Main function to process the PDF for reflow.
@@ -335,75 +350,83 @@ def process_pdf_for_reflow(file_id: str, config: ReflowConfig, supabase: Client)
 
     issue_name = config.issue_number
     print(f"--- 🚀 REFLOW PROCESSOR INITIATED for: {issue_name} 🚀 ---")
+    annotate_job(issue=issue_name)
+
+    pipeline = None
+    pages = None
 
     try:
-        # 1. Download PDF
-        drive_service = get_drive_service()
-        request = drive_service.files().get_media(fileId=file_id)
-        file_bytes = io.BytesIO(request.execute())
+        storage = SupabaseStorageTarget(supabase, "magazine-pages")
+        encoder = ImageEncoder.from_config(config)
+        image_cache = ElementImageCache(native=config.native_images)
 
-        # 2. Open PDF
-        pdf_document = fitz.open(stream=file_bytes, filetype="pdf")
+        # 1. Download PDF (diretso sa disk, naka-cache)
+        pdf_path = download_pdf(file_id)
 
+        # 2. Open PDF
+        pdf_document = fitz.open(pdf_path)
+        streaming = use_streaming(config.streaming, len(pdf_document))
+        if streaming:
+            print(f"  - Streaming mode: {len(pdf_document)} pages, per-page results spooled to disk")
+        pipeline = UploadPipeline(max_bytes_in_flight=STREAMING_UPLOAD_MAX_BYTES if streaming else None)
+        # Para sa re-runs: ang mga artifacts na walang pagbabago ay hindi na ia-upload ulit
+        pipeline.load_marker(storage, f"{issue_name}/")
+        fingerprints = reflow_fingerprints(pdf_document, storage, config, encoder)
+        previous = fingerprints.load_previous(lambda: load_previous_reflow_pages(storage, issue_name))
+
+        # Sa streaming mode, ang content ng bawat page ay isinusulat agad sa disk
+        pages = PageSpool() if streaming else []
         structured_magazine = {
             "issue_number": issue_name,
             "publication_date": config.publication_date,
             "table_of_contents": config.table_of_contents,
-            "pages": []
+            "image_format": encoder.image_format,
+            "pages": pages
         }
 
         # 3. Process each page
         for page_num in range(len(pdf_document)):
-            page = pdf_document.load_page(page_num)
             page_number = page_num + 1
+            if not fingerprints.changed(page_number):
+                # Walang pagbabago mula sa huling run; gamitin ang dating content
+                pages.append(previous[page_number])
+                count("pages_reused")
+                continue
+            page = pdf_document.load_page(page_num)
             print(f"\n--- Reconstructing Page {page_number} ---")
 
             # Ipasa ang buong `pdf_document` para ma-extract ang images
-            page_content = reconstruct_page_layout(supabase, page, pdf_document, issue_name, page_number)
+            analysis = PageAnalysis(page, page_number, encoder=encoder)
+            page_content = reconstruct_page_layout(supabase, page, pdf_document, issue_name, page_number, pipeline, analysis=analysis, image_cache=image_cache)
 
-            structured_magazine["pages"].append({
+            pages.append({
                 "page_number": page_number,
                 "content": page_content
             })
+            count("pages")
+            if streaming:
+                analysis.release()
+                trim_store()
 
-        # 4. I-UPLOAD ANG FINAL JSON SA SUPABASE STORAGE
-        print("\n--- Uploading final semantic JSON to Supabase ---")
-        final_json_output = json.dumps(structured_magazine, indent=2).encode('utf-8')
-        json_path = f"{issue_name}/content.json"
-
-        json_public_url = upload_to_supabase_storage(
-            supabase,
-            bucket_name="magazine-pages", # O kung saan mo gustong i-save ang JSON
-            file_path=json_path,
-            file_body=final_json_output,
-            content_type="application/json"
-        )
-
-        if not json_public_url:
-            raise Exception("Failed to upload the final JSON file. Aborting.")
+        # Hintayin ang lahat ng image uploads; mag-ra-raise ng UploadError kung may hindi na-upload
+        print(f"\n  - Element images: {image_cache.summary()}")
+        print("\n--- Waiting for pending image uploads ---")
+        pipeline.join()
+        resolve_uploads(structured_magazine)
 
-        # 5. I-UPDATE ANG DATABASE
-        print("\n--- Updating 'magazine_issues' table in Supabase DB ---")
-        try:
-            issue_slug = slugify(issue_name) # Siguraduhing may slugify function ka
-            supabase.table("magazine_issues").upsert(
-                {
-                    "issue_number": issue_name,
-                    "issue_slug": issue_slug,
-                    "publication_date": config.publication_date,
-                    "reflow_content_url": json_public_url,
-                    "status": "processed_reflow"
-                },
-                on_conflict="issue_slug" 
-            ).execute()
-            print("  - ✅ Database updated successfully.")
-        except Exception as e:
-            print(f"  - ❌ Database update failed. Error: {e}")
-            raise
+        publish_reflow_content(supabase, pipeline, storage, config, structured_magazine)
+        fingerprints.publish(pipeline)
+        pipeline.publish_marker(storage, f"{issue_name}/")
 
         print("\n--- ✅ REFLOW PROCESSOR FINISHED ---")
         return {"status": "success", "processor": "reflow", "message": "Reconstruction, upload, and DB update complete."}
 
     except Exception as e:
         print(f"❌ An error occurred in reflow_processor: {e}")
-        raise
\ No newline at end of file
+        raise
+    finally:
+        if pipeline is not None:
+            # Pagkatapos ng join() wala nang pending; kapag nag-error, itigil na ang naka-queue
+            pipeline.close(cancel_pending=True)
+        if isinstance(pages, PageSpool):
+            pages.close()
\ No newline at end of file
@@ -0,0 +1,109 @@
+import math
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# --- Spatial Index para sa Layout Analysis ---
+# Uniform grid sa PDF points: ang bawat bbox ay naka-rehistro sa mga cells na
+# tinatamaan nito, kaya ang containment, overlap at nearest-neighbour queries ay
+# sumisilip lang sa kalapit na cells sa halip na sa lahat ng elements ng page.
+
+# Sapat na maliit para sa text spans, sapat na malaki para hindi dumami ang cells ng images
+DEFAULT_CELL_SIZE = 48.0
+
+BBox = Sequence[float]
+
+class GridIndex:
+    """
+    Uniform-grid spatial index of bboxes (x0, y0, x1, y1) in PDF points.
+
+    Items are identified by their insertion index. All queries return
+    indices in ascending (insertion) order, so callers that used to scan a
+    list in order get the same "first match".
+    """
+
+    def __init__(self, cell_size: float = DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self._cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        self._bboxes: List[Tuple[float, float, float, float]] = []
+        self._items: List[Any] = []
+
+    def __len__(self) -> int:
+        return len(self._bboxes)
+
+    def _cell_range(self, bbox: BBox) -> Tuple[int, int, int, int]:
+        size = self.cell_size
+        return (math.floor(bbox[0] / size), math.floor(bbox[1] / size),
+                math.floor(bbox[2] / size), math.floor(bbox[3] / size))
+
+    def insert(self, bbox: BBox, item: Any = None) -> int:
+        """Adds a bbox (with an optional payload) and returns its index."""
+        index = len(self._bboxes)
+        self._bboxes.append((bbox[0], bbox[1], bbox[2], bbox[3]))
+        self._items.append(item)
+        cx0, cy0, cx1, cy1 = self._cell_range(bbox)
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                self._cells[(cx, cy)].append(index)
+        return index
+
+    def bbox(self, index: int) -> Tuple[float, float, float, float]:
+        return self._bboxes[index]
+
+    def item(self, index: int) -> Any:
+        return self._items[index]
+
+    def _candidates(self, bbox: BBox) -> List[int]:
+        cx0, cy0, cx1, cy1 = self._cell_range(bbox)
+        found = set()
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                found.update(self._cells.get((cx, cy), ()))
+        return sorted(found)
+
+    def query(self, bbox: BBox) -> List[int]:
+        """Indices of all bboxes that intersect `bbox` (touching edges count)."""
+        x0, y0, x1, y1 = bbox[0], bbox[1], bbox[2], bbox[3]
+        return [
+            i for i in self._candidates(bbox)
+            if self._bboxes[i][0] <= x1 and x0 <= self._bboxes[i][2]
+            and self._bboxes[i][1] <= y1 and y0 <= self._bboxes[i][3]
+        ]
+
+    def containing(self, bbox: BBox) -> List[int]:
+        """Indices of all bboxes that fully contain `bbox` (same test as fitz.Rect.contains)."""
+        x0, y0, x1, y1 = bbox[0], bbox[1], bbox[2], bbox[3]
+        result = []
+        for i in self._candidates(bbox):
+            bx0, by0, bx1, by1 = self._bboxes[i]
+            if bx0 <= x0 <= x1 <= bx1 and by0 <= y0 <= y1 <= by1:
+                result.append(i)
+        return result
+
+    def within(self, bbox: BBox) -> List[int]:
+        """Indices of all bboxes fully inside `bbox`."""
+        x0, y0, x1, y1 = bbox[0], bbox[1], bbox[2], bbox[3]
+        result = []
+        for i in self._candidates(bbox):
+            bx0, by0, bx1, by1 = self._bboxes[i]
+            if x0 <= bx0 <= bx1 <= x1 and y0 <= by0 <= by1 <= y1:
+                result.append(i)
+        return result
+
+    def nearest(self, bbox: BBox, max_distance: float, predicate: Optional[Callable[[int], bool]] = None) -> Optional[int]:
+        """
+        Index of the bbox with the smallest gap to `bbox` (0 if they touch or
+        overlap), searching no further than `max_distance`. Ties go to the
+        lowest index. `predicate` can filter candidates.
+        """
+        x0, y0, x1, y1 = bbox[0], bbox[1], bbox[2], bbox[3]
+        best, best_distance = None, None
+        for i in self.query((x0 - max_distance, y0 - max_distance, x1 + max_distance, y1 + max_distance)):
+            if predicate is not None and not predicate(i):
+                continue
+            bx0, by0, bx1, by1 = self._bboxes[i]
+            dx = max(bx0 - x1, x0 - bx1, 0)
+            dy = max(by0 - y1, y0 - by1, 0)
+            distance = math.hypot(dx, dy)
+            if distance <= max_distance and (best_distance is None or distance < best_distance):
+                best, best_distance = i, distance
+        return best
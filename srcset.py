@@ -0,0 +1,51 @@
+import os
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from page_analysis import PageAnalysis
+from image_codecs import content_type_for, extension_for
+from uploader import UploadPipeline
+
+# --- Responsive Page Images (srcset) ---
+# Bukod sa page image (sa DEFAULT_DPI), ang parehong autocropped page ay puwedeng
+# i-render sa iba't ibang lapad para sa `srcset` ng <img>: maliliit para sa thumbnails
+# at page grids, malalaki para sa high-DPI screens. Ang bawat size ay direktang
+# nire-render mula sa display list ng page (PageAnalysis.rendition), kaya ang dagdag na
+# size ay rasterization at encode lang; hindi na ini-interpret ulit ang PDF.
+#
+# Layout, katabi ng page image:
+#   page-01.png
+#   page-01-320w.png, page-01-1280w.png, ...
+
+# Default na target widths (pixels, comma-separated, hal. "320,640,1280"); walang srcset kapag blangko
+SRCSET_WIDTHS = os.getenv("SRCSET_WIDTHS", "")
+# Pinakamalaking lapad na pinapayagan (ang 4096 px na page ay ~50 MB na pixmap)
+SRCSET_MAX_WIDTH = int(os.getenv("SRCSET_MAX_WIDTH", "4096"))
+
+def target_widths(requested: Optional[Sequence[int]] = None) -> List[int]:
+    """Ang `srcset_widths` ng config (o SRCSET_WIDTHS kung hindi naka-set), sorted at walang ulit."""
+    if requested is None:
+        requested = [int(width) for width in SRCSET_WIDTHS.split(",") if width.strip()]
+    widths = sorted(set(requested))
+    for width in widths:
+        if not 0 < width <= SRCSET_MAX_WIDTH:
+            raise ValueError(f"srcset width {width} is outside 1-{SRCSET_MAX_WIDTH} px")
+    return widths
+
+def srcset_images(analysis: PageAnalysis, widths: Sequence[int]) -> Tuple[List[Dict[str, Any]], List[bytes]]:
+    """
+    The srcset entries of a page ({"width", "height", "url": None}, smallest
+    first) and the encoded image of each, in the same order.
+    """
+    entries, images = [], []
+    for width in widths:
+        rendition = analysis.rendition(width)
+        entries.append({"width": rendition["width"], "height": rendition["height"], "url": None})
+        images.append(rendition["image_bytes"])
+    return entries, images
+
+def submit_srcset(pipeline: UploadPipeline, target: Any, path_stem: str, image_format: str, entries: List[Dict[str, Any]], images: Iterable[bytes]) -> None:
+    """I-queue ang upload ng bawat size sa `{path_stem}-{width}w.{ext}`; ang `url` ng bawat entry ay magiging Future."""
+    for entry, image_bytes in zip(entries, images):
+        entry["url"] = pipeline.submit(
+            target, f"{path_stem}-{entry['width']}w.{extension_for(image_format)}",
+            image_bytes, content_type_for(image_format)
+        )
@@ -0,0 +1,112 @@
+import os
+import json
+import math
+import tempfile
+from concurrent.futures import Future
+from typing import Any, Dict, Iterator, List, Optional
+
+import fitz  # PyMuPDF
+
+# --- Bounded-Memory Streaming Mode ---
+# Para sa napakalalaking issues (hal. 400-page annual edition sa 2 GB container):
+#   - Ang per-page entries ng interactive manifest at ng reflow content ay isinusulat
+#     agad sa isang PageSpool (JSON lines sa temp file sa disk) sa halip na manatili
+#     sa memory hanggang sa dulo; binabasa ulit ang mga ito nang isa-isa kapag
+#     isinusulat na ang shards at ang buong manifest.
+#   - Ang pixmaps, encoded bytes at text ng bawat page ay binibitawan agad pagkatapos
+#     ng page (PageAnalysis.release), hindi sa susunod na iteration.
+#   - Ang MuPDF store (cache ng decoded images, fonts, atbp.) ay pinapaliit pabalik sa
+#     STREAMING_STORE_MAX_BYTES pagkatapos ng bawat page. Ang rebased PyMuPDF (1.24+)
+#     ay hindi nagre-report ng laki ng store, kaya doon ay binabawasan ito ng
+#     STREAMING_STORE_SHRINK_PERCENT bawat page; iilang pages lang ang naiipon.
+#   - Mas maliit ang byte budget ng upload pipeline, at sa image processor ay maliliit
+#     ang chunks ng render workers at iilan lang ang sabay na naka-submit.
+# Kaya halos pareho ang peak RSS kahit ilang pages ang issue
+# (tingnan ang benchmarks/bench_streaming.py).
+
+# Awtomatikong streaming kapag ganito karami o higit pa ang pages (kung hindi naka-set sa config)
+STREAMING_MIN_PAGES = int(os.getenv("STREAMING_MIN_PAGES", "200"))
+STREAMING_STORE_MAX_BYTES = int(os.getenv("STREAMING_STORE_MAX_BYTES", str(64 * 1024 * 1024)))
+STREAMING_STORE_SHRINK_PERCENT = int(os.getenv("STREAMING_STORE_SHRINK_PERCENT", "50"))
+STREAMING_UPLOAD_MAX_BYTES = int(os.getenv("STREAMING_UPLOAD_MAX_BYTES", str(64 * 1024 * 1024)))
+# Pinakamalaking chunk ng pages bawat render worker task (image processor)
+STREAMING_CHUNK_PAGES = int(os.getenv("STREAMING_CHUNK_PAGES", "4"))
+
+def use_streaming(requested: Optional[bool], page_count: int) -> bool:
+    """Ang `streaming` ng config kung naka-set, kung hindi ay ayon sa dami ng pages."""
+    if requested is not None:
+        return requested
+    return page_count >= STREAMING_MIN_PAGES
+
+def _store_size() -> Optional[int]:
+    # Property sa classic PyMuPDF; method na laging None sa rebased PyMuPDF
+    value = fitz.TOOLS.store_size
+    return value() if callable(value) else value
+
+def trim_store(max_bytes: Optional[int] = None) -> None:
+    """
+    Shrinks MuPDF's store between pages: to at most `max_bytes` (default
+    STREAMING_STORE_MAX_BYTES) where PyMuPDF reports the store's size, and
+    otherwise by STREAMING_STORE_SHRINK_PERCENT of whatever it holds.
+    """
+    max_bytes = STREAMING_STORE_MAX_BYTES if max_bytes is None else max_bytes
+    size = _store_size()
+    if size is None:
+        fitz.TOOLS.store_shrink(STREAMING_STORE_SHRINK_PERCENT)
+    elif size > max_bytes:
+        fitz.TOOLS.store_shrink(min(100, math.ceil((size - max_bytes) * 100 / size)))
+
+class PageSpool:
+    """
+    Append-only list of per-page entries, spooled to a temporary file as JSON
+    lines. Upload Futures inside an entry are kept aside and replaced by their
+    URLs when the spool is read, so read it only after the pipeline is joined.
+    Iterating reads the entries back one at a time.
+    """
+
+    def __init__(self):
+        self._file = tempfile.TemporaryFile(mode="w+", encoding="utf-8")
+        self._futures: List[Future] = []
+        self._count = 0
+
+    def _encode_future(self, value: Any) -> Dict[str, int]:
+        if isinstance(value, Future):
+            self._futures.append(value)
+            return {"$upload": len(self._futures) - 1}
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+    def _decode_future(self, value: Dict[str, Any]) -> Any:
+        if len(value) == 1 and "$upload" in value:
+            return self._futures[value["$upload"]].result()
+        return value
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        self._file.seek(0, os.SEEK_END)
+        self._file.write(json.dumps(entry, ensure_ascii=False, default=self._encode_future))
+        self._file.write("\n")
+        self._count += 1
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        self._file.seek(0)
+        position = 0
+        for _ in range(self._count):
+            # Hiwalay ang position bawat iteration, para puwedeng mag-append habang nagbabasa
+            self._file.seek(position)
+            line = self._file.readline()
+            position = self._file.tell()
+            yield json.loads(line, object_hook=self._decode_future)
+
+    def first(self) -> Optional[Dict[str, Any]]:
+        return next(iter(self), None)
+
+    def close(self) -> None:
+        self._file.close()
+
+def first_page(pages: Any) -> Optional[Dict[str, Any]]:
+    """Ang unang page entry ng isang list o PageSpool (None kung wala)."""
+    if isinstance(pages, PageSpool):
+        return pages.first()
+    return pages[0] if pages else None
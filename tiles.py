@@ -0,0 +1,85 @@
+import os
+import math
+import fitz  # PyMuPDF
+from typing import Any, Dict, Iterator, Tuple
+from page_analysis import PageAnalysis
+from autocrop import crop_pixmap
+
+# --- Deep-Zoom Tile Pyramid ---
+# Sa halip na isang malaking page image, hinahati ang page sa DZI levels ng
+# 256px tiles. Ang bawat level ay direktang nire-render mula sa display list ng page
+# sa sarili nitong scale (hindi dina-downscale mula sa isang malaking bitmap),
+# kaya matalas ang bawat zoom level. Ang client ay kukuha lang ng tiles na nakikita.
+#
+# Layout (Deep Zoom / OpenSeadragon):
+#   page-01.dzi                      <- descriptor
+#   page-01_files/{level}/{col}_{row}.{ext}
+
+TILE_SIZE = int(os.getenv("TILE_SIZE", "256"))
+TILE_OVERLAP = int(os.getenv("TILE_OVERLAP", "1"))
+# Ang DPI ng pinakamalaking level
+TILE_MAX_DPI = int(os.getenv("TILE_MAX_DPI", "300"))
+
+def level_size(width: int, height: int, level: int, max_level: int) -> Tuple[int, int]:
+    """Ang pixel size ng isang level; ang bawat level ay kalahati ng mas mataas na level (rounded up)."""
+    factor = 2 ** (max_level - level)
+    return math.ceil(width / factor), math.ceil(height / factor)
+
+def tile_bounds(col: int, row: int, width: int, height: int, tile_size: int, overlap: int) -> Tuple[int, int, int, int]:
+    """Pixel bounds ng tile (col, row), kasama ang overlap sa mga gilid na may katabing tile."""
+    x0 = col * tile_size - (overlap if col > 0 else 0)
+    y0 = row * tile_size - (overlap if row > 0 else 0)
+    x1 = min((col + 1) * tile_size + overlap, width)
+    y1 = min((row + 1) * tile_size + overlap, height)
+    return x0, y0, x1, y1
+
+def pyramid_metadata(analysis: PageAnalysis, tile_size: int = TILE_SIZE, overlap: int = TILE_OVERLAP, dpi: int = TILE_MAX_DPI) -> Dict[str, Any]:
+    """
+    Describes the tile pyramid of a page's autocropped content box.
+    The full-resolution size is the content box at `dpi`; level 0 is 1x1.
+    """
+    content_box = analysis.autocrop["content_box"] & analysis.page.rect
+    scale = dpi / 72.0
+    width = max(1, round(content_box.width * scale))
+    height = max(1, round(content_box.height * scale))
+    return {
+        "type": "dzi",
+        "tile_size": tile_size,
+        "overlap": overlap,
+        "format": analysis.encoder.image_format,
+        "width": width,
+        "height": height,
+        "max_level": math.ceil(math.log2(max(width, height))),
+        "content_box": [content_box.x0, content_box.y0, content_box.x1, content_box.y1],
+        "dzi_url": None, # <-- Pupunan pagkatapos ng upload
+    }
+
+def iter_pyramid_tiles(analysis: PageAnalysis, meta: Dict[str, Any]) -> Iterator[Tuple[str, bytes]]:
+    """
+    Yields (relative_path, encoded_bytes) for every tile, level by level.
+    Only one level's pixmap is held at a time.
+    """
+    encoder = analysis.encoder
+    text_only = encoder.quantize_text_pages and analysis.is_text_only
+    content_box = fitz.Rect(meta["content_box"])
+    tile_size, overlap = meta["tile_size"], meta["overlap"]
+    for level in range(meta["max_level"] + 1):
+        width, height = level_size(meta["width"], meta["height"], level, meta["max_level"])
+        pix = analysis.render_box(content_box, width, height)
+        columns, rows = math.ceil(pix.width / tile_size), math.ceil(pix.height / tile_size)
+        for row in range(rows):
+            for col in range(columns):
+                bounds = tile_bounds(col, row, pix.width, pix.height, tile_size, overlap)
+                tile = pix if bounds == (0, 0, pix.width, pix.height) else crop_pixmap(pix, bounds)
+                yield f"{level}/{col}_{row}.{encoder.extension}", encoder.encode(tile, text_only=text_only)
+        pix = None
+
+def dzi_descriptor(meta: Dict[str, Any]) -> bytes:
+    """Ang .dzi XML na binabasa ng Deep Zoom clients (e.g. OpenSeadragon)."""
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" TileSize="{meta["tile_size"]}" '
+        f'Overlap="{meta["overlap"]}" Format="{meta["format"]}">\n'
+        f'  <Size Width="{meta["width"]}" Height="{meta["height"]}"/>\n'
+        '</Image>\n'
+    ).encode("utf-8")
@@ -0,0 +1,68 @@
+import os
+import time
+import sqlite3
+import threading
+from typing import Dict, Optional, Tuple
+
+# --- Content-Addressed Upload Index ---
+# Tinatandaan kung anong content (sha256) ang huling na-upload sa bawat (target, path).
+# Kapag pareho ang hash, hindi na ia-upload ulit at ang dating URL ang gagamitin.
+
+class UploadIndex:
+    """Local SQLite index of uploaded artifacts: (target, path) -> (sha256, url)."""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.getenv("UPLOAD_INDEX_PATH", "upload_index.sqlite3")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS artifacts (
+                target TEXT NOT NULL,
+                path TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                url TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (target, path)
+            )
+        """)
+
+    def lookup(self, target: str, path: str) -> Optional[Tuple[str, str]]:
+        """Returns (sha256, url) of the last upload to this path, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha256, url FROM artifacts WHERE target = ? AND path = ?", (target, path)
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def record(self, target: str, path: str, sha256: str, url: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO artifacts (target, path, sha256, url, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (target, path, sha256, url, time.time())
+            )
+
+    def entries(self, target: str, prefix: str) -> Dict[str, Dict[str, str]]:
+        """All indexed artifacts of a target whose path starts with `prefix`."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, sha256, url FROM artifacts WHERE target = ? AND substr(path, 1, ?) = ?",
+                (target, len(prefix), prefix)
+            ).fetchall()
+        return {path: {"sha256": sha256, "url": url} for path, sha256, url in rows}
+
+_default_index: Optional[UploadIndex] = None
+_default_index_lock = threading.Lock()
+
+def get_upload_index() -> Optional[UploadIndex]:
+    """
+    Ang shared na index ng process. Ibinabalik ang None kapag naka-disable
+    ang deduplication (UPLOAD_DEDUP=0), para laging mag-upload.
+    """
+    global _default_index
+    if os.getenv("UPLOAD_DEDUP", "1") == "0":
+        return None
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = UploadIndex()
+        return _default_index
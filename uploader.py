@@ -0,0 +1,260 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import requests
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, List, Optional, Tuple
+
+from vercel_blob import put, list as list_blobs
+from supabase import Client
+from upload_index import UploadIndex, get_upload_index
+from metrics import (
+    current_job, span, UPLOADS, UPLOAD_BYTES, UPLOAD_QUEUE_DEPTH, UPLOAD_QUEUE_BYTES
+)
+
+# Pangalan ng remote marker file: listahan ng artifacts (path -> sha256, url) ng isang issue
+MARKER_NAME = ".artifacts.json"
+
+# --- Upload Pipeline ---
+# Isang bounded na upload stage na tumatakbo kasabay ng rendering.
+# Ang processors ay nagsu-submit ng artifacts at tuloy-tuloy lang sa susunod na page;
+# hinihintay lang ang lahat ng uploads bago isulat ang manifest.
+
+class UploadError(Exception):
+    """Raised when one or more uploads still failed after all retries."""
+
+    def __init__(self, failures: List[Tuple[str, BaseException]]):
+        self.failures = failures
+        paths = ", ".join(path for path, _ in failures[:5])
+        more = f" (+{len(failures) - 5} more)" if len(failures) > 5 else ""
+        super().__init__(f"{len(failures)} upload(s) failed: {paths}{more}")
+
+class VercelBlobTarget:
+    """Upload target para sa Vercel Blob (ginagamit ng processor.py)."""
+    name = "vercel-blob"
+
+    def upload(self, path: str, body: bytes, content_type: str) -> str:
+        # Ang content type ay hinuhulaan ng vercel_blob mula sa file extension
+        blob = put(
+            path,
+            body,
+            options={'token': os.environ['BLOB_READ_WRITE_TOKEN'], "allowOverwrite": True, "access": 'public'}
+        )
+        return blob['url']
+
+    def download(self, path: str) -> Optional[bytes]:
+        """Ibinabalik ang laman ng blob sa `path`, o None kung wala pa."""
+        listing = list_blobs({"prefix": path, "limit": "1", 'token': os.environ['BLOB_READ_WRITE_TOKEN']})
+        for blob in listing.get("blobs", []):
+            if blob.get("pathname") == path:
+                response = requests.get(blob["url"], timeout=30)
+                response.raise_for_status()
+                return response.content
+        return None
+
+class SupabaseStorageTarget:
+    """Upload target para sa isang Supabase Storage bucket."""
+
+    def __init__(self, supabase: Client, bucket_name: str):
+        self.supabase = supabase
+        self.bucket_name = bucket_name
+        self.name = f"supabase:{bucket_name}"
+
+    def upload(self, path: str, body: bytes, content_type: str) -> str:
+        bucket = self.supabase.storage.from_(self.bucket_name)
+        bucket.upload(
+            file=body,
+            path=path,
+            file_options={"content-type": content_type, "cache-control": "3600", "upsert": "true"}
+        )
+        return bucket.get_public_url(path)
+
+    def download(self, path: str) -> Optional[bytes]:
+        """Ibinabalik ang laman ng file sa `path`, o None kung wala pa."""
+        try:
+            return self.supabase.storage.from_(self.bucket_name).download(path)
+        except Exception:
+            return None
+
+class UploadPipeline:
+    """
+    Pool of uploader threads fed through a bounded queue.
+
+    `submit` blocks (backpressure) while `max_in_flight` uploads or
+    `max_bytes_in_flight` bytes are pending, so memory stays bounded no matter
+    how fast pages are rendered. Failed uploads are retried with exponential
+    backoff; `join` raises UploadError if any of them still failed.
+
+    Every artifact is hashed before upload. When `index` records the same
+    sha256 for the same target and path, the upload is skipped and the
+    previously stored URL is returned instead.
+    """
+
+    def __init__(
+            self,
+            workers: Optional[int] = None,
+            max_in_flight: Optional[int] = None,
+            max_bytes_in_flight: Optional[int] = None,
+            retries: Optional[int] = None,
+            backoff_seconds: float = 0.5,
+            index: Optional[UploadIndex] = None):
+        self.workers = workers or int(os.getenv("UPLOAD_WORKERS", "8"))
+        self.max_in_flight = max_in_flight or int(os.getenv("UPLOAD_MAX_IN_FLIGHT", str(self.workers * 4)))
+        self.max_bytes_in_flight = max_bytes_in_flight or int(os.getenv("UPLOAD_MAX_BYTES_IN_FLIGHT", str(256 * 1024 * 1024)))
+        self.retries = retries or int(os.getenv("UPLOAD_RETRIES", "3"))
+        self.backoff_seconds = backoff_seconds
+        self.index = index if index is not None else get_upload_index()
+        self.uploaded = 0
+        self.skipped = 0
+        # Ang job na gumawa ng pipeline; ang uploads ay tumatakbo sa ibang threads
+        self.job = current_job()
+
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="uploader")
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._bytes_in_flight = 0
+        self._futures: List[Future] = []
+        self._failures: List[Tuple[str, BaseException]] = []
+
+    def __enter__(self) -> "UploadPipeline":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Kung may error sa processor, huwag nang ituloy ang mga naka-queue pa
+        self.close(cancel_pending=exc_type is not None)
+
+    def close(self, cancel_pending: bool = False) -> None:
+        """Stops the uploader threads, optionally dropping uploads that have not started yet."""
+        self._executor.shutdown(wait=True, cancel_futures=cancel_pending)
+
+    def submit(self, target: Any, path: str, body: bytes, content_type: str) -> Future:
+        """Queues an upload and returns a Future that resolves to the public URL."""
+        size = len(body)
+        with self._cond:
+            # Backpressure: maghintay hanggang may bakanteng slot at sapat na byte budget.
+            # Laging pinapayagan kung walang naka-pending, para hindi ma-stuck ang malalaking files.
+            while self._in_flight and (
+                    self._in_flight >= self.max_in_flight
+                    or self._bytes_in_flight + size > self.max_bytes_in_flight):
+                self._cond.wait()
+            self._in_flight += 1
+            self._bytes_in_flight += size
+        UPLOAD_QUEUE_DEPTH.inc()
+        UPLOAD_QUEUE_BYTES.inc(size)
+        future = self._executor.submit(self._upload_with_retry, target, path, body, content_type, size)
+        self._futures.append(future)
+        return future
+
+    def upload(self, target: Any, path: str, body: bytes, content_type: str) -> str:
+        """Uploads synchronously (with the same retries) and returns the public URL."""
+        future = self.submit(target, path, body, content_type)
+        try:
+            return future.result()
+        except Exception as e:
+            raise UploadError([(path, e)]) from e
+
+    def join(self) -> None:
+        """Waits for every submitted upload. Raises UploadError if any failed."""
+        wait(self._futures)
+        self._futures = []
+        if self._failures:
+            raise UploadError(list(self._failures))
+
+    def load_marker(self, target: Any, prefix: str) -> int:
+        """
+        Sine-seed ang lokal na index mula sa remote marker ng `prefix` (hal. isang bagong container
+        na walang lokal na index). Hindi ginagalaw kung may entries na ang index para sa prefix.
+        Returns the number of entries loaded.
+        """
+        if self.index is None or self.index.entries(target.name, prefix):
+            return 0
+        try:
+            marker = target.download(prefix + MARKER_NAME)
+        except Exception as e:
+            print(f"  - ⚠️ Could not read upload marker for {prefix}: {e}")
+            return 0
+        if not marker:
+            return 0
+        entries = json.loads(marker).get("artifacts", {})
+        for path, entry in entries.items():
+            self.index.record(target.name, path, entry["sha256"], entry["url"])
+        print(f"  - ♻️ Loaded {len(entries)} artifact hashes from remote marker {prefix}{MARKER_NAME}")
+        return len(entries)
+
+    def publish_marker(self, target: Any, prefix: str) -> None:
+        """Uploads the remote marker listing every indexed artifact under `prefix`."""
+        if self.index is None:
+            return
+        entries = self.index.entries(target.name, prefix)
+        entries.pop(prefix + MARKER_NAME, None)
+        marker = json.dumps({"artifacts": entries}, sort_keys=True).encode('utf-8')
+        self.upload(target, prefix + MARKER_NAME, marker, "application/json")
+        print(f"  - Upload summary: {self.uploaded} uploaded, {self.skipped} unchanged and skipped.")
+
+    def _upload_with_retry(self, target: Any, path: str, body: bytes, content_type: str, size: int) -> str:
+        try:
+            digest = hashlib.sha256(body).hexdigest()
+            if self.index is not None:
+                previous = self.index.lookup(target.name, path)
+                if previous and previous[0] == digest:
+                    # Parehong content na ang naka-upload; gamitin ulit ang URL
+                    with self._cond:
+                        self.skipped += 1
+                    UPLOADS.inc(target=target.name, result="skipped")
+                    self._count("uploads_skipped")
+                    return previous[1]
+
+            for attempt in range(1, self.retries + 1):
+                try:
+                    with span("upload", self.job):
+                        url = target.upload(path, body, content_type)
+                    print(f"  - ✅ Uploaded to {target.name}: {url}")
+                    with self._cond:
+                        self.uploaded += 1
+                    UPLOADS.inc(target=target.name, result="uploaded")
+                    UPLOAD_BYTES.inc(size, target=target.name)
+                    self._count("uploads")
+                    self._count("bytes_uploaded", size)
+                    if self.index is not None:
+                        self.index.record(target.name, path, digest, url)
+                    return url
+                except Exception as e:
+                    if attempt == self.retries:
+                        print(f"  - ❌ Upload failed for {path} after {attempt} attempts. Error Type: {type(e).__name__}, Details: {e}")
+                        with self._cond:
+                            self._failures.append((path, e))
+                        UPLOADS.inc(target=target.name, result="failed")
+                        self._count("upload_failures")
+                        raise
+                    UPLOADS.inc(target=target.name, result="retried")
+                    delay = self.backoff_seconds * (2 ** (attempt - 1))
+                    print(f"  - ⚠️ Upload attempt {attempt} failed for {path} ({e}). Retrying in {delay:.1f}s...")
+                    time.sleep(delay)
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._bytes_in_flight -= size
+                self._cond.notify_all()
+            UPLOAD_QUEUE_DEPTH.dec()
+            UPLOAD_QUEUE_BYTES.dec(size)
+
+    def _count(self, key: str, amount: float = 1) -> None:
+        if self.job is not None:
+            self.job.count(key, amount)
+
+def resolve_uploads(value: Any) -> Any:
+    """
+    Pinapalitan ang bawat upload Future sa loob ng nested dicts/lists ng totoong URL.
+    Tawagin lang ito pagkatapos ng `UploadPipeline.join()`.
+    """
+    if isinstance(value, Future):
+        return value.result()
+    if isinstance(value, dict):
+        for key, item in value.items():
+            value[key] = resolve_uploads(item)
+    elif isinstance(value, list):
+        for i, item in enumerate(value):
+            value[i] = resolve_uploads(item)
+    return value